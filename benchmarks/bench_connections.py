@@ -0,0 +1,49 @@
+"""
+Requests per second of NotesAsyncClient with a fresh session per call versus the pooled session.
+
+    python -m benchmarks.bench_connections
+"""
+import asyncio
+import time
+import aiohttp
+from benchmarks.fake_server import FakeNextcloud, NOTES_ROOT
+from nextcloud_apps_api import NotesAsyncClient
+
+REQUESTS = 500
+CONCURRENCY = 20
+
+
+async def fresh_session_get(host: str, id_: int):
+    # What every call did before the clients owned a session.
+    conn = aiohttp.TCPConnector(ssl=False)
+    async with aiohttp.ClientSession(connector=conn) as session:
+        async with session.get(f"{host}{NOTES_ROOT}/notes/{id_}", headers={"Accept": "application/json"}) as response:
+            return await response.json()
+
+
+async def run(label: str, server: FakeNextcloud, call):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    server.connections = 0
+
+    async def one(i):
+        async with semaphore:
+            await call(i % 100 + 1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {REQUESTS / elapsed:>9.1f} req/s  {server.connections:>4} connections")
+
+
+async def main():
+    server = await FakeNextcloud().start()
+    try:
+        await run("fresh session", server, lambda i: fresh_session_get(server.host, i))
+        async with NotesAsyncClient(server.host, ssl=False) as nc:
+            await run("pooled session", server, lambda i: nc.get_notes(i, exclude=["content"]))
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
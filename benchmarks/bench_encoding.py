@@ -0,0 +1,126 @@
+"""
+Bytes on the wire of large responses per Content-Encoding, and the time each Json decoder takes to decode them.
+Notes hold varied text (--prose), since a single repeated character compresses far better than any real note.
+
+    python -m benchmarks.bench_encoding
+"""
+import asyncio
+import time
+import warnings
+import aiohttp
+from benchmarks.fake_server import spawn, NOTES_ROOT, BOOKMARKS_ROOT
+from nextcloud_apps_api import NotesClient, NotesAsyncClient
+from nextcloud_apps_api.utils.codec import DECODERS, accept_encoding, make_decoder
+
+NOTES = 2000
+CONTENT_SIZE = 5000
+BOOKMARKS = 20000
+REPEAT = 5
+
+PAYLOADS = {
+    "notes": NOTES_ROOT + "/notes",
+    "bookmarks": BOOKMARKS_ROOT,
+    "export": BOOKMARKS_ROOT + "/export",
+}
+
+
+async def wire_sizes(host: str) -> dict:
+    """
+    :return: {payload: {coding: bytes on the wire, or None if the server could not use the coding}}
+    """
+    sizes = {}
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        for name, endpoint in PAYLOADS.items():
+            sizes[name] = {}
+            for coding in ("identity", "gzip", "br"):
+                async with session.get(host + endpoint, headers={"Accept-Encoding": coding}) as response:
+                    body = await response.read()
+                    sent = response.headers.get("Content-Encoding", "identity")
+                sizes[name][coding] = len(body) if sent == coding else None
+    return sizes
+
+
+def best(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def decode_times(host: str) -> dict:
+    """
+    :return: {payload: {decoder: seconds, or None if it is not installed}}
+    """
+    import requests
+    bodies = {name: requests.get(host + PAYLOADS[name], headers={"Accept-Encoding": "identity"}).content
+              for name in ("notes", "bookmarks")}
+    times = {}
+    for name, body in bodies.items():
+        times[name] = {"size": len(body)}
+        for decoder in DECODERS:
+            try:
+                loads = make_decoder(decoder)
+            except ImportError:
+                times[name][decoder] = None
+                continue
+            times[name][decoder] = best(lambda: loads(body))
+    return times
+
+
+def client_times(host: str) -> dict:
+    """
+    :return: {client: seconds of get_notes} with the default decoder and with the standard library one.
+    """
+    times = {}
+    for decoder in (None, "json"):
+        label = decoder or "default"
+        with NotesClient(host, json_decoder=decoder) as nc:
+            nc.get_notes(1)
+            times[f"NotesClient ({label})"] = best(lambda: nc.get_notes())
+
+        async def run():
+            async with NotesAsyncClient(host, json_decoder=decoder) as nc:
+                await nc.get_notes(1)
+                timings = []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    await nc.get_notes()
+                    timings.append(time.perf_counter() - start)
+                return min(timings)
+
+        times[f"NotesAsyncClient ({label})"] = asyncio.run(run())
+    return times
+
+
+def main():
+    warnings.simplefilter("ignore")
+    print(f"Accept-Encoding sent by the clients: {accept_encoding()}")
+    with spawn(notes=NOTES, bookmarks=BOOKMARKS, content_size=CONTENT_SIZE, compress=True, prose=True) as host:
+        print("\nbytes on the wire")
+        for name, sizes in asyncio.run(wire_sizes(host)).items():
+            identity = sizes["identity"]
+            line = f"  {name:<10} identity {identity / 2 ** 20:>7.2f} MiB"
+            for coding in ("gzip", "br"):
+                size = sizes[coding]
+                line += (f"  {coding:<4} {size / 2 ** 20:>7.2f} MiB ({identity / size:>4.1f}x)" if size
+                         else f"  {coding:<4} unavailable")
+            print(line)
+
+        print("\ndecode time")
+        for name, times in decode_times(host).items():
+            line = f"  {name:<10} {times['size'] / 2 ** 20:>7.2f} MiB"
+            for decoder in DECODERS:
+                seconds = times[decoder]
+                line += (f"  {decoder:<7} {seconds * 1000:>7.1f} ms ({times['json'] / seconds:>4.1f}x)" if seconds
+                         else f"  {decoder:<7} not installed")
+            print(line)
+
+        print("\nget_notes end to end, compressed over loopback")
+        for label, seconds in client_times(host).items():
+            print(f"  {label:<28} {seconds * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Import cost of the package, measured with python -X importtime in a fresh interpreter.
+Exits with status 1 if a statement pulls in a transport it does not need, so it can guard against regressions.
+
+    python -m benchmarks.bench_import
+"""
+import subprocess
+import sys
+
+RUNS = 5
+
+# Statement, modules it must not load.
+SCENARIOS = [
+    ("import nextcloud_apps_api", ["aiohttp", "asyncio", "requests", "sqlite3"]),
+    ("from nextcloud_apps_api import NotesClient", ["aiohttp", "asyncio", "requests", "sqlite3"]),
+    ("from nextcloud_apps_api import NotesClient; NotesClient('http://localhost')", ["aiohttp", "asyncio"]),
+    ("from nextcloud_apps_api import BookmarkClient; BookmarkClient('http://localhost')", ["aiohttp", "asyncio"]),
+]
+
+
+def measure(statement: str):
+    """
+    :return: Fastest total microseconds spent importing over RUNS runs, set of top level modules imported.
+    """
+    runs = [measure_once(statement) for _ in range(RUNS)]
+    return min(total for total, modules in runs), runs[0][1]
+
+
+def measure_once(statement: str):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        modules.add(name.strip().split(".")[0])
+    return total, modules
+
+
+def main():
+    baseline, builtin = measure("pass")
+    failed = False
+    for statement, forbidden in SCENARIOS:
+        total, modules = measure(statement)
+        loaded = sorted(set(forbidden) & (modules - builtin))
+        failed = failed or bool(loaded)
+        print(f"{(total - baseline) / 1000:>8.1f} ms  {statement}")
+        if loaded:
+            print(f"            unexpectedly imported: {', '.join(loaded)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Memory held by 100k notes and bookmarks as decoded Json dicts versus Note and Bookmark records.
+
+    python -m benchmarks.bench_models
+"""
+import gc
+import json
+import tracemalloc
+from benchmarks.fake_server import make_note, make_bookmark
+from nextcloud_apps_api.models import Note, Bookmark
+
+COUNT = 100000
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    current, highest = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, items
+
+
+def report(label: str, raw: bytes, model):
+    as_dicts, dicts = measure(lambda: json.loads(raw))
+    del dicts
+    as_models, models = measure(lambda: [model.from_dict(item) for item in json.loads(raw)])
+    del models
+    print(f"{label:<10} dicts {as_dicts / 2 ** 20:>7.1f} MiB  records {as_models / 2 ** 20:>7.1f} MiB  "
+          f"({as_models / as_dicts:.0%})")
+
+
+def main():
+    notes = []
+    for i in range(COUNT):
+        note = make_note(i)
+        del note["content"]
+        notes.append(note)
+    report("notes", json.dumps(notes).encode(), Note)
+    report("bookmarks", json.dumps([make_bookmark(i) for i in range(COUNT)]).encode(), Bookmark)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Per-request cost of building query strings with the old Jinja2 templates versus the query builder.
+
+    python -m benchmarks.bench_query
+"""
+import timeit
+from nextcloud_apps_api.utils.query import notes_query, bookmarks_query
+
+NOTES_PARAMS = {"category": "My Journal", "exclude": ["content", "favorite"], "chunkSize": 100}
+BOOKMARKS_PARAMS = {"tags": ["python", "c & c++", "café"], "page": 2, "limit": 50, "conjunction": "or"}
+NUMBER = 20000
+
+
+def report(label: str, fn):
+    seconds = min(timeit.repeat(fn, number=NUMBER, repeat=5))
+    print(f"{label:<22} {seconds / NUMBER * 1e6:>7.2f} us/call")
+
+
+def main():
+    try:
+        import jinja2
+    except ImportError:
+        jinja2 = None
+    if jinja2 is not None:
+        # The templates the clients rendered before the query builder.
+        notes_template = jinja2.Template(
+            '''{% for key, value in params.items() %}{% if loop.first %}?{% endif %}{% if value is string or value is number %}{{key}}={{ value | replace(" ", "+") }}{% else %}{{key}}={% for v in value %}{{ v | replace(" ", "+") }}{% if not loop.last %},{% endif %}{% endfor %}{% endif %}{% if not loop.last %}&{% endif %}{% endfor %}'''
+        )
+        bookmarks_template = jinja2.Template(
+            '''{% for key, value in params.items() %}{% if loop.first %}?{% endif %}{% if value is string or value is number %}{{key}}={{ value | replace(" ", "+") }}{% else %}{% for v in value %}{{key}}[]={{ v | replace(" ", "+") }}{% if not loop.last %}&{% endif %}{% endfor %}{% endif %}{% if not loop.last %}&{% endif %}{% endfor %}'''
+        )
+        report("notes jinja2", lambda: notes_template.render(params=NOTES_PARAMS))
+        report("bookmarks jinja2", lambda: bookmarks_template.render(params=BOOKMARKS_PARAMS))
+    else:
+        print("jinja2 is not installed, skipping the template timings")
+    report("notes_query", lambda: notes_query(NOTES_PARAMS))
+    report("bookmarks_query", lambda: bookmarks_query(BOOKMARKS_PARAMS))
+    print(bookmarks_query(BOOKMARKS_PARAMS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Peak client memory of get_notes, which decodes the whole list at once, versus stream_notes.
+The stand-in server runs in its own process so that only the client is measured.
+
+    python -m benchmarks.bench_streaming
+"""
+import time
+import tracemalloc
+import warnings
+from benchmarks.fake_server import spawn
+from nextcloud_apps_api import NotesClient
+
+NOTES = 2000
+CONTENT_SIZE = 20000
+
+
+def peak(label: str, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    current, highest = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {count:>6} notes  {elapsed:>6.2f}s  peak {highest / 2 ** 20:>8.1f} MiB")
+
+
+def main():
+    with spawn(notes=NOTES, content_size=CONTENT_SIZE) as host:
+        warnings.simplefilter("ignore")
+        with NotesClient(host) as nc:
+            nc.get_notes(1)
+            peak("get_notes", lambda: len(nc.get_notes()[1]))
+            peak("stream_notes", lambda: sum(1 for note in nc.stream_notes()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+Local stand-in for the nextcloud notes and bookmarks apps, used by the benchmarks and the tests.
+Can also be run on its own, e.g. to keep its memory out of a client measurement:
+
+    python -m benchmarks.fake_server --port 8080 --notes 1000 --content-size 10000 --error-rate 0.01 --compress --prose
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import html
+import itertools
+import random
+import socket
+import subprocess
+import sys
+import time
+import zlib
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NOTES_ROOT = "/index.php/apps/notes/api/v1"
+BOOKMARKS_ROOT = "/index.php/apps/bookmarks/public/rest/v2/bookmark"
+
+WORDS = ("the meeting notes project draft budget review call with team about next steps deadline friday client "
+         "design update todo shopping list milk eggs bread recipe soup garlic onion travel plan flight hotel booking "
+         "idea write blog post python async server release version bug fix test deploy").split()
+
+
+def make_text(id_: int, size: int) -> str:
+    """
+    :return: size characters of word salad, compressing about as well as written notes do.
+    """
+    rng = random.Random(id_)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def make_note(id_: int, content_size: int = 64, prose: bool = False):
+    return {
+        "id": id_,
+        "etag": f"etag{id_}",
+        "readonly": False,
+        "content": make_text(id_, content_size) if prose else "x" * content_size,
+        "title": f"Note {id_}",
+        "category": "Journal" if id_ % 2 else "",
+        "favorite": False,
+        "modified": int(time.time()),
+    }
+
+
+def make_bookmark(id_: int):
+    return {
+        "id": id_,
+        "url": f"https://example.com/{id_}",
+        "title": f"Bookmark {id_}",
+        "description": "Only a test.",
+        "tags": ["python"] if id_ % 2 else [],
+        "folders": [-1],
+        "lastmodified": int(time.time()),
+        "added": int(time.time()),
+        "clickcount": 0,
+    }
+
+
+class GzipCompressor:
+    """
+    zlib with the interface of brotli.Compressor.
+    """
+
+    def __init__(self, level: int = 6):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data: bytes) -> bytes:
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._zlib.flush()
+
+
+class FakeNextcloud:
+
+    def __init__(self, notes: int = 100, bookmarks: int = 100, latency: float = 0.0, content_size: int = 64,
+                 error_rate: float = 0.0, seed: int = 0, capacity: int = 0, compress: bool = False,
+                 prose: bool = False, jitter: float = 0.0, clock=None, record: bool = False):
+        """
+        :param notes: Number of notes the server holds.
+        :param bookmarks: Number of bookmarks the server holds.
+        :param latency: Seconds of simulated server time added to every response. A request is handled when it arrives,
+        so a GET answers the state the server had then.
+        :param content_size: Length of the content of every note.
+        :param error_rate: Fraction of requests answered with 503 Service Unavailable.
+        :param seed: Seed of the choice of failing requests, so runs fail the same requests.
+        :param capacity: Requests handled at the same time. Requests beyond it get 503 Service Unavailable. 0 for no
+        limit.
+        :param compress: Whether to compress responses with Brotli or gzip, as the client's Accept-Encoding allows.
+        :param prose: Whether notes hold varied text instead of a single repeated character, which compresses unlike
+        any real note.
+        :param jitter: Up to this many seconds, chosen at random, added to the latency of every response.
+        :param clock: Returns the modification time of saved notes. Defaults to the current time in whole seconds.
+        :param record: Whether to keep (method, path and query, status) of every request in log, in the order they were
+        answered.
+        """
+        self.notes = {i: make_note(i, content_size, prose) for i in range(1, notes + 1)}
+        self.bookmarks = {i: make_bookmark(i) for i in range(1, bookmarks + 1)}
+        self.settings = {"notesPath": "Notes", "fileSuffix": ".md", "noteMode": "rich"}
+        self.latency = latency
+        self.jitter = jitter
+        self.clock = clock or (lambda: int(time.time()))
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.capacity = capacity
+        self.compress = compress
+        self.in_flight = 0
+        self.note_ids = itertools.count(notes + 1)
+        self.bookmark_ids = itertools.count(bookmarks + 1)
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.peak = 0
+        self.record = record
+        self.log = []
+        self.answers = {}
+        self.runner = None
+        self.port = None
+
+    @property
+    def host(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def make_app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get(NOTES_ROOT + "/notes", self.list_notes)
+        app.router.add_get(NOTES_ROOT + "/notes/{id}", self.get_note)
+        app.router.add_post(NOTES_ROOT + "/notes", self.post_note)
+        app.router.add_put(NOTES_ROOT + "/notes/{id}", self.put_note)
+        app.router.add_delete(NOTES_ROOT + "/notes/{id}", self.delete_note)
+        app.router.add_get(NOTES_ROOT + "/settings", self.get_settings)
+        app.router.add_put(NOTES_ROOT + "/settings", self.put_settings)
+        app.router.add_get(BOOKMARKS_ROOT, self.list_bookmarks)
+        app.router.add_get(BOOKMARKS_ROOT + "/export", self.export_bookmarks)
+        app.router.add_get(BOOKMARKS_ROOT + "/{id}", self.get_bookmark)
+        app.router.add_post(BOOKMARKS_ROOT, self.post_bookmark)
+        app.router.add_put(BOOKMARKS_ROOT + "/{id}", self.put_bookmark)
+        app.router.add_delete(BOOKMARKS_ROOT + "/{id}", self.delete_bookmark)
+        return app
+
+    async def start(self, port: int = 0):
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def answer(self, path: str, status: int, times: int = 1, headers: dict = None):
+        """
+        Answers the next times requests of path with status and an empty body instead of handling them, e.g. to fail
+        them.
+        """
+        self.answers.setdefault(path, []).extend([(status, headers or {})] * times)
+
+    def save_note(self, id_: int, **fields) -> dict:
+        """
+        Creates or changes a note the way a client's save does, giving it a new modification time and ETag.
+        """
+        note = self.notes.setdefault(id_, {**make_note(id_), "title": "", "content": "", "category": ""})
+        note.update(fields)
+        note["modified"] = self.clock()
+        note["etag"] = hashlib.md5(f"{note['id']}{note['modified']}{note['content']}".encode()).hexdigest()
+        return note
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        if request.transport is not None and not getattr(request.transport, "_counted", False):
+            request.transport._counted = True
+            self.connections += 1
+        status = 500
+        try:
+            if self.capacity and self.in_flight >= self.capacity:
+                self.errors += 1
+                raise web.HTTPServiceUnavailable()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                response = self._interruption(request) or await handler(request)
+            finally:
+                delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+                if delay:
+                    await asyncio.sleep(delay)
+                self.in_flight -= 1
+            status = response.status
+        except web.HTTPException as error:
+            status = error.status
+            raise
+        finally:
+            if self.record:
+                self.log.append((request.method, request.path_qs, status))
+        if isinstance(response, web.Response) and response.body and not response.prepared:
+            coding = self.coding(request)
+            if coding is not None:
+                compressor = self.compressor(coding)
+                response.body = compressor.process(response.body) + compressor.finish()
+                response.headers["Content-Encoding"] = coding
+        return response
+
+    def _interruption(self, request):
+        """
+        :return: Response to send instead of handling request, None to handle it.
+        """
+        answers = self.answers.get(request.path)
+        if answers:
+            status, headers = answers.pop(0)
+            return web.Response(status=status, headers=headers)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+        return None
+
+    def coding(self, request):
+        """
+        :return: Content coding to compress the response to request with, None to send it as is.
+        """
+        if not self.compress:
+            return None
+        accepted = {coding.split(";")[0].strip() for coding in request.headers.get("Accept-Encoding", "").split(",")}
+        if "br" in accepted and brotli is not None:
+            return "br"
+        return "gzip" if "gzip" in accepted else None
+
+    @staticmethod
+    def compressor(coding: str):
+        """
+        :return: brotli.Compressor or GzipCompressor.
+        """
+        if coding == "br":
+            return brotli.Compressor(quality=4)
+        return GzipCompressor()
+
+    async def list_notes(self, request):
+        etag = hashlib.md5("".join(note["etag"] for note in self.notes.values()).encode()).hexdigest()
+        if request.headers.get("If-None-Match", "").strip('"') == etag:
+            return web.Response(status=304)
+        notes = list(self.notes.values())
+        if "category" in request.query:
+            notes = [note for note in notes if note["category"] == request.query["category"]]
+        if request.query.get("exclude"):
+            exclude = request.query["exclude"].split(",")
+            notes = [{key: value for key, value in note.items() if key not in exclude} for note in notes]
+        if "pruneBefore" in request.query:
+            prune_before = int(request.query["pruneBefore"])
+            notes = [note if note["modified"] >= prune_before else {"id": note["id"]} for note in notes]
+        if "chunkSize" not in request.query:
+            return web.json_response(notes, headers={"ETag": f'"{etag}"'})
+        start = int(request.query.get("chunkCursor", 0))
+        end = start + int(request.query["chunkSize"])
+        headers = {"X-Notes-Chunk-Cursor": str(end)} if end < len(notes) else {}
+        return web.json_response(notes[start:end], headers=headers)
+
+    async def get_note(self, request):
+        note = self.notes.get(int(request.match_info["id"]))
+        if note is None:
+            raise web.HTTPNotFound()
+        return web.json_response(note)
+
+    async def post_note(self, request):
+        fields = await request.post()
+        id_ = next(id_ for id_ in self.note_ids if id_ not in self.notes)
+        note = self.save_note(id_, title=fields.get("title", ""), content=fields.get("content", ""),
+                              category=fields.get("category", ""))
+        return web.json_response(note)
+
+    async def put_note(self, request):
+        note = self.notes.get(int(request.match_info["id"]))
+        if note is None:
+            raise web.HTTPNotFound()
+        if "If-Match" in request.headers and request.headers["If-Match"].strip('"') != note["etag"]:
+            raise web.HTTPPreconditionFailed()
+        fields = await request.post()
+        changes = {key: fields[key] for key in ("title", "content", "category") if key in fields}
+        return web.json_response(self.save_note(note["id"], **changes))
+
+    async def delete_note(self, request):
+        if self.notes.pop(int(request.match_info["id"]), None) is None:
+            raise web.HTTPNotFound()
+        return web.json_response({})
+
+    async def get_settings(self, request):
+        return web.json_response(self.settings)
+
+    async def put_settings(self, request):
+        fields = await request.post()
+        self.settings.update({key: fields[key] for key in self.settings if key in fields})
+        return web.json_response(self.settings)
+
+    async def list_bookmarks(self, request):
+        tags = set(request.query.getall("tags[]", []))
+        bookmarks = [bookmark for bookmark in self.bookmarks.values() if tags <= set(bookmark["tags"])]
+        page = int(request.query.get("page", -1))
+        if page >= 0:
+            limit = int(request.query.get("limit", 10))
+            bookmarks = bookmarks[page * limit:(page + 1) * limit]
+        return web.json_response({"status": "success", "data": bookmarks})
+
+    async def get_bookmark(self, request):
+        bookmark = self.bookmarks.get(int(request.match_info["id"]))
+        if bookmark is None:
+            raise web.HTTPNotFound()
+        return web.json_response({"status": "success", "item": bookmark})
+
+    async def export_bookmarks(self, request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=UTF-8"})
+        coding = self.coding(request)
+        compressor = self.compressor(coding) if coding is not None else None
+        if coding is not None:
+            response.headers["Content-Encoding"] = coding
+        await response.prepare(request)
+        for chunk in self.export_chunks():
+            await response.write(compressor.process(chunk) if compressor is not None else chunk)
+        if compressor is not None:
+            await response.write(compressor.finish())
+        await response.write_eof()
+        return response
+
+    def export_chunks(self):
+        """
+        :return: Iterator over the export of all bookmarks, about 100 bookmarks a chunk.
+        """
+        yield b"<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n"
+        lines = []
+        for bookmark in self.bookmarks.values():
+            lines.append(f'<DT><A HREF="{html.escape(bookmark["url"])}" TAGS="{html.escape(",".join(bookmark["tags"]))}" '
+                         f'ADD_DATE="{bookmark["added"]}">{html.escape(bookmark["title"])}</A>\n'
+                         f'<DD>{html.escape(bookmark["description"])}\n')
+            if len(lines) == 100:
+                yield "".join(lines).encode()
+                lines = []
+        yield ("".join(lines) + "</DL><p>\n").encode()
+
+    async def post_bookmark(self, request):
+        fields = await request.post()
+        if not fields.get("url"):
+            raise web.HTTPBadRequest()
+        bookmark = make_bookmark(next(id_ for id_ in self.bookmark_ids if id_ not in self.bookmarks))
+        bookmark.update(url=fields["url"], title=fields.get("title", ""), description=fields.get("description", ""),
+                        tags=request.query.getall("tags[]", []))
+        self.bookmarks[bookmark["id"]] = bookmark
+        return web.json_response({"status": "success", "item": bookmark})
+
+    async def put_bookmark(self, request):
+        bookmark = self.bookmarks.get(int(request.match_info["id"]))
+        if bookmark is None:
+            raise web.HTTPNotFound()
+        fields = await request.post()
+        bookmark.update({key: fields[key] for key in ("title", "description") if key in fields})
+        # As PHP reads form data: tags[] keys make a list, of plain repeated keys only the last one counts.
+        if "tags[]" in fields:
+            bookmark["tags"] = fields.getall("tags[]")
+        elif "tags" in fields:
+            bookmark["tags"] = fields.getall("tags")[-1]
+        bookmark["lastmodified"] = int(time.time())
+        return web.json_response({"status": "success", "item": bookmark})
+
+    async def delete_bookmark(self, request):
+        if self.bookmarks.pop(int(request.match_info["id"]), None) is None:
+            raise web.HTTPNotFound()
+        return web.json_response({"status": "success"})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port: int):
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("stand-in server did not start")
+
+
+@contextlib.contextmanager
+def spawn(**options):
+    """
+    Runs the stand-in server in its own process, so that it does not compete with the client measured for the GIL.
+    :param options: Command line options, e.g. notes=1000, content_size=10000, compress=True.
+    :return: Address of the server.
+    """
+    port = free_port()
+    args = [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port)]
+    for key, value in options.items():
+        if isinstance(value, bool):
+            args += ["--" + key.replace("_", "-")] if value else []
+        else:
+            args += ["--" + key.replace("_", "-"), str(value)]
+    server = subprocess.Popen(args)
+    try:
+        wait_for(port)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--notes", type=int, default=100)
+    parser.add_argument("--bookmarks", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--content-size", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--capacity", type=int, default=0)
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--prose", action="store_true")
+    args = parser.parse_args()
+    server = FakeNextcloud(notes=args.notes, bookmarks=args.bookmarks, latency=args.latency,
+                           content_size=args.content_size, error_rate=args.error_rate, seed=args.seed, capacity=args.capacity,
+                           compress=args.compress, prose=args.prose)
+    web.run_app(server.make_app(), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
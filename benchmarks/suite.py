@@ -0,0 +1,274 @@
+"""
+Throughput and latency of every client against the stand-in server, written as a JSON report that can be compared
+with the report of another version or machine.
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+
+Every scenario runs once per concurrency level. Concurrency 1 gives the latency of a single request, higher levels
+the throughput of the connection pool. Each client gets a freshly started server, so writes of one client do not
+change what the next one measures. Clients neither join identical GETs nor pace requests unless --coalesce or
+--flow-control ask for it, so each concurrency level really keeps that many requests in flight.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_server import spawn
+from nextcloud_apps_api import NotesClient, NotesAsyncClient, BookmarkClient, BookmarkAsyncClient
+
+# Version of the report layout, bumped when reports stop being comparable.
+REPORT_FORMAT = 1
+
+CLIENTS = {
+    "NotesClient": (NotesClient, "notes"),
+    "NotesAsyncClient": (NotesAsyncClient, "notes"),
+    "BookmarkClient": (BookmarkClient, "bookmarks"),
+    "BookmarkAsyncClient": (BookmarkAsyncClient, "bookmarks"),
+}
+
+
+class Scenario:
+    """
+    One kind of operation. call(client, i, ctx) makes the i-th operation; it returns the result, or an awaitable of it
+    for the async clients. Heavy scenarios read a whole collection and run fewer times.
+    """
+
+    def __init__(self, name: str, method: str, call, heavy: bool = False):
+        self.name = name
+        self.method = method
+        self.call = call
+        self.heavy = heavy
+
+
+def drain(iterable):
+    """
+    :return: Number of items of a generator, or an awaitable of it for async generators.
+    """
+    if hasattr(iterable, "__aiter__"):
+        async def count():
+            n = 0
+            async for _ in iterable:
+                n += 1
+            return n
+        return count()
+    return sum(1 for _ in iterable)
+
+
+# Deletes run last, on ids taken one by one from ctx["deleted"], so every other scenario finds its items.
+SCENARIOS = {
+    "notes": [
+        Scenario("list", "get_notes", lambda c, i, ctx: c.get_notes(), heavy=True),
+        Scenario("get", "get_notes", lambda c, i, ctx: c.get_notes(i % ctx["items"] + 1)),
+        Scenario("post", "post_note", lambda c, i, ctx: c.post_note(f"Bench {i}", ctx["content"], "Bench")),
+        Scenario("put", "put_note", lambda c, i, ctx: c.put_note(i % ctx["items"] + 1, content=ctx["content"])),
+        Scenario("scan", "iter_notes", lambda c, i, ctx: drain(c.iter_notes(chunk_size=100)), heavy=True),
+        Scenario("delete", "delete_note", lambda c, i, ctx: c.delete_note(next(ctx["deleted"]))),
+    ],
+    "bookmarks": [
+        Scenario("list", "get_bookmarks", lambda c, i, ctx: c.get_bookmarks(), heavy=True),
+        Scenario("get", "get_bookmarks", lambda c, i, ctx: c.get_bookmarks(i % ctx["items"] + 1)),
+        Scenario("post", "post_bookmark", lambda c, i, ctx: c.post_bookmark(f"https://example.org/{i}", f"Bench {i}")),
+        Scenario("put", "put_bookmark", lambda c, i, ctx: c.put_bookmark(i % ctx["items"] + 1, title=f"Bench {i}")),
+        Scenario("export", "export_bookmarks", lambda c, i, ctx: c.export_bookmarks(), heavy=True),
+        Scenario("scan", "iter_bookmarks", lambda c, i, ctx: drain(c.iter_bookmarks(limit=100)), heavy=True),
+        Scenario("delete", "delete_bookmark", lambda c, i, ctx: c.delete_bookmark(next(ctx["deleted"]))),
+    ],
+}
+
+
+def summarize(latencies: list, errors: int, concurrency: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        "operations": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        # Failed operations often return early, so they do not count towards the throughput.
+        "throughput": (len(latencies) - errors) / elapsed,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000,
+            "p50": percentile(0.5),
+            "p90": percentile(0.9),
+            "p99": percentile(0.99),
+            "max": latencies[-1] * 1000,
+        },
+    }
+
+
+def run_sync(client, scenario: Scenario, operations: int, concurrency: int, ctx: dict) -> dict:
+    latencies = []
+    errors = 0
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            scenario.call(client, i, ctx)
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for latency, failed in executor.map(one, range(operations)):
+            latencies.append(latency)
+            errors += failed
+    return summarize(latencies, errors, concurrency, time.perf_counter() - start)
+
+
+async def run_async(client, scenario: Scenario, operations: int, concurrency: int, ctx: dict) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await scenario.call(client, i, ctx)
+                failed = False
+            except Exception:
+                failed = True
+            return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(operations)))
+    elapsed = time.perf_counter() - start
+    return summarize([latency for latency, failed in results], sum(failed for latency, failed in results),
+                     concurrency, elapsed)
+
+
+def plan(kind: str, args):
+    """
+    :return: List of (key, scenario, operations, concurrency) in the order they run.
+    """
+    runs = []
+    for scenario in SCENARIOS[kind]:
+        if args.scenarios and scenario.name not in args.scenarios:
+            continue
+        operations = max(args.requests // 20, 5) if scenario.heavy else args.requests
+        for concurrency in args.concurrency:
+            runs.append((f"{scenario.name}@{concurrency}", scenario, operations, concurrency))
+    return runs
+
+
+def context(args) -> dict:
+    return {"items": args.items, "content": "x" * args.content_size, "deleted": itertools.count(1)}
+
+
+def settings(args) -> dict:
+    """
+    :return: Keyword arguments of every client measured.
+    """
+    return {"coalesce": args.coalesce, "flow_control": None if args.flow_control else False}
+
+
+def bench_client(name: str, args) -> dict:
+    cls, kind = CLIENTS[name]
+    runs = plan(kind, args)
+    deletes = sum(operations for key, scenario, operations, concurrency in runs if scenario.name == "delete")
+    if deletes > args.items:
+        raise SystemExit(f"{deletes} deletes need at least as many items, raise --items")
+    results = {}
+    with spawn(notes=args.items, bookmarks=args.items, latency=args.latency, content_size=args.content_size,
+               error_rate=args.error_rate, seed=args.seed) as host:
+        ctx = context(args)
+        if cls in (NotesAsyncClient, BookmarkAsyncClient):
+            async def main():
+                async with cls(host, ssl=False, limit=max(args.concurrency), **settings(args)) as client:
+                    for key, scenario, operations, concurrency in runs:
+                        if hasattr(client, scenario.method):
+                            results[key] = await run_async(client, scenario, operations, concurrency, ctx)
+            asyncio.run(main())
+        else:
+            with cls(host, ssl=False, pool_maxsize=max(args.concurrency), **settings(args)) as client:
+                for key, scenario, operations, concurrency in runs:
+                    if hasattr(client, scenario.method):
+                        results[key] = run_sync(client, scenario, operations, concurrency, ctx)
+    return results
+
+
+def version() -> dict:
+    try:
+        from importlib.metadata import version as installed
+        package = installed("nextcloud_apps_api")
+    except Exception:
+        package = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {"package": package, "commit": commit}
+
+
+def print_results(results: dict, baseline: dict = None):
+    for name, scenarios in results.items():
+        print(name)
+        for key, result in scenarios.items():
+            line = (f"  {key:<12} {result['throughput']:>9.1f} ops/s  p50 {result['latency_ms']['p50']:>8.2f} ms  "
+                    f"p99 {result['latency_ms']['p99']:>8.2f} ms  {result['errors']:>4} errors")
+            before = (baseline or {}).get(name, {}).get(key)
+            if before:
+                line += (f"  throughput x{result['throughput'] / before['throughput']:.2f}"
+                         f"  p50 x{result['latency_ms']['p50'] / before['latency_ms']['p50']:.2f}")
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", nargs="+", choices=list(CLIENTS), default=list(CLIENTS))
+    parser.add_argument("--scenarios", nargs="+", help="Only run these scenarios, e.g. get put")
+    parser.add_argument("--requests", type=int, default=200, help="Operations per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--items", type=int, default=1000, help="Notes and bookmarks held by the server")
+    parser.add_argument("--content-size", type=int, default=1024)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--coalesce", action="store_true", help="Let identical GETs in flight share one request")
+    parser.add_argument("--flow-control", action="store_true",
+                        help="Pace and retry requests with the default flow control, which caps requests in flight")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in ("requests", "concurrency", "items", "content_size", "latency",
+                                                  "error_rate", "seed", "coalesce", "flow_control")}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            previous = json.load(fp)
+        if previous.get("format") != REPORT_FORMAT or previous.get("config") != config:
+            print(f"warning: {args.compare} was run with other settings, ratios are not comparable", file=sys.stderr)
+        baseline = previous["results"]
+
+    warnings.simplefilter("ignore")
+    report = {
+        "format": REPORT_FORMAT,
+        "version": version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": config,
+        "results": {name: bench_client(name, args) for name in args.clients},
+    }
+    print_results(report["results"], baseline)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,34 @@
-from nextcloud_apps_api.notes import NotesClient, NotesAsyncClient
-from nextcloud_apps_api.bookmarks import BookmarkClient, BookmarkAsyncClient
\ No newline at end of file
+import importlib
+
+# Clients are imported on first access so that `import nextcloud_apps_api` stays cheap.
+_lazy_exports = {
+    "NotesClient": "nextcloud_apps_api.notes",
+    "NotesAsyncClient": "nextcloud_apps_api.notes",
+    "NotesMirror": "nextcloud_apps_api.notes.mirror",
+    "NotesAsyncMirror": "nextcloud_apps_api.notes.mirror",
+    "BookmarkClient": "nextcloud_apps_api.bookmarks",
+    "BookmarkAsyncClient": "nextcloud_apps_api.bookmarks",
+    "BulkResult": "nextcloud_apps_api.utils.base",
+    "Note": "nextcloud_apps_api.models",
+    "Bookmark": "nextcloud_apps_api.models",
+    "SearchIndex": "nextcloud_apps_api.index",
+    "Instrumentation": "nextcloud_apps_api.utils.metrics",
+    "FlowControl": "nextcloud_apps_api.utils.flow",
+    "AsyncFlowControl": "nextcloud_apps_api.utils.flow",
+    "ResponseCache": "nextcloud_apps_api.utils.cache",
+    "AsyncClientPool": "nextcloud_apps_api.pool",
+}
+
+__all__ = list(_lazy_exports)
+
+
+def __getattr__(name):
+    if name not in _lazy_exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy_exports[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
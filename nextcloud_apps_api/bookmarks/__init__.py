@@ -1,22 +1,56 @@
-import aiohttp
-import asyncio
-import requests
-from nextcloud_apps_api.utils.templates import *
+import collections
+import contextlib
+from nextcloud_apps_api.utils.query import *
 from nextcloud_apps_api.utils.custom_exceptions import *
+from nextcloud_apps_api.utils.base import BaseAsyncClient, BaseClient
+from nextcloud_apps_api.utils.codec import accept_encoding
+from nextcloud_apps_api.utils.streaming import NetscapeBookmarkStream
 
 
-class BookmarkAsyncClient:
+@contextlib.contextmanager
+def _open_destination(destination):
+    """
+    :param destination: Path or binary file object.
+    :return: Context manager giving a binary file object. For a path, the data goes to a temporary file next to it
+    that replaces it only once the block completed, so a failed export leaves an earlier one untouched.
+    """
+    if hasattr(destination, "write"):
+        yield destination
+        return
+    import os
+    import tempfile
+    directory, name = os.path.split(os.path.abspath(destination))
+    fd, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            yield fp
+        if os.path.exists(destination):
+            os.chmod(temporary, os.stat(destination).st_mode & 0o7777)
+        os.replace(temporary, destination)
+    except BaseException:
+        os.unlink(temporary)
+        raise
 
-    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True):
-        self.host = host
-        self.authorize = aiohttp.BasicAuth(username, password)
+
+class BookmarkAsyncClient(BaseAsyncClient):
+
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, **kwargs):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param kwargs: (optional) Connection pool, instrumentation, flow control, caching, write-behind and decoding settings. Includes 'limit:int', 'limit_per_host:int', 'keepalive_timeout:float', 'ttl_dns_cache:int', 'instrumentation:Instrumentation', 'flow_control:AsyncFlowControl', 'coalesce:bool', 'cache:ResponseCache', 'write_delay:float', 'max_write_delay:float', 'session:aiohttp.ClientSession', 'json_decoder:str'
+        """
+        import asyncio
+        super().__init__(host, username, password, ssl, **kwargs)
         self.loop = asyncio.get_running_loop()
-        self.ssl = ssl
 
-    async def get_bookmarks(self, id_: int = None, **kwargs):
+    async def get_bookmarks(self, id_: int = None, model: bool = False, **kwargs):
         """
         Gets booksmarks from server
         :param id_: (optional) ID of the desired bookmark. Defaults to None.
+        :param model: (optional) Return Bookmark records instead of Json.
         :param kwargs: (optional) Parameters for query. Includes tags:list, page:int, limit:int, sortby:str (one of url, title, description, public, lastmodified, clickcount), search:list (one of url, title, description, tags), conjunction:str ('and', 'or'), folder:int, url:str, unavailable, archive
         :return: Json of bookmarks
         """
@@ -27,12 +61,19 @@ class BookmarkAsyncClient:
             id_ = f"/{id_}"
         else:
             id_ = ""
-        query_string = id_ + bookmarks_template.render(params=params)
+        query_string = id_ + bookmarks_query(params)
         status, response = await self.__async_bookmarks(caller="GET", query=query_string)
         try:
-            return status, response['data']
+            bookmarks = response['data']
         except KeyError:
-            return status, response[0]
+            bookmarks = response['item']
+        if model:
+            from nextcloud_apps_api.models import Bookmark
+            if isinstance(bookmarks, list):
+                bookmarks = [Bookmark.from_dict(bookmark) for bookmark in bookmarks]
+            else:
+                bookmarks = Bookmark.from_dict(bookmarks)
+        return status, bookmarks
 
     async def post_bookmark(self, url: str, title: str = "", description: str = "", **kwargs):
         """
@@ -44,13 +85,14 @@ class BookmarkAsyncClient:
         :return: Json of bookmark
         """
         params = kwargs
-        query_string = bookmarks_template.render(params=params)
+        query_string = bookmarks_query(params)
         body = {
             "url": url,
             "title": title,
             "description": description,
         }
         status, bookmark = await self.__async_bookmarks(caller="POST", query=query_string, body=body)
+        self._notify("bookmark", "save", bookmark['item'])
         return status, bookmark['item']
 
     async def put_bookmark(self, id_: int, **kwargs):
@@ -58,12 +100,19 @@ class BookmarkAsyncClient:
         Update bookmark on the server.
         :param id_: ID of the bookmark to update
         :param kwargs: (optional) Fields to update in bookmark. Includes 'tags"list', 'title:str', 'description:str', 'folder:list'.
-        :return: Json of new bookmark.
+        :return: Json of new bookmark. With write_delay set, a future of it, done once the update is saved along with
+        the other updates of the bookmark buffered meanwhile.
         """
-        acceptable_params = ['tags,', 'title', 'description', 'folder']
+        acceptable_params = ['tags', 'title', 'description', 'folder']
         body = {k: kwargs[k] for k in acceptable_params if k in kwargs}
+        if self.write_delay is not None:
+            return self._defer(id_, None, body, self.__save_bookmark)
+        return await self.__save_bookmark(id_, None, body)
+
+    async def __save_bookmark(self, id_: int, etag: str, body: dict):
         query_string = f"/{id_}"
-        status, bookmark = await self.__async_bookmarks(caller="PUT", query=query_string, body=body)
+        status, bookmark = await self.__async_bookmarks(caller="PUT", query=query_string, body=bookmarks_form(body))
+        self._notify("bookmark", "save", bookmark['item'])
         return status, bookmark['item']
 
     async def delete_bookmark(self, id_):
@@ -71,17 +120,116 @@ class BookmarkAsyncClient:
         :param id_: ID of the bookmark to be deleted.
         :return: status of delete request.
         """
+        self._forget(id_)
         query_string = f"/{id_}"
         status, bookmarks = await self.__async_bookmarks(caller="DELETE", query=query_string)
+        self._notify("bookmark", "delete", {"id": id_})
         return status, bookmarks
 
-    async def export_bookmarks(self):
+    async def post_bookmarks(self, bookmarks: list, concurrency: int = None, progress=None):
+        """
+        Post many bookmarks concurrently. Failures are returned per bookmark instead of raised.
+        :param bookmarks: List of dicts with 'url:str' and optionally 'title:str', 'description:str', 'tags:list', 'folders:list'.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every bookmark.
+        :return: List of BulkResult(item, status, result, error) in the order of bookmarks.
+        """
+        calls = [((), dict(bookmark)) for bookmark in bookmarks]
+        return await self._bulk(self.post_bookmark, bookmarks, calls, concurrency, progress)
+
+    async def put_bookmarks(self, bookmarks: list, concurrency: int = None, progress=None):
         """
-        :return: Bookmarks in html format
+        Update many bookmarks concurrently. Failures are returned per bookmark instead of raised.
+        :param bookmarks: List of dicts with 'id:int' and the fields to update, as in put_bookmark.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every bookmark.
+        :return: List of BulkResult(item, status, result, error) in the order of bookmarks.
+        """
+        calls = [((bookmark['id'],), {k: v for k, v in bookmark.items() if k != 'id'}) for bookmark in bookmarks]
+        return await self._bulk(self.put_bookmark, bookmarks, calls, concurrency, progress)
+
+    async def delete_bookmarks(self, ids: list, concurrency: int = None, progress=None):
+        """
+        Delete many bookmarks concurrently. Failures are returned per bookmark instead of raised.
+        :param ids: List of bookmark ids.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every bookmark.
+        :return: List of BulkResult(item, status, result, error) in the order of ids.
+        """
+        calls = [((id_,), {}) for id_ in ids]
+        return await self._bulk(self.delete_bookmark, ids, calls, concurrency, progress)
+
+    async def export_bookmarks(self, destination=None, read_size: int = 65536):
+        """
+        Export bookmarks in the Netscape bookmark html format.
+        :param destination: (optional) Path or binary file object the export is written to as it is received. A path
+        is only replaced once the whole export was received.
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: status, Bookmarks in html format, or the number of bytes written if destination is given
         """
         query_string = "/export"
-        status, bookmarks = await self.__async_bookmarks(caller="GET", query=query_string)
-        return status, bookmarks
+        if destination is None:
+            status, bookmarks = await self.__async_bookmarks(caller="GET", query=query_string)
+            return status, bookmarks
+        written = 0
+        with _open_destination(destination) as fp:
+            stream = self.__async_bookmarks_stream(query_string, read_size)
+            status = await stream.__anext__()
+            async for data in stream:
+                written += fp.write(data)
+        return status, written
+
+    async def iter_exported_bookmarks(self, read_size: int = 65536):
+        """
+        Stream the export, parsing each bookmark as soon as its entry has been received.
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Async generator of dicts with 'url', 'title', 'description', 'tags', 'added', 'lastmodified' and 'folder'
+        """
+        parser = NetscapeBookmarkStream()
+        stream = self.__async_bookmarks_stream("/export", read_size)
+        await stream.__anext__()
+        async for data in stream:
+            for bookmark in parser.feed(data):
+                yield bookmark
+        for bookmark in parser.close():
+            yield bookmark
+
+    async def iter_bookmarks(self, limit: int = 100, concurrency: int = 4, **kwargs):
+        """
+        Iterate over every bookmark matching the query, requesting several pages at once.
+        Pages are yielded in order and the scan stops at the first page shorter than limit.
+        :param limit: Number of bookmarks per page.
+        :param concurrency: Number of pages requested at the same time.
+        :param kwargs: (optional) Parameters for query, as in get_bookmarks, except page and limit.
+        :return: Async generator of bookmarks
+        """
+        import asyncio
+        params = {key: kwargs[key] for key in kwargs.keys() if key not in ['page', 'limit']}
+        window = collections.deque()
+        page = 0
+        try:
+            while True:
+                while len(window) < concurrency:
+                    window.append(asyncio.ensure_future(self.get_bookmarks(page=page, limit=limit, **params)))
+                    page += 1
+                status, bookmarks = await window.popleft()
+                for bookmark in bookmarks:
+                    yield bookmark
+                if len(bookmarks) < limit:
+                    break
+        finally:
+            for fetch in window:
+                fetch.cancel()
+
+    async def scan_bookmarks(self, limit: int = 100, concurrency: int = 4, **kwargs):
+        """
+        Gets every bookmark matching the query, requesting several pages at once.
+        :param limit: Number of bookmarks per page.
+        :param concurrency: Number of pages requested at the same time.
+        :param kwargs: (optional) Parameters for query, as in get_bookmarks, except page and limit.
+        :return: List of bookmarks
+        """
+        return [bookmark async for bookmark in self.iter_bookmarks(limit=limit, concurrency=concurrency, **kwargs)]
 
     async def __async_bookmarks(self, caller: str, query: str = "", body: dict = {}):
         """
@@ -91,36 +239,65 @@ class BookmarkAsyncClient:
         :param body: Dict of values for making bookmarks.
         :return: Json of bookmarks
         """
-        # ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-        conn = aiohttp.TCPConnector(ssl=self.ssl)
         endpoint = f"/index.php/apps/bookmarks/public/rest/v2/bookmark{query}"
-        headers = {"Accept": "application/json"}
-        async with aiohttp.ClientSession(connector=conn) as session:
-            async with session.request(caller, self.host + endpoint,
-                                       auth=self.authorize, headers=headers, data=body) as response:
-                ok = response.ok
-                status = response.status
-                try:
-                    bookmarks = await response.json()
-                except Exception as e:
-                    bookmarks = await response.text()
-        if ok:
-            return status, bookmarks
-        else:
-            raise RequestError(f"The server returned a bad response: {status}")
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding()}
+
+        async def send():
+            with self._measure(caller, endpoint) as metrics:
+                async def read(response):
+                    try:
+                        return await self._read_json(response, metrics)
+                    except Exception as e:
+                        return await response.text()
+
+                response, bookmarks = await self._request(caller, endpoint, metrics, read, headers=headers, data=body)
+            ok = response.ok
+            status = response.status
+            if ok:
+                return status, bookmarks
+            else:
+                raise RequestError(f"The server returned a bad response: {status}", status=status)
 
+        if caller == "GET":
+            return await self._get_once(endpoint, send)
+        return await self._write(endpoint, send)
+
+    async def __async_bookmarks_stream(self, query: str, read_size: int):
+        """
+        Asynchronous streaming GET request to bookmarks api.
+        :param query: Query string for api
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Async generator of the status, then the bytes of the response body
+        """
+        endpoint = f"/index.php/apps/bookmarks/public/rest/v2/bookmark{query}"
+        headers = {"Accept-Encoding": accept_encoding()}
+        with self._measure("GET", endpoint) as metrics:
+            async with self._respond("GET", endpoint, metrics, headers=headers) as response:
+                if not response.ok:
+                    raise RequestError(f"The server returned a bad response: {response.status}",
+                                       status=response.status)
+                yield response.status
+                async for data in self._chunks(response, read_size, metrics):
+                    yield data
 
-class BookmarkClient:
 
-    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True):
-        self.host = host
-        self.authorize = requests.auth.HTTPBasicAuth(username, password)
-        self.ssl = ssl
+class BookmarkClient(BaseClient):
 
-    def get_bookmarks(self, id_: int = None, **kwargs):
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, **kwargs):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param kwargs: (optional) Connection pool, instrumentation, flow control, caching, write-behind and decoding settings. Includes 'pool_maxsize:int', 'pool_block:bool', 'max_workers:int', 'instrumentation:Instrumentation', 'flow_control:FlowControl', 'coalesce:bool', 'cache:ResponseCache', 'write_delay:float', 'max_write_delay:float', 'json_decoder:str'
+        """
+        super().__init__(host, username, password, ssl, **kwargs)
+
+    def get_bookmarks(self, id_: int = None, model: bool = False, **kwargs):
         """
         Gets booksmarks from server
         :param id_: (optional) ID of the desired bookmark. Defaults to None.
+        :param model: (optional) Return Bookmark records instead of Json.
         :param kwargs: (optional) Parameters for query. Includes tags:list, page:int, limit:int, sortby:str (one of url, title, description, public, lastmodified, clickcount), search:list (one of url, title, description, tags), conjunction:str ('and', 'or'), folder:int, url:str, unavailable, archive
         :return: Json of bookmarks
         """
@@ -131,12 +308,19 @@ class BookmarkClient:
             id_ = f"/{id_}"
         else:
             id_ = ""
-        query_string = id_ + bookmarks_template.render(params=params)
+        query_string = id_ + bookmarks_query(params)
         status, response = self.__bookmarks(caller="GET", query=query_string)
         try:
-            return status, response['data']
+            bookmarks = response['data']
         except KeyError:
-            return status, response[0]
+            bookmarks = response['item']
+        if model:
+            from nextcloud_apps_api.models import Bookmark
+            if isinstance(bookmarks, list):
+                bookmarks = [Bookmark.from_dict(bookmark) for bookmark in bookmarks]
+            else:
+                bookmarks = Bookmark.from_dict(bookmarks)
+        return status, bookmarks
 
     def post_bookmark(self, url: str, title: str = "", description: str = "", **kwargs):
         """
@@ -148,13 +332,14 @@ class BookmarkClient:
         :return: Json of bookmark
         """
         params = kwargs
-        query_string = bookmarks_template.render(params=params)
+        query_string = bookmarks_query(params)
         body = {
             "url": url,
             "title": title,
             "description": description,
         }
         status, bookmark = self.__bookmarks(caller="POST", query=query_string, body=body)
+        self._notify("bookmark", "save", bookmark['item'])
         return status, bookmark['item']
 
     def put_bookmark(self, id_: int, **kwargs):
@@ -162,12 +347,19 @@ class BookmarkClient:
         Update bookmark on the server.
         :param id_: ID of the bookmark to update
         :param kwargs: (optional) Fields to update in bookmark. Includes 'tags"list', 'title:str', 'description:str', 'folder:list'.
-        :return: Json of new bookmark.
+        :return: Json of new bookmark. With write_delay set, a future of it, done once the update is saved along with
+        the other updates of the bookmark buffered meanwhile.
         """
-        acceptable_params = ['tags,', 'title', 'description', 'folder']
+        acceptable_params = ['tags', 'title', 'description', 'folder']
         body = {k: kwargs[k] for k in acceptable_params if k in kwargs}
+        if self.write_delay is not None:
+            return self._defer(id_, None, body, self.__save_bookmark)
+        return self.__save_bookmark(id_, None, body)
+
+    def __save_bookmark(self, id_: int, etag: str, body: dict):
         query_string = f"/{id_}"
-        status, bookmark = self.__bookmarks(caller="PUT", query=query_string, body=body)
+        status, bookmark = self.__bookmarks(caller="PUT", query=query_string, body=bookmarks_form(body))
+        self._notify("bookmark", "save", bookmark['item'])
         return status, bookmark['item']
 
     def delete_bookmark(self, id_):
@@ -175,41 +367,129 @@ class BookmarkClient:
         :param id_: ID of the bookmark to be deleted.
         :return: status of delete request.
         """
+        self._forget(id_)
         query_string = f"/{id_}"
-        status, bookmarks = self.__async_bookmarks("DELETE", query=query_string)
+        status, bookmarks = self.__bookmarks("DELETE", query=query_string)
+        self._notify("bookmark", "delete", {"id": id_})
         return status, bookmarks
 
-    def export_bookmarks(self):
+    def export_bookmarks(self, destination=None, read_size: int = 65536):
         """
-        :return: Bookmarks in html format
+        Export bookmarks in the Netscape bookmark html format.
+        :param destination: (optional) Path or binary file object the export is written to as it is received. A path
+        is only replaced once the whole export was received.
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: status, Bookmarks in html format, or the number of bytes written if destination is given
         """
         query_string = "/export"
-        status, bookmarks = self.__bookmarks("EXPORT", query_string)
-        return status, bookmarks
+        if destination is None:
+            status, bookmarks = self.__bookmarks("GET", query_string)
+            return status, bookmarks
+        written = 0
+        with _open_destination(destination) as fp:
+            stream = self.__bookmarks_stream(query_string, read_size)
+            status = next(stream)
+            for data in stream:
+                written += fp.write(data)
+        return status, written
+
+    def iter_exported_bookmarks(self, read_size: int = 65536):
+        """
+        Stream the export, parsing each bookmark as soon as its entry has been received.
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Generator of dicts with 'url', 'title', 'description', 'tags', 'added', 'lastmodified' and 'folder'
+        """
+        parser = NetscapeBookmarkStream()
+        stream = self.__bookmarks_stream("/export", read_size)
+        next(stream)
+        for data in stream:
+            yield from parser.feed(data)
+        yield from parser.close()
+
+    def iter_bookmarks(self, limit: int = 100, concurrency: int = 4, **kwargs):
+        """
+        Iterate over every bookmark matching the query, requesting several pages at once.
+        Pages are yielded in order and the scan stops at the first page shorter than limit.
+        :param limit: Number of bookmarks per page.
+        :param concurrency: Number of pages requested at the same time.
+        :param kwargs: (optional) Parameters for query, as in get_bookmarks, except page and limit.
+        :return: Generator of bookmarks
+        """
+        params = {key: kwargs[key] for key in kwargs.keys() if key not in ['page', 'limit']}
+        # The window has threads of its own, so iterating inside map() or batch() is safe.
+        prefetch = self._background(concurrency)
+        window = collections.deque()
+        page = 0
+        try:
+            while True:
+                while len(window) < concurrency:
+                    window.append(prefetch.submit(self.get_bookmarks, page=page, limit=limit, **params))
+                    page += 1
+                status, bookmarks = window.popleft().result()
+                for bookmark in bookmarks:
+                    yield bookmark
+                if len(bookmarks) < limit:
+                    break
+        finally:
+            for fetch in window:
+                fetch.cancel()
+            prefetch.shutdown(wait=False)
+
+    def scan_bookmarks(self, limit: int = 100, concurrency: int = 4, **kwargs):
+        """
+        Gets every bookmark matching the query, requesting several pages at once.
+        :param limit: Number of bookmarks per page.
+        :param concurrency: Number of pages requested at the same time.
+        :param kwargs: (optional) Parameters for query, as in get_bookmarks, except page and limit.
+        :return: List of bookmarks
+        """
+        return list(self.iter_bookmarks(limit=limit, concurrency=concurrency, **kwargs))
 
     def __bookmarks(self, caller: str, query: str = "", body: dict = {}):
         """
-        Asynchronous request to bookmarks api.
+        Request to bookmarks api.
         :param caller: Method calling the api
         :param query: Query string for api
         :param body: Dict of values for making bookmarks.
         :return: Json of bookmarks
         """
-        # ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-        # conn = aiohttp.TCPConnector(ssl=self.ssl)
         endpoint = f"/index.php/apps/bookmarks/public/rest/v2/bookmark{query}"
-        headers = {"Accept": "application/json"}
-        with requests.Session() as session:
-            if caller == "GET":
-                with session.request(caller, self.host + endpoint,
-                                 auth=self.authorize, headers=headers, verify=self.ssl) as response:
-                    ok = response.ok
-                    status = response.status_code
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding()}
+
+        def send():
+            with self._measure(caller, endpoint) as metrics:
+                def read(response):
                     try:
-                        bookmarks = response.json()
+                        return self._read_json(response, metrics)
                     except Exception as e:
-                        bookmarks = response.text
-        if ok:
-            return status, bookmarks
-        else:
-            raise RequestError(f"The server returned a bad response: {status}")
+                        return response.text
+
+                response, bookmarks = self._request(caller, endpoint, metrics, read, headers=headers, data=body)
+            ok = response.ok
+            status = response.status_code
+            if ok:
+                return status, bookmarks
+            else:
+                raise RequestError(f"The server returned a bad response: {status}", status=status)
+
+        if caller == "GET":
+            return self._get_once(endpoint, send)
+        return self._write(endpoint, send)
+
+    def __bookmarks_stream(self, query: str, read_size: int):
+        """
+        Streaming GET request to bookmarks api.
+        :param query: Query string for api
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Generator of the status, then the bytes of the response body
+        """
+        endpoint = f"/index.php/apps/bookmarks/public/rest/v2/bookmark{query}"
+        headers = {"Accept-Encoding": accept_encoding()}
+        with self._measure("GET", endpoint) as metrics, \
+                self._respond("GET", endpoint, metrics, headers=headers, stream=True) as response:
+            if not response.ok:
+                raise RequestError(f"The server returned a bad response: {response.status_code}",
+                                   status=response.status_code)
+            yield response.status_code
+            for data in self._chunks(response, read_size, metrics):
+                yield data
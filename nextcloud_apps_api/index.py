@@ -0,0 +1,157 @@
+import re
+import threading
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _tokens(text) -> set:
+    if not text:
+        return set()
+    return set(_TOKEN.findall(str(text).lower()))
+
+
+def _as_dict(item) -> dict:
+    # Note and Bookmark records leave out content that was never loaded.
+    return item.to_dict() if hasattr(item, "to_dict") else item
+
+
+class SearchIndex:
+    """
+    In-process inverted index over notes and bookmarks.
+    Words of titles, content, descriptions and urls are indexed along with bookmark tags and note categories, so
+    searches are answered from memory instead of with a request to the server. Attach the index to a client with
+    watch() to keep it up to date with the notes and bookmarks posted, put or deleted through that client.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._words = {}
+        self._postings = {}
+        self._tags = {}
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def add_notes(self, notes):
+        """
+        :param notes: Notes as returned by get_notes, as Json or Note records.
+        """
+        for note in notes:
+            self.add_note(note)
+
+    def add_bookmarks(self, bookmarks):
+        """
+        :param bookmarks: Bookmarks as returned by get_bookmarks, as Json or Bookmark records.
+        """
+        for bookmark in bookmarks:
+            self.add_bookmark(bookmark)
+
+    def add_note(self, note):
+        """
+        Index a note, replacing any previous version of it.
+        :param note: Note as Json or Note record.
+        """
+        data = _as_dict(note)
+        words = _tokens(data.get('title')) | _tokens(data.get('content')) | _tokens(data.get('category'))
+        category = data.get('category')
+        self._add(("note", data['id']), note, words, (), [category] if category is not None else [])
+
+    def add_bookmark(self, bookmark):
+        """
+        Index a bookmark, replacing any previous version of it.
+        :param bookmark: Bookmark as Json or Bookmark record.
+        """
+        data = _as_dict(bookmark)
+        tags = data.get('tags') or []
+        words = _tokens(data.get('title')) | _tokens(data.get('description')) | _tokens(data.get('url'))
+        for tag in tags:
+            words |= _tokens(tag)
+        self._add(("bookmark", data['id']), bookmark, words, tags, ())
+
+    def remove_note(self, id_: int):
+        self._remove(("note", id_))
+
+    def remove_bookmark(self, id_: int):
+        self._remove(("bookmark", id_))
+
+    def search(self, search=None, tags=None, category: str = None, conjunction: str = "and", kind: str = None):
+        """
+        Find notes and bookmarks, mirroring the 'search', 'tags' and 'conjunction' parameters of get_bookmarks.
+        :param search: (optional) Word or list of words to look for.
+        :param tags: (optional) Tag or list of tags to look for.
+        :param category: (optional) Only return notes of this category.
+        :param conjunction: 'and' to match every word and tag, 'or' to match any of them.
+        :param kind: (optional) 'note' or 'bookmark' to return only one kind of item.
+        :return: List of matching notes and bookmarks as they were indexed, in no particular order.
+        """
+        if isinstance(search, str):
+            search = [search]
+        if isinstance(tags, str):
+            tags = [tags]
+        with self._lock:
+            sets = []
+            for word in search or []:
+                # A search word like 'c++' or 'foo-bar' splits into several index words, all of which must match.
+                tokens = _tokens(word)
+                postings = [self._postings.get(token, set()) for token in tokens]
+                sets.append(set.intersection(*sorted(postings, key=len)) if postings else set())
+            for tag in tags or []:
+                sets.append(self._tags.get(tag, set()))
+            if sets:
+                # Intersecting from the smallest set keeps every step as cheap as possible.
+                keys = set.intersection(*sorted(sets, key=len)) if conjunction == "and" else set.union(*sets)
+            else:
+                keys = set(self._items)
+            if category is not None:
+                keys &= self._categories.get(category, set())
+            if kind is not None:
+                keys = {key for key in keys if key[0] == kind}
+            return [self._items[key] for key in keys]
+
+    def watch(self, client):
+        """
+        Keep the index up to date with the changes made through a notes or bookmarks client.
+        :param client: Any of the notes or bookmarks clients.
+        """
+        client.add_listener(self._on_change)
+
+    def unwatch(self, client):
+        client.remove_listener(self._on_change)
+
+    def _on_change(self, kind: str, action: str, item: dict):
+        if action == "delete":
+            self._remove((kind, item['id']))
+        elif kind == "note":
+            self.add_note(item)
+        else:
+            self.add_bookmark(item)
+
+    def _add(self, key: tuple, item, words: set, tags, categories):
+        with self._lock:
+            self._discard(key)
+            self._items[key] = item
+            self._words[key] = (words, tuple(tags), tuple(categories))
+            for word in words:
+                self._postings.setdefault(word, set()).add(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            for category in categories:
+                self._categories.setdefault(category, set()).add(key)
+
+    def _remove(self, key: tuple):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: tuple):
+        if key not in self._items:
+            return
+        del self._items[key]
+        words, tags, categories = self._words.pop(key)
+        for index, values in ((self._postings, words), (self._tags, tags), (self._categories, categories)):
+            for value in values:
+                keys = index[value]
+                keys.discard(key)
+                if not keys:
+                    del index[value]
@@ -0,0 +1,202 @@
+import sys
+import threading
+
+# Marks note content that was excluded from the listing and has not been fetched yet.
+_NOT_LOADED = object()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Note:
+    """
+    Compact record of a note. Holds the same data as the Json returned by the notes api in far less memory.
+    If the note was listed without its content, the content is fetched on first access (see load_content).
+    """
+
+    __slots__ = ('id', 'etag', 'readonly', 'title', 'category', 'favorite', 'modified', 'extra', '_content',
+                 '_loader')
+    FIELDS = ('id', 'etag', 'readonly', 'title', 'category', 'favorite', 'modified')
+
+    def __init__(self, id: int, etag: str = None, readonly: bool = False, title: str = "", category: str = "",
+                 favorite: bool = False, modified: int = None, content=_NOT_LOADED, extra: dict = None,
+                 loader=None):
+        self.id = id
+        self.etag = etag
+        self.readonly = readonly
+        self.title = title
+        # Notes share a handful of categories, so share the strings too.
+        self.category = _intern(category)
+        self.favorite = favorite
+        self.modified = modified
+        self.extra = extra
+        self._content = content
+        self._loader = loader
+
+    @classmethod
+    def from_dict(cls, data: dict, loader=None):
+        """
+        :param data: Json of a note.
+        :param loader: (optional) Content loader of the client the note came from.
+        :return: Note
+        """
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS and k != 'content'}
+        return cls(content=data.get('content', _NOT_LOADED), extra=extra or None, loader=loader,
+                   **{k: data[k] for k in cls.FIELDS if k in data})
+
+    @property
+    def content_loaded(self) -> bool:
+        return self._content is not _NOT_LOADED
+
+    @property
+    def content(self) -> str:
+        """
+        Body of the note. Fetched from the server on first access if it was excluded from the listing.
+        Notes from an async client have to be loaded with 'await note.load_content()' first. Until then this raises
+        RuntimeError, which unlike AttributeError is not swallowed by hasattr or getattr with a default.
+        """
+        if self._content is _NOT_LOADED:
+            if self._loader is None or self._loader.is_async:
+                raise RuntimeError("Content of this note is not loaded, use 'await note.load_content()'")
+            self._loader.load(self)
+        return self._content
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+
+    def load_content(self):
+        """
+        Fetch the content if it is not loaded yet. Concurrent first loads run in parallel, up to the loader's concurrency.
+        :return: The content, or an awaitable of it for notes from an async client.
+        """
+        if self._content is _NOT_LOADED and self._loader is not None:
+            return self._loader.load(self)
+        if self._loader is not None and self._loader.is_async:
+            return _ready(self._content)
+        return self.content
+
+    def to_dict(self) -> dict:
+        """
+        :return: Json of the note, without content if it is not loaded.
+        """
+        data = {k: getattr(self, k) for k in self.FIELDS}
+        if self._content is not _NOT_LOADED:
+            data['content'] = self._content
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self):
+        return f"Note(id={self.id!r}, title={self.title!r}, category={self.category!r})"
+
+
+class Bookmark:
+    """
+    Compact record of a bookmark. Holds the same data as the Json returned by the bookmarks api in far less memory.
+    """
+
+    __slots__ = ('id', 'url', 'title', 'description', 'tags', 'folders', 'added', 'lastmodified', 'clickcount',
+                 'available', 'extra')
+    FIELDS = ('id', 'url', 'title', 'description', 'tags', 'folders', 'added', 'lastmodified', 'clickcount',
+              'available')
+
+    def __init__(self, id: int, url: str = "", title: str = "", description: str = "", tags=(), folders=(),
+                 added: int = None, lastmodified: int = None, clickcount: int = 0, available: bool = True,
+                 extra: dict = None):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.description = description
+        # Tags repeat across bookmarks, so share the strings and drop the list over-allocation.
+        self.tags = tuple(_intern(tag) for tag in tags)
+        self.folders = tuple(folders)
+        self.added = added
+        self.lastmodified = lastmodified
+        self.clickcount = clickcount
+        self.available = available
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        :param data: Json of a bookmark.
+        :return: Bookmark
+        """
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        return cls(extra=extra or None, **{k: data[k] for k in cls.FIELDS if k in data})
+
+    def to_dict(self) -> dict:
+        """
+        :return: Json of the bookmark.
+        """
+        data = {k: getattr(self, k) for k in self.FIELDS}
+        data['tags'] = list(self.tags)
+        data['folders'] = list(self.folders)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self):
+        return f"Bookmark(id={self.id!r}, url={self.url!r}, title={self.title!r})"
+
+
+async def _ready(value):
+    return value
+
+
+class ContentLoader:
+    """
+    Loads note content for a NotesClient. Each thread fetches the note it asks for, with at most concurrency requests
+    in flight. Threads asking for the same note share one request through the client's coalescing. Content is never
+    fetched by listing every note, which is the gateway timeout excluding it avoids.
+    """
+
+    is_async = False
+
+    def __init__(self, client, concurrency: int = 10):
+        """
+        :param client: NotesClient the notes came from.
+        :param concurrency: Maximum number of notes fetched at the same time.
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+
+    def load(self, note: Note) -> str:
+        with self._slots:
+            status, data = self.client.get_notes(note.id, _content_warning=False)
+        note._content = data.get('content')
+        return note._content
+
+
+class AsyncContentLoader:
+    """
+    Loads note content for a NotesAsyncClient, fetching each note that is asked for with at most concurrency requests
+    in flight. Loads of the same note share one request through the client's coalescing. Content is never fetched by
+    listing every note, which is the gateway timeout excluding it avoids.
+    """
+
+    is_async = True
+
+    def __init__(self, client, concurrency: int = 10):
+        """
+        :param client: NotesAsyncClient the notes came from.
+        :param concurrency: Maximum number of notes fetched at the same time.
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self._slots = None
+
+    def load(self, note: Note):
+        return self._load(note)
+
+    async def _load(self, note: Note) -> str:
+        import asyncio
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            status, data = await self.client.get_notes(note.id, _content_warning=False)
+        note._content = data.get('content')
+        return note._content
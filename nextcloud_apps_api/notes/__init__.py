@@ -1,21 +1,42 @@
+import importlib
 import warnings
-import aiohttp
-import asyncio
-import requests
-from nextcloud_apps_api.utils.templates import *
+from nextcloud_apps_api.utils.query import *
 from nextcloud_apps_api.utils.custom_exceptions import *
+from nextcloud_apps_api.utils.base import BaseAsyncClient, BaseClient
+from nextcloud_apps_api.utils.codec import accept_encoding
+from nextcloud_apps_api.utils.streaming import JsonArrayStream
 
+_lazy_exports = {
+    "NotesMirror": "nextcloud_apps_api.notes.mirror",
+    "NotesAsyncMirror": "nextcloud_apps_api.notes.mirror",
+}
 
-class NotesAsyncClient:
 
-    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True):
-        self.host = host
-        self.authorize = aiohttp.BasicAuth(username, password)
+def __getattr__(name):
+    if name not in _lazy_exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy_exports[name]), name)
+    globals()[name] = value
+    return value
+
+
+class NotesAsyncClient(BaseAsyncClient):
+
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, **kwargs):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param kwargs: (optional) Connection pool, instrumentation, flow control, caching, write-behind and decoding settings. Includes 'limit:int', 'limit_per_host:int', 'keepalive_timeout:float', 'ttl_dns_cache:int', 'instrumentation:Instrumentation', 'flow_control:AsyncFlowControl', 'coalesce:bool', 'cache:ResponseCache', 'write_delay:float', 'max_write_delay:float', 'session:aiohttp.ClientSession', 'json_decoder:str'
+        """
+        import asyncio
+        super().__init__(host, username, password, ssl, **kwargs)
         # self.loop = self.get_or_create_eventloop()
         self.loop = asyncio.get_running_loop()
-        self.ssl = ssl
 
     def get_or_create_eventloop(self):
+        import asyncio
         try:
             return asyncio.get_event_loop()
         except RuntimeError as ex:
@@ -24,10 +45,11 @@ class NotesAsyncClient:
                 asyncio.set_event_loop(loop)
                 return asyncio.get_event_loop()
 
-    async def get_notes(self, id_: int = None, **kwargs):
+    async def get_notes(self, id_: int = None, model: bool = False, **kwargs):
         """
         Get a list of notes with specified parameters.
         :param id_: (optional) the id of the desired note. Defaults to None.
+        :param model: (optional) Return Note records instead of Json. Excluded content is then loaded on first use.
         :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int', 'chunkSize:int', 'chunkCursor:int'
         :return: Json of notes
         """
@@ -37,16 +59,27 @@ class NotesAsyncClient:
             id_ = f"/notes/{id_}"
         else:
             id_ = "/notes"
-        if not "exclude" in params:
-            warnings.warn("--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
-        else:
-            if not "content" in params['exclude']:
-                warnings.warn(
-                    "--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
-        query_string = id_ + notes_template.render(params=params)
+        # Requests the package makes itself, e.g. for the content of one note, pass _content_warning=False.
+        if kwargs.get("_content_warning", True):
+            if not "exclude" in params:
+                warnings.warn("--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
+            else:
+                if not "content" in params['exclude']:
+                    warnings.warn(
+                        "--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
+        query_string = id_ + notes_query(params)
         status, notes = await self.__async_notes(caller="GET", query=query_string)
+        if model:
+            notes = self.__to_model(notes)
         return status, notes
 
+    def __to_model(self, notes):
+        from nextcloud_apps_api.models import Note, AsyncContentLoader
+        if getattr(self, "_content_loader", None) is None:
+            self._content_loader = AsyncContentLoader(self)
+        if isinstance(notes, list):
+            return [Note.from_dict(note, self._content_loader) for note in notes]
+        return Note.from_dict(notes, self._content_loader)
 
     async def post_note(self, title: str, content: str, category: str = ""):
         """
@@ -63,19 +96,29 @@ class NotesAsyncClient:
             "category": category
         }
         status, notes = await self.__async_notes(caller="POST", query=query_string, body=body)
+        self._notify("note", "save", notes)
         return status, notes
 
-    async def put_note(self, id_: int, **kwargs):
+    async def put_note(self, id_: int, etag: str = None, **kwargs):
         """
         Update note on the server.
         :param id_: ID of the note to update
+        :param etag: (optional) ETag the note is expected to have. The server refuses the update with 412 if it changed.
         :param kwargs: (optional) Fields to update in note. Includes 'title:str', 'content:str', 'category:str'.
-        :return:
+        :return: status, Json of the note. With write_delay set, a future of it, done once the update is saved along
+        with the other updates of the note buffered meanwhile.
         """
         acceptable_params = ['title', 'content', 'category']
         body = {k: kwargs[k] for k in acceptable_params if k in kwargs}
+        if self.write_delay is not None:
+            return self._defer(id_, etag, body, self.__save_note)
+        return await self.__save_note(id_, etag, body)
+
+    async def __save_note(self, id_: int, etag: str, body: dict):
         query_string = f"/notes/{id_}"
-        status, notes = await self.__async_notes(caller="PUT", query=query_string, body=body)
+        headers = {"If-Match": f'"{etag}"'} if etag else None
+        status, notes = await self.__async_notes(caller="PUT", query=query_string, body=body, headers=headers)
+        self._notify("note", "save", notes)
         return status, notes
 
     async def delete_note(self, id_:int):
@@ -84,10 +127,60 @@ class NotesAsyncClient:
         :param id_: ID of the note to update
         :return:
         """
+        self._forget(id_)
         query_string = f"/notes/{id_}"
         status, notes = await self.__async_notes(caller="DELETE", query=query_string)
+        self._notify("note", "delete", {"id": id_})
         return status, notes
 
+    async def post_notes(self, notes: list, concurrency: int = None, progress=None):
+        """
+        Post many notes concurrently. Failures are returned per note instead of raised.
+        :param notes: List of dicts with 'title:str', 'content:str' and optionally 'category:str'.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every note.
+        :return: List of BulkResult(item, status, result, error) in the order of notes.
+        """
+        calls = [((), {k: note[k] for k in ['title', 'content', 'category'] if k in note}) for note in notes]
+        return await self._bulk(self.post_note, notes, calls, concurrency, progress)
+
+    async def put_notes(self, notes: list, concurrency: int = None, progress=None):
+        """
+        Update many notes concurrently. Failures are returned per note instead of raised.
+        :param notes: List of dicts with 'id:int' and the fields to update, as in put_note.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every note.
+        :return: List of BulkResult(item, status, result, error) in the order of notes.
+        """
+        calls = [((note['id'],), {k: v for k, v in note.items() if k != 'id'}) for note in notes]
+        return await self._bulk(self.put_note, notes, calls, concurrency, progress)
+
+    async def delete_notes(self, ids: list, concurrency: int = None, progress=None):
+        """
+        Delete many notes concurrently. Failures are returned per note instead of raised.
+        :param ids: List of note ids.
+        :param concurrency: Maximum number of requests in flight. Defaults to the max_limit of the flow control.
+        :param progress: (optional) Callable receiving (done, total) after every note.
+        :return: List of BulkResult(item, status, result, error) in the order of ids.
+        """
+        calls = [((id_,), {}) for id_ in ids]
+        return await self._bulk(self.delete_note, ids, calls, concurrency, progress)
+
+    async def get_notes_if_changed(self, etag: str = None, **kwargs):
+        """
+        Get the list of notes only if it changed since etag was returned.
+        :param etag: (optional) ETag returned by a previous call.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: status, Json of notes (None if unchanged), ETag of the list
+        """
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params and kwargs[key] is not None}
+        query_string = "/notes" + notes_query(params)
+        headers = {"If-None-Match": f'"{etag}"'} if etag else None
+        status, notes, response_headers = await self.__async_notes(caller="GET", query=query_string,
+                                                                   headers=headers, return_headers=True)
+        return status, notes, response_headers.get("ETag", "").strip('"') or None
+
     async def get_settings(self):
         query_string = "/settings"
         status, settings = await self.__async_notes(caller="GET", query=query_string)
@@ -98,41 +191,128 @@ class NotesAsyncClient:
         status, settings = await self.__async_notes(caller="PUT", body=kwargs, query=query_string)
         return status, settings
 
-    async def __async_notes(self, caller: str, query: str = "", body:dict = {}):
+    async def iter_notes(self, chunk_size: int = 100, **kwargs):
+        """
+        Iterate over all notes, following the chunk cursor automatically.
+        The next chunk is requested while the current one is being consumed, so at most two chunks are held in memory.
+        :param chunk_size: Number of notes requested per chunk.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: Async generator of notes
+        """
+        import asyncio
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params}
+        params['chunkSize'] = chunk_size
+        fetch = asyncio.ensure_future(self.__notes_chunk(params))
+        try:
+            while fetch is not None:
+                notes, cursor = await fetch
+                if cursor:
+                    fetch = asyncio.ensure_future(self.__notes_chunk(dict(params, chunkCursor=cursor)))
+                else:
+                    fetch = None
+                for note in notes:
+                    yield note
+        finally:
+            if fetch is not None:
+                fetch.cancel()
+
+    async def stream_notes(self, read_size: int = 65536, **kwargs):
+        """
+        Stream the list of notes, decoding them from the response as it arrives.
+        Memory use stays at about one note however many notes the account holds. get_notes still returns the whole list.
+        :param read_size: Number of bytes read from the connection at a time.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: Async generator of notes
+        """
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params}
+        query_string = "/notes" + notes_query(params)
+        async for note in self.__async_notes_stream(query_string, read_size):
+            yield note
+
+    async def __notes_chunk(self, params: dict):
+        query_string = "/notes" + notes_query(params)
+        status, notes, headers = await self.__async_notes(caller="GET", query=query_string, return_headers=True)
+        return notes, headers.get("X-Notes-Chunk-Cursor")
+
+    async def __async_notes(self, caller: str, query: str = "", body:dict = {}, headers: dict = None,
+                            return_headers: bool = False):
         """
         Asynchronous request to notes api.
         :param caller: Method calling the api
         :param query: Query string for api
         :param body: Dict of values for making note.
+        :param headers: (optional) Extra request headers.
+        :param return_headers: Also return the response headers.
         :return: Json of notes
         """
-        # ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-        conn = aiohttp.TCPConnector(ssl=self.ssl)
         endpoint = f"/index.php/apps/notes/api/v1{query}"
-        headers = {"Accept": "application/json"}
-        async with aiohttp.ClientSession(connector=conn) as session:
-            async with session.request(caller, self.host + endpoint,
-                                       auth=self.authorize, headers=headers, data=body) as response:
-                ok = response.ok
-                status = response.status
-                notes = await response.json()
-        if ok:
-            return status, notes
+        extra_headers = headers
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding(), **(headers or {})}
+
+        async def send():
+            with self._measure(caller, endpoint) as metrics:
+                async def read(response):
+                    # Error responses and 304 Not Modified carry no notes.
+                    if response.ok and response.status != 304:
+                        return await self._read_json(response, metrics)
+                    return None
+
+                response, notes = await self._request(caller, endpoint, metrics, read, headers=headers, data=body)
+            ok = response.ok
+            status = response.status
+            if ok:
+                return status, notes, response.headers
+            else:
+                raise RequestError(f"The server returned a bad response: {status}", status=status)
+
+        if caller == "GET":
+            status, notes, response_headers = await self._get_once(endpoint, send, extra_headers)
         else:
-            raise RequestError(f"The server returned a bad response: {status}")
+            status, notes, response_headers = await self._write(endpoint, send)
+        if return_headers:
+            return status, notes, response_headers
+        return status, notes
 
+    async def __async_notes_stream(self, query: str, read_size: int):
+        """
+        Asynchronous streaming GET request to notes api.
+        :param query: Query string for api
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Async generator of the elements of the returned list
+        """
+        endpoint = f"/index.php/apps/notes/api/v1{query}"
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding()}
+        with self._measure("GET", endpoint) as metrics:
+            async with self._respond("GET", endpoint, metrics, headers=headers) as response:
+                if not response.ok:
+                    raise RequestError(f"The server returned a bad response: {response.status}",
+                                       status=response.status)
+                stream = JsonArrayStream()
+                async for data in self._chunks(response, read_size, metrics):
+                    for note in stream.feed(data):
+                        yield note
+                stream.close()
 
-class NotesClient:
 
-    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True):
-        self.host = host
-        self.authorize = requests.auth.HTTPBasicAuth(username, password)
-        self.ssl = ssl
+class NotesClient(BaseClient):
 
-    def get_notes(self, id_: int = None, **kwargs):
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, **kwargs):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param kwargs: (optional) Connection pool, instrumentation, flow control, caching, write-behind and decoding settings. Includes 'pool_maxsize:int', 'pool_block:bool', 'max_workers:int', 'instrumentation:Instrumentation', 'flow_control:FlowControl', 'coalesce:bool', 'cache:ResponseCache', 'write_delay:float', 'max_write_delay:float', 'json_decoder:str'
+        """
+        super().__init__(host, username, password, ssl, **kwargs)
+
+    def get_notes(self, id_: int = None, model: bool = False, **kwargs):
         """
         Get a list of notes with specified parameters.
         :param id_: (optional) the id of the desired note. Defaults to None.
+        :param model: (optional) Return Note records instead of Json. Excluded content is then loaded on first use.
         :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int', 'chunkSize:int', 'chunkCursor:int'
         :return: Json of notes
         """
@@ -142,16 +322,27 @@ class NotesClient:
             id_ = f"/notes/{id_}"
         else:
             id_ = "/notes"
-        if not "exclude" in params:
-            warnings.warn("--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
-        else:
-            if not "content" in params['exclude']:
-                warnings.warn(
-                    "--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
-        query_string = id_ + notes_template.render(params=params)
+        # Requests the package makes itself, e.g. for the content of one note, pass _content_warning=False.
+        if kwargs.get("_content_warning", True):
+            if not "exclude" in params:
+                warnings.warn("--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
+            else:
+                if not "content" in params['exclude']:
+                    warnings.warn(
+                        "--Not excluding content could lead to too much data returning and a gateway timeout! Please consider using 'exclude=[\'content\']'--")
+        query_string = id_ + notes_query(params)
         status, notes = self.__notes(caller="GET", query=query_string)
+        if model:
+            notes = self.__to_model(notes)
         return status, notes
 
+    def __to_model(self, notes):
+        from nextcloud_apps_api.models import Note, ContentLoader
+        if getattr(self, "_content_loader", None) is None:
+            self._content_loader = ContentLoader(self)
+        if isinstance(notes, list):
+            return [Note.from_dict(note, self._content_loader) for note in notes]
+        return Note.from_dict(notes, self._content_loader)
 
     def post_note(self, title: str, content: str, category: str = ""):
         """
@@ -168,19 +359,29 @@ class NotesClient:
             "category": category
         }
         status, notes = self.__notes(caller="POST", query=query_string, body=body)
+        self._notify("note", "save", notes)
         return status, notes
 
-    def put_note(self, id_: int, **kwargs):
+    def put_note(self, id_: int, etag: str = None, **kwargs):
         """
         Update note on the server.
         :param id_: ID of the note to update
+        :param etag: (optional) ETag the note is expected to have. The server refuses the update with 412 if it changed.
         :param kwargs: (optional) Fields to update in note. Includes 'title:str', 'content:str', 'category:str'.
-        :return:
+        :return: status, Json of the note. With write_delay set, a future of it, done once the update is saved along
+        with the other updates of the note buffered meanwhile.
         """
         acceptable_params = ['title', 'content', 'category']
         body = {k: kwargs[k] for k in acceptable_params if k in kwargs}
+        if self.write_delay is not None:
+            return self._defer(id_, etag, body, self.__save_note)
+        return self.__save_note(id_, etag, body)
+
+    def __save_note(self, id_: int, etag: str, body: dict):
         query_string = f"/notes/{id_}"
-        status, notes = self.__notes(caller="PUT", query=query_string, body=body)
+        headers = {"If-Match": f'"{etag}"'} if etag else None
+        status, notes = self.__notes(caller="PUT", query=query_string, body=body, headers=headers)
+        self._notify("note", "save", notes)
         return status, notes
 
     def delete_note(self, id_:int):
@@ -189,10 +390,27 @@ class NotesClient:
         :param id_: ID of the note to update
         :return:
         """
+        self._forget(id_)
         query_string = f"/notes/{id_}"
         status, notes = self.__notes(caller="DELETE", query=query_string)
+        self._notify("note", "delete", {"id": id_})
         return status, notes
 
+    def get_notes_if_changed(self, etag: str = None, **kwargs):
+        """
+        Get the list of notes only if it changed since etag was returned.
+        :param etag: (optional) ETag returned by a previous call.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: status, Json of notes (None if unchanged), ETag of the list
+        """
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params and kwargs[key] is not None}
+        query_string = "/notes" + notes_query(params)
+        headers = {"If-None-Match": f'"{etag}"'} if etag else None
+        status, notes, response_headers = self.__notes(caller="GET", query=query_string, headers=headers,
+                                                       return_headers=True)
+        return status, notes, response_headers.get("ETag", "").strip('"') or None
+
     def get_settings(self):
         query_string = "/settings"
         status, settings = self.__notes(caller="GET", query=query_string)
@@ -203,25 +421,107 @@ class NotesClient:
         status, settings = self.__notes(caller="PUT", body=kwargs, query=query_string)
         return status, settings
 
-    def __notes(self, caller: str, query: str = "", body:dict = {}):
+    def iter_notes(self, chunk_size: int = 100, **kwargs):
+        """
+        Iterate over all notes, following the chunk cursor automatically.
+        The next chunk is requested while the current one is being consumed, so at most two chunks are held in memory.
+        It is requested on a thread of the generator's own, so iterating inside map() or batch() is safe.
+        :param chunk_size: Number of notes requested per chunk.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: Generator of notes
+        """
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params}
+        params['chunkSize'] = chunk_size
+        prefetch = self._background()
+        fetch = prefetch.submit(self.__notes_chunk, params)
+        try:
+            while fetch is not None:
+                notes, cursor = fetch.result()
+                if cursor:
+                    fetch = prefetch.submit(self.__notes_chunk, dict(params, chunkCursor=cursor))
+                else:
+                    fetch = None
+                for note in notes:
+                    yield note
+        finally:
+            if fetch is not None:
+                fetch.cancel()
+            # A chunk already being fetched finishes on its own.
+            prefetch.shutdown(wait=False)
+
+    def stream_notes(self, read_size: int = 65536, **kwargs):
+        """
+        Stream the list of notes, decoding them from the response as it arrives.
+        Memory use stays at about one note however many notes the account holds. get_notes still returns the whole list.
+        :param read_size: Number of bytes read from the connection at a time.
+        :param kwargs: (optional) Parameters for query. Includes 'category:str', 'exclude:str or list', 'pruneBefore:int'
+        :return: Generator of notes
+        """
+        acceptable_params = ['category', 'exclude', 'pruneBefore']
+        params = {key: kwargs[key] for key in kwargs.keys() if key in acceptable_params}
+        query_string = "/notes" + notes_query(params)
+        yield from self.__notes_stream(query_string, read_size)
+
+    def __notes_chunk(self, params: dict):
+        query_string = "/notes" + notes_query(params)
+        status, notes, headers = self.__notes(caller="GET", query=query_string, return_headers=True)
+        return notes, headers.get("X-Notes-Chunk-Cursor")
+
+    def __notes(self, caller: str, query: str = "", body:dict = {}, headers: dict = None,
+                   return_headers: bool = False):
         """
         Request to notes api.
         :param caller: Method calling the api
         :param query: Query string for api
         :param body: Dict of values for making note.
+        :param headers: (optional) Extra request headers.
+        :param return_headers: Also return the response headers.
         :return: Json of notes
         """
-
         endpoint = f"/index.php/apps/notes/api/v1{query}"
-        print(endpoint)
-        headers = {"Accept": "application/json"}
-        with requests.Session() as session:
-            with session.request(caller, self.host + endpoint,
-                                       auth=self.authorize, headers=headers, data=body, verify=self.ssl) as response:
-                ok = response.ok
-                status = response.status_code
-                notes = response.json()
-        if ok:
-            return status, notes
+        extra_headers = headers
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding(), **(headers or {})}
+
+        def send():
+            with self._measure(caller, endpoint) as metrics:
+                def read(response):
+                    # Error responses and 304 Not Modified carry no notes.
+                    if response.ok and response.status_code != 304:
+                        return self._read_json(response, metrics)
+                    return None
+
+                response, notes = self._request(caller, endpoint, metrics, read, headers=headers, data=body)
+            ok = response.ok
+            status = response.status_code
+            if ok:
+                return status, notes, response.headers
+            else:
+                raise RequestError(f"The server returned a bad response: {status}", status=status)
+
+        if caller == "GET":
+            status, notes, response_headers = self._get_once(endpoint, send, extra_headers)
         else:
-            raise RequestError(f"The server returned a bad response: {status}")
\ No newline at end of file
+            status, notes, response_headers = self._write(endpoint, send)
+        if return_headers:
+            return status, notes, response_headers
+        return status, notes
+
+    def __notes_stream(self, query: str, read_size: int):
+        """
+        Streaming GET request to notes api.
+        :param query: Query string for api
+        :param read_size: Number of bytes read from the connection at a time.
+        :return: Generator of the elements of the returned list
+        """
+        endpoint = f"/index.php/apps/notes/api/v1{query}"
+        headers = {"Accept": "application/json", "Accept-Encoding": accept_encoding()}
+        with self._measure("GET", endpoint) as metrics, \
+                self._respond("GET", endpoint, metrics, headers=headers, stream=True) as response:
+            if not response.ok:
+                raise RequestError(f"The server returned a bad response: {response.status_code}",
+                                   status=response.status_code)
+            stream = JsonArrayStream()
+            for data in self._chunks(response, read_size, metrics):
+                yield from stream.feed(data)
+            stream.close()
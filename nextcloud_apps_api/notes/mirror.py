@@ -0,0 +1,357 @@
+import json
+import sqlite3
+import threading
+from nextcloud_apps_api.utils.custom_exceptions import *
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL DEFAULT '',
+    etag TEXT,
+    state TEXT NOT NULL DEFAULT 'clean',
+    data TEXT NOT NULL,
+    remote TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_category ON notes (category);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+class NotesMirror:
+    """
+    Local SQLite replica of the notes of one account.
+    sync() pulls only what changed since the last sync, using pruneBefore and the ETag of the notes list. Reads never
+    touch the network. Local edits are kept as pending until push() sends them back; if the note changed on the
+    server in the meantime it is marked as a conflict instead of being overwritten.
+    Row states are 'clean', 'created', 'modified', 'deleted' and 'conflict'.
+    """
+
+    def __init__(self, client, path: str = ":memory:"):
+        """
+        :param client: NotesClient used to reach the server.
+        :param path: Path of the SQLite database. Defaults to an in-memory database.
+        """
+        self.client = client
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def sync(self):
+        """
+        Pull changes from the server into the replica.
+        :return: Number of notes added, updated or removed locally.
+        """
+        prune_before = self._get_meta("prune_before")
+        status, notes, etag = self.client.get_notes_if_changed(
+            etag=self._get_meta("etag"), pruneBefore=int(prune_before) if prune_before else None)
+        fetched = {}
+        for id_ in self._unseen(notes):
+            try:
+                fetched[id_] = self._fetch_remote(id_)
+            except RequestError as e:
+                if e.status != 404:
+                    raise
+        return self._apply_pull(notes, etag, fetched)
+
+    def push(self):
+        """
+        Send pending local changes to the server.
+        :return: List of ids that ended up in conflict.
+        """
+        conflicts = []
+        for id_, state, etag, note in self._pending():
+            try:
+                if state == "created":
+                    status, created = self.client.post_note(note['title'], note['content'], note.get('category', ""))
+                    self._pushed(id_, created)
+                elif state == "modified":
+                    status, updated = self.client._settled(self.client.put_note(
+                        id_, etag=etag, title=note['title'], content=note['content'],
+                        category=note.get('category', "")))
+                    self._pushed(id_, updated)
+                else:
+                    self.client.delete_note(id_)
+                    self._pushed(id_, None)
+            except RequestError as e:
+                remote = self._fetch_remote(id_) if e.status == 412 else None
+                outcome = self._push_failed(id_, state, e, remote)
+                if outcome is None:
+                    raise
+                if outcome == "conflict":
+                    conflicts.append(id_)
+        return conflicts
+
+    def list_notes(self, category: str = None):
+        """
+        :param category: (optional) Only return notes in this category.
+        :return: List of local notes.
+        """
+        if category is None:
+            rows = self._query("SELECT data FROM notes WHERE state != 'deleted' ORDER BY id")
+        else:
+            rows = self._query("SELECT data FROM notes WHERE state != 'deleted' AND category = ? ORDER BY id",
+                               (category,))
+        return [json.loads(data) for data, in rows]
+
+    def get_note(self, id_: int):
+        """
+        :param id_: ID of the note.
+        :return: Local note, or None if it is not in the replica.
+        """
+        rows = self._query("SELECT data FROM notes WHERE id = ? AND state != 'deleted'", (id_,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def create_note(self, title: str, content: str, category: str = ""):
+        """
+        Create a note locally. It gets a negative id until push() posts it.
+        :return: The local note.
+        """
+        with self._lock, self._db:
+            (low,), = self._db.execute("SELECT MIN(MIN(id), 0) FROM notes").fetchall()
+            note = {"id": (low or 0) - 1, "title": title, "content": content, "category": category}
+            self._db.execute("INSERT INTO notes (id, category, state, data) VALUES (?, ?, 'created', ?)",
+                             (note['id'], category, json.dumps(note)))
+        return note
+
+    def update_note(self, id_: int, **kwargs):
+        """
+        Change a note locally.
+        :param id_: ID of the note.
+        :param kwargs: Fields to update. Includes 'title:str', 'content:str', 'category:str'.
+        :return: The updated local note.
+        """
+        acceptable_params = ['title', 'content', 'category']
+        with self._lock, self._db:
+            state, note = self._row(id_)
+            note.update({k: kwargs[k] for k in acceptable_params if k in kwargs})
+            if state == "clean":
+                state = "modified"
+            self._db.execute("UPDATE notes SET category = ?, state = ?, data = ? WHERE id = ?",
+                             (note.get('category', ""), state, json.dumps(note), id_))
+        return note
+
+    def remove_note(self, id_: int):
+        """
+        Delete a note locally.
+        :param id_: ID of the note.
+        """
+        with self._lock, self._db:
+            state, note = self._row(id_)
+            if state == "created":
+                self._db.execute("DELETE FROM notes WHERE id = ?", (id_,))
+            else:
+                self._db.execute("UPDATE notes SET state = 'deleted' WHERE id = ?", (id_,))
+
+    def conflicts(self):
+        """
+        :return: List of (local note, server note) pairs. The server note is None if it was deleted on the server.
+        """
+        rows = self._query("SELECT data, remote FROM notes WHERE state = 'conflict' ORDER BY id")
+        return [(json.loads(data), json.loads(remote) if remote else None) for data, remote in rows]
+
+    def resolve(self, id_: int, keep: str = "local"):
+        """
+        Settle a conflict.
+        :param id_: ID of the note in conflict.
+        :param keep: 'local' to push the local version on the next push(), 'remote' to take the server version.
+        """
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT data, remote FROM notes WHERE id = ? AND state = 'conflict'",
+                                    (id_,)).fetchall()
+            if not rows:
+                raise KeyError(id_)
+            data, remote = rows[0]
+            remote = json.loads(remote) if remote else None
+            if keep == "remote":
+                if remote is None:
+                    self._db.execute("DELETE FROM notes WHERE id = ?", (id_,))
+                else:
+                    self._store(remote)
+            elif remote is None:
+                # Deleted on the server: recreate it.
+                note = json.loads(data)
+                (low,), = self._db.execute("SELECT MIN(MIN(id), 0) FROM notes").fetchall()
+                note['id'] = (low or 0) - 1
+                self._db.execute("DELETE FROM notes WHERE id = ?", (id_,))
+                self._db.execute("INSERT INTO notes (id, category, state, data) VALUES (?, ?, 'created', ?)",
+                                 (note['id'], note.get('category', ""), json.dumps(note)))
+            else:
+                self._db.execute("UPDATE notes SET state = 'modified', etag = ?, remote = NULL WHERE id = ?",
+                                 (remote.get('etag'), id_))
+
+    def _unseen(self, notes) -> list:
+        """
+        :return: Ids of the pruned stubs among notes that the replica does not hold. Stubs only mean unchanged since
+        the last sync, and a note added with an older modification time, e.g. moved in from elsewhere, was never
+        pulled.
+        """
+        if notes is None:
+            return []
+        known = {id_ for id_, in self._query("SELECT id FROM notes WHERE id > 0")}
+        return [note['id'] for note in notes if len(note) == 1 and note['id'] not in known]
+
+    def _apply_pull(self, notes, etag: str, fetched: dict):
+        """
+        :param fetched: Full notes of the unseen stubs, by id. Stubs missing from it were deleted in the meantime.
+        """
+        if notes is None:
+            return 0
+        changed = 0
+        seen = set()
+        newest = int(self._get_meta("prune_before") or 0)
+        with self._lock, self._db:
+            local = {id_: (state, known) for id_, state, known in
+                     self._db.execute("SELECT id, state, etag FROM notes WHERE id > 0")}
+            for note in notes:
+                seen.add(note['id'])
+                if len(note) == 1:
+                    if note['id'] not in fetched:
+                        # Pruned: unchanged since the last sync.
+                        continue
+                    note = fetched[note['id']]
+                newest = max(newest, note.get('modified', 0))
+                state, known = local.get(note['id'], ("clean", None))
+                if state == "clean":
+                    if known != note.get('etag'):
+                        self._store(note)
+                        changed += 1
+                elif state == "conflict" or known != note.get('etag'):
+                    self._conflict(note['id'], note)
+                    changed += 1
+            for id_, (state, known) in local.items():
+                if id_ in seen:
+                    continue
+                if state in ("clean", "deleted"):
+                    self._db.execute("DELETE FROM notes WHERE id = ?", (id_,))
+                else:
+                    self._conflict(id_, None)
+                changed += 1
+            self._set_meta("etag", etag)
+            self._set_meta("prune_before", newest)
+        return changed
+
+    def _pending(self):
+        rows = self._query("SELECT id, state, etag, data FROM notes WHERE state IN ('created', 'modified', 'deleted') "
+                           "ORDER BY id")
+        return [(id_, state, etag, json.loads(data)) for id_, state, etag, data in rows]
+
+    def _pushed(self, id_: int, note: dict):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM notes WHERE id = ?", (id_,))
+            if note is not None:
+                self._store(note)
+
+    def _fetch_remote(self, id_: int):
+        # A single note is small, the content warning does not apply.
+        status, note = self.client.get_notes(id_, _content_warning=False)
+        return note
+
+    def _push_failed(self, id_: int, state: str, error: RequestError, remote: dict = None):
+        """
+        :return: 'gone' if the note was already deleted, 'conflict' if a conflict was recorded, None otherwise.
+        """
+        if state == "deleted" and error.status == 404:
+            self._pushed(id_, None)
+            return "gone"
+        if state in ("modified", "deleted") and error.status in (404, 412):
+            with self._lock, self._db:
+                self._conflict(id_, remote)
+            return "conflict"
+        return None
+
+    def _store(self, note: dict):
+        self._db.execute("INSERT OR REPLACE INTO notes (id, category, etag, state, data, remote) "
+                         "VALUES (?, ?, ?, 'clean', ?, NULL)",
+                         (note['id'], note.get('category', ""), note.get('etag'), json.dumps(note)))
+
+    def _conflict(self, id_: int, remote):
+        self._db.execute("UPDATE notes SET state = 'conflict', remote = ? WHERE id = ?",
+                         (json.dumps(remote) if remote is not None else None, id_))
+
+    def _row(self, id_: int):
+        rows = self._db.execute("SELECT state, data FROM notes WHERE id = ? AND state != 'deleted'",
+                                (id_,)).fetchall()
+        if not rows:
+            raise KeyError(id_)
+        return rows[0][0], json.loads(rows[0][1])
+
+    def _query(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _get_meta(self, key: str):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (key, str(value) if value is not None else None))
+
+
+class NotesAsyncMirror(NotesMirror):
+    """
+    NotesMirror backed by a NotesAsyncClient. sync() and push() are coroutines; reads and local edits are not.
+    """
+
+    async def sync(self):
+        """
+        Pull changes from the server into the replica.
+        :return: Number of notes added, updated or removed locally.
+        """
+        prune_before = self._get_meta("prune_before")
+        status, notes, etag = await self.client.get_notes_if_changed(
+            etag=self._get_meta("etag"), pruneBefore=int(prune_before) if prune_before else None)
+        fetched = {}
+        for id_ in self._unseen(notes):
+            try:
+                fetched[id_] = await self._fetch_remote(id_)
+            except RequestError as e:
+                if e.status != 404:
+                    raise
+        return self._apply_pull(notes, etag, fetched)
+
+    async def _fetch_remote(self, id_: int):
+        status, note = await self.client.get_notes(id_, _content_warning=False)
+        return note
+
+    async def push(self):
+        """
+        Send pending local changes to the server.
+        :return: List of ids that ended up in conflict.
+        """
+        conflicts = []
+        for id_, state, etag, note in self._pending():
+            try:
+                if state == "created":
+                    status, created = await self.client.post_note(note['title'], note['content'],
+                                                                  note.get('category', ""))
+                    self._pushed(id_, created)
+                elif state == "modified":
+                    status, updated = await self.client._settled(await self.client.put_note(
+                        id_, etag=etag, title=note['title'], content=note['content'],
+                        category=note.get('category', "")))
+                    self._pushed(id_, updated)
+                else:
+                    await self.client.delete_note(id_)
+                    self._pushed(id_, None)
+            except RequestError as e:
+                remote = await self._fetch_remote(id_) if e.status == 412 else None
+                outcome = self._push_failed(id_, state, e, remote)
+                if outcome is None:
+                    raise
+                if outcome == "conflict":
+                    conflicts.append(id_)
+        return conflicts
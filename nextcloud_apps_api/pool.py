@@ -0,0 +1,264 @@
+from nextcloud_apps_api.utils.base import BulkResult, make_connector
+from nextcloud_apps_api.utils.flow import AsyncFlowControl
+
+
+class _Failed:
+
+    __slots__ = ('error',)
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class AsyncClientPool:
+    """
+    Notes and bookmarks clients for many accounts, on many servers, sharing one connection pool.
+    Every server gets at most limit_per_host connections and one AsyncFlowControl shared by all of its accounts, so a
+    busy server slows down its own accounts only. The fan-out methods query all accounts concurrently and yield the
+    results merged in the order they arrive.
+    Use as an async context manager, or call close() when finished.
+    """
+
+    def __init__(self, ssl: bool = True, limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 15.0,
+                 ttl_dns_cache: int = 300, instrumentation=None, **client_kwargs):
+        """
+        :param ssl: Whether to verify ssl certificates.
+        :param limit: Total number of simultaneous connections to all servers. 0 for no limit.
+        :param limit_per_host: Number of simultaneous connections to a single server. 0 for no limit.
+        :param keepalive_timeout: Seconds an idle connection is kept open for reuse.
+        :param ttl_dns_cache: Seconds resolved addresses are cached. None to cache forever.
+        :param instrumentation: (optional) Instrumentation collecting metrics of every request of every account.
+        :param client_kwargs: (optional) Settings of every client. Includes 'coalesce:bool', 'cache:ResponseCache',
+        'write_delay:float', 'max_write_delay:float', 'flow_control:AsyncFlowControl'. Every client gets its own
+        cache with the settings of the one given.
+        """
+        self.ssl = ssl
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.instrumentation = instrumentation
+        self.client_kwargs = client_kwargs
+        self._accounts = {}
+        self._clients = {}
+        self._flow_controls = {}
+        self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def accounts(self) -> list:
+        """
+        :return: Names of the accounts, in the order they were added.
+        """
+        return list(self._accounts)
+
+    def add_account(self, host: str, username: str = "", password: str = "", name: str = None) -> str:
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param name: (optional) Name of the account in the pool. Defaults to 'username@host'.
+        :return: Name of the account.
+        """
+        name = name or f"{username}@{host}"
+        if name in self._accounts:
+            raise ValueError(f"Account {name!r} is already in the pool")
+        self._accounts[name] = (host, username, password)
+        return name
+
+    async def remove_account(self, name: str):
+        """
+        Saves the buffered updates of an account and removes it from the pool.
+        """
+        del self._accounts[name]
+        for kind in ("notes", "bookmarks"):
+            client = self._clients.pop((name, kind), None)
+            if client is not None:
+                await client.close()
+
+    async def open(self):
+        """
+        Creates the shared session if it is not already open.
+        :return: The shared aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            import aiohttp
+            trace_configs = [self.instrumentation.trace_config()] if self.instrumentation is not None else None
+            connector = make_connector(self.ssl, self.limit, self.limit_per_host, self.keepalive_timeout,
+                                       self.ttl_dns_cache)
+            # Accounts of the same server must not share its session cookies.
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs,
+                                                  cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def close(self):
+        """
+        Saves the buffered updates of every client, then closes the shared session and all of its connections.
+        """
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def notes(self, name: str):
+        """
+        :param name: Name of the account.
+        :return: NotesAsyncClient of the account.
+        """
+        from nextcloud_apps_api.notes import NotesAsyncClient
+        return await self._client(name, "notes", NotesAsyncClient)
+
+    async def bookmarks(self, name: str):
+        """
+        :param name: Name of the account.
+        :return: BookmarkAsyncClient of the account.
+        """
+        from nextcloud_apps_api.bookmarks import BookmarkAsyncClient
+        return await self._client(name, "bookmarks", BookmarkAsyncClient)
+
+    async def fan_out(self, kind: str, method: str, *args, accounts: list = None, concurrency: int = None,
+                      **kwargs):
+        """
+        Calls the same client method for many accounts at once, e.g. fan_out("notes", "get_settings").
+        :param kind: 'notes' or 'bookmarks'.
+        :param method: Name of the client method, returning status, result.
+        :param args: Positional arguments of every call.
+        :param accounts: (optional) Names of the accounts to call. Defaults to all of them.
+        :param concurrency: (optional) Number of accounts called at the same time. Defaults to all of them.
+        :param kwargs: Keyword arguments of every call.
+        :return: Async generator of BulkResult(account, status, result, error), in the order the calls finish.
+        """
+        import asyncio
+        semaphore = asyncio.Semaphore(concurrency or len(self._accounts) or 1)
+
+        async def call(name):
+            async with semaphore:
+                client = await (self.notes(name) if kind == "notes" else self.bookmarks(name))
+                try:
+                    status, result = await client._settled(await getattr(client, method)(*args, **kwargs))
+                    return BulkResult(name, status, result, None)
+                except Exception as e:
+                    return BulkResult(name, getattr(e, "status", None), None, e)
+
+        tasks = [asyncio.ensure_future(call(name)) for name in self._select(accounts)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def iter_notes(self, accounts: list = None, concurrency: int = None, return_exceptions: bool = False,
+                   **kwargs):
+        """
+        Streams the notes of many accounts at once, see NotesAsyncClient.stream_notes.
+        :param accounts: (optional) Names of the accounts to read. Defaults to all of them.
+        :param concurrency: (optional) Number of accounts read at the same time. Defaults to all of them.
+        :param return_exceptions: Yield (account, exception) for accounts that failed instead of raising the first
+        error.
+        :param kwargs: (optional) Parameters for query, as in stream_notes.
+        :return: Async generator of (account, note), in the order the notes arrive.
+        """
+        async def produce(name):
+            client = await self.notes(name)
+            async for note in client.stream_notes(**kwargs):
+                yield note
+
+        return self._merge(self._select(accounts), produce, concurrency, return_exceptions)
+
+    def iter_bookmarks(self, accounts: list = None, concurrency: int = None, return_exceptions: bool = False,
+                       **kwargs):
+        """
+        Pages through the bookmarks of many accounts at once, see BookmarkAsyncClient.iter_bookmarks.
+        :param accounts: (optional) Names of the accounts to read. Defaults to all of them.
+        :param concurrency: (optional) Number of accounts read at the same time. Defaults to all of them.
+        :param return_exceptions: Yield (account, exception) for accounts that failed instead of raising the first
+        error.
+        :param kwargs: (optional) Parameters for query, as in iter_bookmarks.
+        :return: Async generator of (account, bookmark), in the order the bookmarks arrive.
+        """
+        async def produce(name):
+            client = await self.bookmarks(name)
+            async for bookmark in client.iter_bookmarks(**kwargs):
+                yield bookmark
+
+        return self._merge(self._select(accounts), produce, concurrency, return_exceptions)
+
+    def _select(self, accounts: list = None) -> list:
+        if accounts is None:
+            return list(self._accounts)
+        unknown = [name for name in accounts if name not in self._accounts]
+        if unknown:
+            raise KeyError(unknown[0])
+        return list(accounts)
+
+    async def _client(self, name: str, kind: str, cls):
+        client = self._clients.get((name, kind))
+        if client is None:
+            host, username, password = self._accounts[name]
+            session = await self.open()
+            kwargs = dict(self.client_kwargs)
+            if "flow_control" not in kwargs:
+                kwargs["flow_control"] = self._flow_control(host)
+            cache = kwargs.get("cache")
+            if cache is not None:
+                # Cache entries are keyed on the url only, so accounts of one server must not share them.
+                kwargs["cache"] = type(cache)(maxsize=cache.maxsize, ttl=cache.ttl)
+            client = self._clients[(name, kind)] = cls(host, username, password, self.ssl, session=session,
+                                                       instrumentation=self.instrumentation, **kwargs)
+        return client
+
+    def _flow_control(self, host: str):
+        flow_control = self._flow_controls.get(host)
+        if flow_control is None:
+            # Never aim for more requests in flight than the server gets connections.
+            max_limit = self.limit_per_host or self.limit or 100
+            flow_control = self._flow_controls[host] = AsyncFlowControl(initial_limit=min(10, max_limit),
+                                                                        max_limit=max_limit)
+        return flow_control
+
+    async def _merge(self, accounts: list, produce, concurrency: int, return_exceptions: bool):
+        import asyncio
+        # Bounded, so that slow consumers hold back the readers instead of buffering whole accounts.
+        queue = asyncio.Queue(maxsize=1000)
+        semaphore = asyncio.Semaphore(concurrency or len(accounts) or 1)
+        finished = object()
+
+        async def pump(name):
+            try:
+                async with semaphore:
+                    async for item in produce(name):
+                        await queue.put((name, item))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put((name, _Failed(e)))
+            else:
+                await queue.put((name, finished))
+
+        tasks = [asyncio.ensure_future(pump(name)) for name in accounts]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                name, item = await queue.get()
+                if item is finished:
+                    remaining -= 1
+                    continue
+                if isinstance(item, _Failed):
+                    remaining -= 1
+                    if not return_exceptions:
+                        raise item.error
+                    item = item.error
+                yield name, item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,724 @@
+import collections
+import contextlib
+import threading
+import time
+import weakref
+from nextcloud_apps_api.utils.cache import affected
+from nextcloud_apps_api.utils.codec import make_decoder
+from nextcloud_apps_api.utils.flow import FlowControl, AsyncFlowControl
+from nextcloud_apps_api.utils.writebehind import WriteBehind, AsyncWriteBehind
+
+# aiohttp, asyncio and requests are imported when a client is created, so that importing the package, or using only
+# one of the transports, does not pay for loading the other.
+
+# Outcome of one operation of a bulk call. error is None if it succeeded.
+BulkResult = collections.namedtuple("BulkResult", ["item", "status", "result", "error"])
+
+
+def make_connector(ssl: bool = True, limit: int = 100, limit_per_host: int = 0, keepalive_timeout: float = 15.0,
+                   ttl_dns_cache: int = 300):
+    """
+    :return: aiohttp.TCPConnector pooling connections as described in BaseAsyncClient.
+    """
+    import aiohttp
+    try:
+        import aiodns
+    except ImportError:
+        aiodns = None
+    # aiodns resolves without tying up the default executor; fall back to getaddrinfo if it is missing.
+    resolver = aiohttp.AsyncResolver() if aiodns is not None else None
+    return aiohttp.TCPConnector(ssl=ssl, limit=limit, limit_per_host=limit_per_host,
+                                keepalive_timeout=keepalive_timeout, use_dns_cache=True, ttl_dns_cache=ttl_dns_cache,
+                                resolver=resolver)
+
+
+class ChangeListeners:
+    """
+    Lets other objects follow the notes and bookmarks a client creates, updates and deletes.
+    """
+
+    _listeners = ()
+
+    def add_listener(self, listener):
+        """
+        :param listener: Callable receiving (kind:str 'note' or 'bookmark', action:str 'save' or 'delete', item:dict)
+        after every successful write. For deletes item only holds the 'id'.
+        """
+        self._listeners = tuple(self._listeners) + (listener,)
+
+    def remove_listener(self, listener):
+        self._listeners = tuple(l for l in self._listeners if l != listener)
+
+    def _notify(self, kind: str, action: str, item: dict):
+        for listener in self._listeners:
+            listener(kind, action, item)
+
+
+class BaseAsyncClient(ChangeListeners):
+    """
+    Owns the pooled aiohttp session shared by every request an async client makes.
+    Use as an async context manager, or call close() when finished.
+    """
+
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, limit: int = 100,
+                 limit_per_host: int = 0, keepalive_timeout: float = 15.0, ttl_dns_cache: int = 300,
+                 instrumentation=None, flow_control=None, coalesce: bool = True, cache=None,
+                 write_delay: float = None, max_write_delay: float = 10.0, session=None, json_decoder=None):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param limit: Total number of simultaneous connections in the pool. 0 for no limit.
+        :param limit_per_host: Number of simultaneous connections to a single host. 0 for no limit.
+        :param keepalive_timeout: Seconds an idle connection is kept open for reuse.
+        :param ttl_dns_cache: Seconds resolved addresses are cached. None to cache forever.
+        :param instrumentation: (optional) Instrumentation collecting metrics of every request.
+        :param flow_control: (optional) AsyncFlowControl pacing and retrying the requests, e.g. one shared with other
+        clients of the same server. Defaults to a new AsyncFlowControl; False sends every request at once and never
+        retries.
+        :param coalesce: Whether concurrent identical GET requests share one request and its result.
+        :param cache: (optional) ResponseCache answering repeated GET requests. Writes through the client invalidate it.
+        :param write_delay: (optional) Turns on write-behind: updates are buffered per id and saved with one PUT once
+        no update for that id came in for write_delay seconds. Updates then return a future of their result.
+        :param max_write_delay: Seconds after which buffered updates of an id are saved even if more keep coming in.
+        :param session: (optional) aiohttp.ClientSession to send the requests with, e.g. one shared by the clients of
+        an AsyncClientPool. The pool settings above then do not apply, and the session is left open by close().
+        :param json_decoder: (optional) 'orjson', 'msgspec', 'json' or a callable decoding Json from bytes. Defaults to
+        the fastest one installed.
+        """
+        import aiohttp
+        self.host = host
+        self.authorize = aiohttp.BasicAuth(username, password)
+        self.ssl = ssl
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.instrumentation = instrumentation
+        self.flow_control = AsyncFlowControl() if flow_control is None else flow_control or None
+        self.coalesce = coalesce
+        self.cache = cache
+        self.write_delay = write_delay
+        self.max_write_delay = max_write_delay
+        self.json_loads = make_decoder(json_decoder)
+        self._write_behind = None
+        self._flights = {}
+        self._waiters = {}
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """
+        Creates the pooled session if it is not already open.
+        :return: The shared aiohttp.ClientSession
+        """
+        if self._owns_session and (self._session is None or self._session.closed):
+            import aiohttp
+            trace_configs = [self.instrumentation.trace_config()] if self.instrumentation is not None else None
+            self._session = aiohttp.ClientSession(connector=self._make_connector(), trace_configs=trace_configs)
+        return self._session
+
+    async def close(self):
+        """
+        Saves buffered updates, then closes the pooled session and all of its connections.
+        """
+        if self._write_behind is not None:
+            await self._write_behind.close()
+            self._write_behind = None
+        if self._owns_session:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+    async def flush(self):
+        """
+        Saves all updates buffered by write-behind and waits until they are saved.
+        """
+        if self._write_behind is not None:
+            await self._write_behind.flush()
+
+    def _defer(self, id_, etag: str, fields: dict, send):
+        """
+        Buffers an update for write-behind.
+        :param send: Coroutine function (id_, etag, fields) saving the merged update.
+        :return: asyncio.Future of (status, result)
+        """
+        if self._write_behind is None:
+            self._write_behind = AsyncWriteBehind(send, self.write_delay, self.max_write_delay)
+        return self._write_behind.update(id_, etag, fields)
+
+    def _forget(self, id_):
+        """
+        Drops the updates buffered for an id that is being deleted.
+        """
+        if self._write_behind is not None:
+            self._write_behind.discard(id_)
+
+    def _measure(self, method: str, endpoint: str):
+        """
+        :return: Context manager giving the RequestMetrics of a request, or None if the client is not instrumented.
+        """
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.measure(method, endpoint)
+
+    async def _get_once(self, endpoint: str, send, headers: dict = None):
+        """
+        Answers a GET request from the cache, or from the same request already in flight, before sending it.
+        :param endpoint: Path and query string of the request.
+        :param send: Coroutine function making the request.
+        :param headers: (optional) Extra request headers. Requests with extra headers, e.g. conditional ones, are not
+        cached.
+        :return: Result of send
+        """
+        import asyncio
+        key = self.host + endpoint
+        cache = self.cache if not headers else None
+        if cache is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        if not self.coalesce:
+            generation = cache.generation if cache is not None else None
+            result = await send()
+            if cache is not None:
+                cache.set(key, result, generation)
+            return result
+        flight = (key, tuple(sorted((headers or {}).items())))
+        task = self._flights.get(flight)
+        if task is None:
+            generation = cache.generation if cache is not None else None
+            task = self._flights[flight] = asyncio.ensure_future(send())
+
+            def landed(task):
+                if self._flights.get(flight) is task:
+                    del self._flights[flight]
+                # Retrieved even when no caller is left to, so a failure is not reported as unhandled.
+                if not task.cancelled() and task.exception() is None and cache is not None:
+                    cache.set(key, task.result(), generation)
+
+            task.add_done_callback(landed)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # One caller giving up must not cancel the request for the others.
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # The last one giving up does.
+                    if self._flights.get(flight) is task:
+                        del self._flights[flight]
+                    task.cancel()
+
+    async def _write(self, endpoint: str, send):
+        """
+        Sends a write request, then drops the cached results it may have changed.
+        GET requests in flight that it may change are not joined by later callers, before and after the write, so
+        that reads made once it is done see it.
+        :param endpoint: Path and query string of the request.
+        :param send: Coroutine function making the request.
+        :return: Result of send
+        """
+        self._land(endpoint)
+        try:
+            return await send()
+        finally:
+            self._land(endpoint)
+            if self.cache is not None:
+                self.cache.invalidate(self.host + endpoint)
+
+    def _land(self, endpoint: str):
+        # The requests keep running for the callers already waiting on them.
+        for flight in [flight for flight in self._flights if affected(self.host + endpoint, flight[0])]:
+            del self._flights[flight]
+
+    async def _request(self, caller: str, endpoint: str, metrics, read, **kwargs):
+        """
+        Sends a request through the flow control, retrying it while the server is overloaded.
+        :param caller: Method of the request.
+        :param endpoint: Path and query string of the request.
+        :param metrics: RequestMetrics of the request, or None.
+        :param read: Coroutine function turning the final response into the result.
+        :param kwargs: Arguments for aiohttp, e.g. 'headers', 'data'.
+        :return: response, result
+        """
+        async with self._respond(caller, endpoint, metrics, **kwargs) as response:
+            return response, await read(response)
+
+    @contextlib.asynccontextmanager
+    async def _respond(self, caller: str, endpoint: str, metrics, **kwargs):
+        """
+        Sends a request through the flow control, retrying it while the server is overloaded, e.g. for a response
+        that is read as a stream. Retries end once the final response is handed out.
+        :param caller: Method of the request.
+        :param endpoint: Path and query string of the request.
+        :param metrics: RequestMetrics of the request, or None.
+        :param kwargs: Arguments for aiohttp, e.g. 'headers', 'data'.
+        :return: Async context manager giving the final response, with its body not read yet.
+        """
+        import asyncio
+        session = await self.open()
+        flow = self.flow_control
+        attempt = 0
+        while True:
+            ticket = await flow.acquire() if flow is not None else None
+            try:
+                async with session.request(caller, self.host + endpoint, auth=self.authorize,
+                                           trace_request_ctx=metrics, **kwargs) as response:
+                    delay = None
+                    if flow is not None:
+                        delay = flow.finish(ticket, caller, response.status, response.headers.get("Retry-After"),
+                                            attempt)
+                        ticket = None
+                    if delay is None:
+                        yield response
+                        return
+            finally:
+                if ticket is not None:
+                    flow.finish(ticket)
+            if metrics is not None:
+                metrics.retries += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _read_json(self, response, metrics):
+        """
+        Reads and decodes a Json response, timing both steps if the request is measured.
+        """
+        if metrics is None:
+            return self._decode(await response.read())
+        start = time.perf_counter()
+        body = await response.read()
+        downloaded = time.perf_counter()
+        metrics.mark("download", downloaded - start)
+        data = self._decode(body)
+        metrics.mark("decode", time.perf_counter() - downloaded)
+        return data
+
+    def _decode(self, body: bytes):
+        # An empty body, e.g. of a 204, decodes to None rather than failing.
+        return self.json_loads(body) if body.strip() else None
+
+    async def _chunks(self, response, read_size: int, metrics):
+        """
+        Reads a response body as it arrives, counting its bytes and the time spent waiting for them if the request is
+        measured. Chunks read this way pass by the trace config.
+        :return: Async generator of bytes
+        """
+        chunks = response.content.iter_chunked(read_size)
+        while True:
+            start = time.perf_counter()
+            try:
+                data = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            if metrics is not None:
+                metrics.mark("download", time.perf_counter() - start)
+                metrics.bytes_received += len(data)
+            yield data
+
+    async def _bulk(self, method, items: list, calls: list, concurrency: int, progress=None):
+        """
+        Runs method once per call with at most concurrency calls in flight.
+        :param method: Client coroutine function returning status, result.
+        :param items: Item each call was made for, reported back in its BulkResult.
+        :param calls: (args, kwargs) of each call.
+        :param concurrency: Maximum number of requests in flight. None for the max_limit of the flow control, or 10
+        without one.
+        :param progress: (optional) Callable receiving (done, total) after every operation.
+        :return: List of BulkResult in the order of items.
+        """
+        import asyncio
+        if concurrency is None:
+            # Within the cap, the flow control keeps as many requests in flight as the server sustains.
+            concurrency = self.flow_control.max_limit if self.flow_control is not None else 10
+        total = len(items)
+        results = [None] * total
+        # Workers take the next call as they finish one, so there are never more than concurrency tasks.
+        work = iter(enumerate(zip(items, calls)))
+        done = 0
+
+        async def run():
+            nonlocal done
+            for index, (item, (args, kwargs)) in work:
+                try:
+                    status, result = await self._settled(await method(*args, **kwargs))
+                    results[index] = BulkResult(item, status, result, None)
+                except Exception as e:
+                    results[index] = BulkResult(item, getattr(e, "status", None), None, e)
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+
+        await asyncio.gather(*(run() for _ in range(min(concurrency, total))))
+        return results
+
+    @staticmethod
+    async def _settled(result):
+        # Updates buffered by write-behind give a future of their result.
+        import asyncio
+        return await result if isinstance(result, asyncio.Future) else result
+
+    def _make_connector(self):
+        return make_connector(self.ssl, self.limit, self.limit_per_host, self.keepalive_timeout, self.ttl_dns_cache)
+
+
+class BaseClient(ChangeListeners):
+    """
+    Owns the connection pool shared by every request a sync client makes.
+    The client may be shared between threads: each thread gets its own requests.Session, all of them mounted on
+    the same HTTPAdapter, so connections are pooled across threads.
+    """
+
+    def __init__(self, host: str, username: str = "", password: str = "", ssl: bool = True, pool_maxsize: int = 10,
+                 pool_block: bool = False, max_workers: int = None, instrumentation=None, flow_control=None,
+                 coalesce: bool = True, cache=None, write_delay: float = None, max_write_delay: float = 10.0,
+                 json_decoder=None):
+        """
+        :param host: Address of the nextcloud server.
+        :param username: Nextcloud username.
+        :param password: Nextcloud password or app password.
+        :param ssl: Whether to verify ssl certificates.
+        :param pool_maxsize: Number of connections kept open for reuse.
+        :param pool_block: Whether to wait for a free connection instead of opening one beyond pool_maxsize.
+        :param max_workers: Threads used by map() and batch(). Defaults to pool_maxsize. Prefetching and write-behind
+        run on threads of their own, so calls made through map() can use them.
+        :param instrumentation: (optional) Instrumentation collecting metrics of every request.
+        :param flow_control: (optional) FlowControl pacing and retrying the requests, e.g. one shared with other
+        clients of the same server. Defaults to a new FlowControl; False sends every request at once and never retries.
+        :param coalesce: Whether concurrent identical GET requests share one request and its result.
+        :param cache: (optional) ResponseCache answering repeated GET requests. Writes through the client invalidate it.
+        :param write_delay: (optional) Turns on write-behind: updates are buffered per id and saved with one PUT once
+        no update for that id came in for write_delay seconds. Updates then return a future of their result.
+        :param max_write_delay: Seconds after which buffered updates of an id are saved even if more keep coming in.
+        :param json_decoder: (optional) 'orjson', 'msgspec', 'json' or a callable decoding Json from bytes. Defaults to
+        the fastest one installed.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.host = host
+        self.authorize = requests.auth.HTTPBasicAuth(username, password)
+        self.ssl = ssl
+        self.max_workers = max_workers or pool_maxsize
+        self.instrumentation = instrumentation
+        self.flow_control = FlowControl() if flow_control is None else flow_control or None
+        self.coalesce = coalesce
+        self.cache = cache
+        self.write_delay = write_delay
+        self.max_write_delay = max_write_delay
+        self.json_loads = make_decoder(json_decoder)
+        self._write_behind = None
+        self._flights = {}
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._local = threading.local()
+        # Sessions of threads that ended are dropped with their thread-local storage. Closing one would close the
+        # shared adapter.
+        self._sessions = weakref.WeakSet()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def session(self):
+        """
+        :return: The requests.Session of the calling thread.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def close(self):
+        """
+        Saves buffered updates, shuts down the worker threads and closes all pooled connections.
+        """
+        with self._lock:
+            write_behind, self._write_behind = self._write_behind, None
+        if write_behind is not None:
+            write_behind.close()
+        with self._lock:
+            executor, self._executor = self._executor, None
+            sessions, self._sessions = list(self._sessions), weakref.WeakSet()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+        self._local = threading.local()
+
+    def map(self, method, *iterables, return_exceptions: bool = False):
+        """
+        Calls a client method concurrently for every set of arguments, like the builtin map.
+        :param method: Name of the client method or a callable, e.g. "get_notes".
+        :param iterables: Positional arguments for each call.
+        :param return_exceptions: Return raised exceptions in place of results instead of raising the first one.
+        :return: List of results in the order of the arguments.
+        """
+        return self._run_batch(method, [(args, {}) for args in zip(*iterables)], return_exceptions)
+
+    def batch(self, method, calls, return_exceptions: bool = False):
+        """
+        Calls a client method concurrently once per dict of keyword arguments.
+        :param method: Name of the client method or a callable, e.g. "put_note".
+        :param calls: Iterable of keyword argument dicts, e.g. [{'id_': 1, 'title': 'New'}].
+        :param return_exceptions: Return raised exceptions in place of results instead of raising the first one.
+        :return: List of results in the order of the calls.
+        """
+        return self._run_batch(method, [((), kwargs) for kwargs in calls], return_exceptions)
+
+    def flush(self):
+        """
+        Saves all updates buffered by write-behind and waits until they are saved.
+        """
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def _defer(self, id_, etag: str, fields: dict, send):
+        """
+        Buffers an update for write-behind.
+        :param send: Callable (id_, etag, fields) saving the merged update.
+        :return: concurrent.futures.Future of (status, result)
+        """
+        with self._lock:
+            if self._write_behind is None:
+                self._write_behind = WriteBehind(send, self.write_delay, self.max_write_delay, self.max_workers)
+            write_behind = self._write_behind
+        return write_behind.update(id_, etag, fields)
+
+    def _forget(self, id_):
+        """
+        Drops the updates buffered for an id that is being deleted.
+        """
+        if self._write_behind is not None:
+            self._write_behind.discard(id_)
+
+    def _measure(self, method: str, endpoint: str):
+        """
+        :return: Context manager giving the RequestMetrics of a request, or None if the client is not instrumented.
+        """
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.measure(method, endpoint)
+
+    def _get_once(self, endpoint: str, send, headers: dict = None):
+        """
+        Answers a GET request from the cache, or from the same request already in flight in another thread, before
+        sending it.
+        :param endpoint: Path and query string of the request.
+        :param send: Function making the request.
+        :param headers: (optional) Extra request headers. Requests with extra headers, e.g. conditional ones, are not
+        cached.
+        :return: Result of send
+        """
+        key = self.host + endpoint
+        cache = self.cache if not headers else None
+        if cache is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        generation = cache.generation if cache is not None else None
+        if not self.coalesce:
+            result = send()
+            if cache is not None:
+                cache.set(key, result, generation)
+            return result
+        flight = (key, tuple(sorted((headers or {}).items())))
+        with self._lock:
+            future = self._flights.get(flight)
+            leader = future is None
+            if leader:
+                from concurrent.futures import Future
+                future = self._flights[flight] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = send()
+            if cache is not None:
+                cache.set(key, result, generation)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(flight) is future:
+                    del self._flights[flight]
+
+    def _write(self, endpoint: str, send):
+        """
+        Sends a write request, then drops the cached results it may have changed.
+        GET requests in flight that it may change are not joined by later callers, before and after the write, so
+        that reads made once it is done see it.
+        :param endpoint: Path and query string of the request.
+        :param send: Function making the request.
+        :return: Result of send
+        """
+        self._land(endpoint)
+        try:
+            return send()
+        finally:
+            self._land(endpoint)
+            if self.cache is not None:
+                self.cache.invalidate(self.host + endpoint)
+
+    def _land(self, endpoint: str):
+        # The requests keep running for the threads already waiting on them.
+        with self._lock:
+            for flight in [flight for flight in self._flights if affected(self.host + endpoint, flight[0])]:
+                del self._flights[flight]
+
+    def _request(self, caller: str, endpoint: str, metrics, read, **kwargs):
+        """
+        Sends a request through the flow control, retrying it while the server is overloaded.
+        :param caller: Method of the request.
+        :param endpoint: Path and query string of the request.
+        :param metrics: RequestMetrics of the request, or None.
+        :param read: Function turning the final response into the result.
+        :param kwargs: Arguments for requests, e.g. 'headers', 'data'.
+        :return: response, result
+        """
+        with self._respond(caller, endpoint, metrics, **kwargs) as response:
+            return response, read(response)
+
+    @contextlib.contextmanager
+    def _respond(self, caller: str, endpoint: str, metrics, **kwargs):
+        """
+        Sends a request through the flow control, retrying it while the server is overloaded, e.g. for a response
+        that is read as a stream. Retries end once the final response is handed out.
+        :param caller: Method of the request.
+        :param endpoint: Path and query string of the request.
+        :param metrics: RequestMetrics of the request, or None.
+        :param kwargs: Arguments for requests, e.g. 'headers', 'data', 'stream'.
+        :return: Context manager giving the final response.
+        """
+        flow = self.flow_control
+        attempt = 0
+        while True:
+            ticket = flow.acquire() if flow is not None else None
+            try:
+                with self.session.request(caller, self.host + endpoint, auth=self.authorize, verify=self.ssl,
+                                          **kwargs) as response:
+                    self._track(response, metrics)
+                    delay = None
+                    if flow is not None:
+                        delay = flow.finish(ticket, caller, response.status_code, response.headers.get("Retry-After"),
+                                            attempt)
+                        ticket = None
+                    if delay is None:
+                        yield response
+                        return
+            finally:
+                if ticket is not None:
+                    flow.finish(ticket)
+            if metrics is not None:
+                metrics.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def _read_json(self, response, metrics):
+        """
+        Reads and decodes a Json response, recording status, timings and sizes if the request is measured.
+        """
+        if metrics is None:
+            return self._decode(response.content)
+        start = time.perf_counter()
+        content = response.content
+        downloaded = time.perf_counter()
+        metrics.mark("download", downloaded - start)
+        metrics.bytes_received += len(content)
+        data = self._decode(content)
+        metrics.mark("decode", time.perf_counter() - downloaded)
+        return data
+
+    def _decode(self, body: bytes):
+        # An empty body, e.g. of a 204, decodes to None rather than failing.
+        return self.json_loads(body) if body.strip() else None
+
+    def _chunks(self, response, read_size: int, metrics):
+        """
+        Reads a response body as it arrives, counting its bytes and the time spent waiting for them if the request is
+        measured.
+        :return: Generator of bytes
+        """
+        chunks = response.iter_content(read_size)
+        while True:
+            start = time.perf_counter()
+            data = next(chunks, None)
+            if data is None:
+                return
+            if metrics is not None:
+                metrics.mark("download", time.perf_counter() - start)
+                metrics.bytes_received += len(data)
+            yield data
+
+    def _track(self, response, metrics):
+        """
+        Records the status, server time and request size of a response if the request is measured.
+        """
+        if metrics is not None:
+            metrics.status = response.status_code
+            # Time from sending the request until the headers were parsed, including connecting.
+            metrics.mark("server", response.elapsed.total_seconds())
+            body = response.request.body
+            metrics.bytes_sent += len(body) if body else 0
+
+    @staticmethod
+    def _settled(result):
+        # Updates buffered by write-behind give a future of their result.
+        return result.result() if hasattr(result, "add_done_callback") else result
+
+    def _background(self, workers: int = 1):
+        """
+        :param workers: Number of threads.
+        :return: ThreadPoolExecutor of its own for work a method does in the background, e.g. prefetching pages.
+        Submitting it to the map() pool instead would deadlock once every worker waits on such work.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nextcloud-background")
+
+    def _submit(self, fn, *args, **kwargs):
+        # Only for calls made through map() and batch(), see _background.
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+        return executor.submit(fn, *args, **kwargs)
+
+    def _run_batch(self, method, calls, return_exceptions: bool):
+        if isinstance(method, str):
+            method = getattr(self, method)
+        futures = [self._submit(method, *args, **kwargs) for args, kwargs in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                results.append(e)
+        return results
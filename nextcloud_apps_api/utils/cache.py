@@ -0,0 +1,95 @@
+import collections
+import re
+import threading
+import time
+
+_ITEM = re.compile(r"/\d+$")
+
+
+def affected(url: str, key: str) -> bool:
+    """
+    :return: Whether a write to url may change the result of a GET of key: the resource itself, or a listing or
+    export of its collection. Other items of the collection are not affected, e.g. a write to /notes/5 affects
+    /notes/5 and /notes?exclude= but not /notes/6.
+    """
+    path = url.split("?", 1)[0]
+    item = _ITEM.search(path)
+    collection = path[:item.start()] if item else path
+    key_path = key.split("?", 1)[0]
+    rest = key_path[len(collection):]
+    return key_path == path or (key_path.startswith(collection) and (rest == "" or rest[0] == "/")
+                                and not _ITEM.match(rest))
+
+
+class ResponseCache:
+    """
+    Bounded cache of GET results, keyed on the url with its query string. Entries expire ttl seconds after they were
+    fetched, and the least recently used one is dropped once maxsize is reached. Clients drop the affected entries
+    themselves after every write they make, so only changes made elsewhere can be up to ttl seconds late.
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0):
+        """
+        :param maxsize: Number of results kept.
+        :param ttl: Seconds a result is served from the cache.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        """
+        Counter raised by every invalidation. Results fetched before one are not stored, as they may be stale.
+        """
+        return self._generation
+
+    def get(self, key: str):
+        """
+        :return: The cached result, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, generation: int = None):
+        """
+        :param generation: (optional) generation read before the value was fetched.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url: str):
+        """
+        Drops what a write to url may have changed, see affected().
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if affected(url, key):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
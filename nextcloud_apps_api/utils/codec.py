@@ -0,0 +1,44 @@
+import importlib.util
+import json
+
+# Decoders tried in this order when none is chosen. orjson and msgspec decode large listings several times faster.
+DECODERS = ("orjson", "msgspec", "json")
+
+_accept_encoding = None
+
+
+def make_decoder(decoder=None):
+    """
+    :param decoder: (optional) 'orjson', 'msgspec', 'json', or a callable decoding Json from bytes. Defaults to the
+    first of DECODERS that is installed.
+    :return: Callable decoding a Json document from bytes.
+    """
+    if callable(decoder):
+        return decoder
+    for name in ((decoder,) if decoder else DECODERS):
+        try:
+            if name == "orjson":
+                import orjson
+                return orjson.loads
+            if name == "msgspec":
+                import msgspec.json
+                return msgspec.json.decode
+        except ImportError:
+            if decoder:
+                raise
+            continue
+        if name == "json":
+            return json.loads
+        raise ValueError(f"Unknown Json decoder: {name!r}")
+
+
+def accept_encoding() -> str:
+    """
+    :return: Accept-Encoding header offering Brotli if both transports can decode it, gzip otherwise.
+    """
+    global _accept_encoding
+    if _accept_encoding is None:
+        # aiohttp and urllib3 decode Brotli with either package; offering it without one would break the response.
+        brotli = any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi"))
+        _accept_encoding = "br, gzip" if brotli else "gzip"
+    return _accept_encoding
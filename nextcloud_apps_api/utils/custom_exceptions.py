@@ -1,4 +1,11 @@
 
 
 class RequestError(Exception):
-    pass
\ No newline at end of file
+
+    def __init__(self, message: str = "", status: int = None):
+        """
+        :param message: Description of the failure.
+        :param status: (optional) HTTP status the server returned.
+        """
+        super().__init__(message)
+        self.status = status
@@ -0,0 +1,174 @@
+import collections
+import threading
+import time
+
+# random and email.utils are only needed once the server is overloaded, so they are imported then.
+
+# Responses meaning the server is overloaded or briefly unavailable.
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+# Methods that can be repeated without changing the outcome.
+IDEMPOTENT_METHODS = frozenset(("GET", "PUT", "DELETE"))
+
+
+def retry_after(value) -> float:
+    """
+    :param value: Retry-After header, in seconds or as an HTTP date.
+    :return: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class FlowControl:
+    """
+    Paces the requests of a sync client, and of any other client it is shared with.
+    The number of requests in flight adapts to the server (AIMD): every success raises the limit by 1/limit, so by about
+    one per round trip, and an overloaded response (429, 502, 503, 504) halves it. Retry-After holds back every request
+    for the given time, at most max_delay. GET, PUT and DELETE requests that got an overloaded response are retried
+    after a jittered exponential backoff, as long as the retry budget allows: every request adds retry_budget to it and
+    every retry takes one, so retries stay a fraction of the traffic even when the server keeps failing.
+    """
+
+    def __init__(self, initial_limit: int = 10, min_limit: int = 1, max_limit: int = 100, decrease: float = 0.5,
+                 max_retries: int = 3, base_delay: float = 0.1, max_delay: float = 30.0, retry_budget: float = 0.2,
+                 min_retries: int = 10):
+        """
+        :param initial_limit: Requests allowed in flight at first.
+        :param min_limit: Lowest limit the overloaded responses can push it down to.
+        :param max_limit: Highest limit the successes can raise it to.
+        :param decrease: Factor applied to the limit on an overloaded response.
+        :param max_retries: Retries of a single request.
+        :param base_delay: Seconds of the backoff before the first retry, doubled on every further retry.
+        :param max_delay: Upper bound of the backoff and of any Retry-After in seconds.
+        :param retry_budget: Retries earned by every request.
+        :param min_retries: Retries allowed before any were earned, and the most the budget saves up.
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.min_retries = min_retries
+        self.in_flight = 0
+        self._tokens = float(min_retries)
+        self._issued = 0
+        self._decreased_at = 0
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        """
+        Waits out any Retry-After, then for a free slot.
+        :return: Ticket to hand to finish()
+        """
+        pause = self._resume_at - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            return self._take()
+
+    def finish(self, ticket: int, method: str = None, status: int = None, retry_after_header: str = None,
+               attempt: int = 0) -> float:
+        """
+        Frees the slot of a request and adapts the limit to its outcome.
+        :param ticket: Ticket returned by acquire()
+        :param method: Method of the request.
+        :param status: Status of the response, None if the request failed without one.
+        :param retry_after_header: Retry-After header of the response.
+        :param attempt: Number of retries made before this request.
+        :return: Seconds to wait before retrying, or None if the request must not be retried.
+        """
+        overloaded = status in RETRY_STATUSES
+        wait = retry_after(retry_after_header) if overloaded else None
+        if wait is not None:
+            # A huge Retry-After would stall every client sharing this for as long.
+            wait = min(wait, self.max_delay)
+        with self._cond:
+            self.in_flight -= 1
+            if attempt == 0:
+                self._tokens = min(self._tokens + self.retry_budget, self.min_retries)
+            if overloaded:
+                # Requests sent before the last decrease saw the old limit; only newer ones may lower it further.
+                if ticket > self._decreased_at:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._decreased_at = self._issued
+                if wait:
+                    self._resume_at = max(self._resume_at, time.monotonic() + wait)
+            elif status is not None and status < 500:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            retry = (overloaded and method in IDEMPOTENT_METHODS and attempt < self.max_retries
+                     and self._tokens >= 1)
+            if retry:
+                self._tokens -= 1
+            self._wake()
+        if not retry:
+            return None
+        import random
+        # Full jitter keeps clients that failed together from retrying together.
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, wait or 0.0)
+
+    def _take(self) -> int:
+        self.in_flight += 1
+        self._issued += 1
+        return self._issued
+
+    def _wake(self):
+        self._cond.notify_all()
+
+
+class AsyncFlowControl(FlowControl):
+    """
+    FlowControl for the async clients. acquire() is a coroutine; all requests sharing it must run on one event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiters = collections.deque()
+
+    async def acquire(self) -> int:
+        """
+        Waits out any Retry-After, then for a free slot.
+        :return: Ticket to hand to finish()
+        """
+        import asyncio
+        pause = self._resume_at - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    # Woken for a free slot but cancelled before taking it: hand the slot on.
+                    self._wake()
+                raise
+        with self._cond:
+            return self._take()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
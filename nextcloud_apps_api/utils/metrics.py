@@ -0,0 +1,258 @@
+import contextlib
+import re
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    :param endpoint: Path and query string of a request.
+    :return: Path with the query string dropped and ids replaced, e.g. /notes/{id}
+    """
+    return _ID.sub("/{id}", endpoint.split("?", 1)[0])
+
+
+class RequestMetrics:
+    """
+    Measurements of a single request. Phases are seconds spent in: 'queue' waiting for a pooled connection, 'dns',
+    'connect' (TCP and TLS), 'server' from sending the request to receiving the response headers, 'download' reading
+    the body and 'decode' parsing the Json. The sync client cannot tell connecting from server time and reports both
+    as 'server'.
+    """
+
+    __slots__ = ('method', 'endpoint', 'status', 'started', 'duration', 'phases', 'bytes_sent', 'bytes_received',
+                 'retries', 'error')
+
+    def __init__(self, method: str, endpoint: str):
+        self.method = method
+        self.endpoint = endpoint_label(endpoint)
+        self.status = None
+        self.started = time.perf_counter()
+        self.duration = None
+        self.phases = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.error = None
+
+    def mark(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class _Histogram:
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list:
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Instrumentation:
+    """
+    Collects the RequestMetrics of every request made by the clients it is given to, e.g.
+    NotesAsyncClient(host, instrumentation=Instrumentation()). Per endpoint and method it keeps a latency histogram,
+    time per phase, status codes, bytes in and out and retries. Hooks receive each RequestMetrics as it completes.
+    Clients without an Instrumentation do none of this work.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds, in seconds, of the latency histogram buckets.
+        """
+        self.buckets = tuple(buckets)
+        self._hooks = ()
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        :param hook: Callable receiving the RequestMetrics of every completed request.
+        """
+        self._hooks = self._hooks + (hook,)
+
+    def remove_hook(self, hook):
+        self._hooks = tuple(h for h in self._hooks if h != hook)
+
+    @contextlib.contextmanager
+    def measure(self, method: str, endpoint: str):
+        """
+        Context manager timing one request. Exceptions are recorded and re-raised, except for a streamed response the
+        caller stopped reading early.
+        :return: RequestMetrics to fill in while the request runs
+        """
+        metrics = RequestMetrics(method, endpoint)
+        try:
+            yield metrics
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            metrics.error = type(e).__name__
+            raise
+        finally:
+            metrics.duration = time.perf_counter() - metrics.started
+            self.record(metrics)
+
+    def record(self, metrics: RequestMetrics):
+        with self._lock:
+            series = self._series.get((metrics.method, metrics.endpoint))
+            if series is None:
+                series = self._series[(metrics.method, metrics.endpoint)] = {
+                    "latency": _Histogram(self.buckets), "phases": {}, "statuses": {}, "errors": {},
+                    "bytes_sent": 0, "bytes_received": 0, "retries": 0,
+                }
+            series["latency"].observe(metrics.duration)
+            for phase, seconds in metrics.phases.items():
+                series["phases"][phase] = series["phases"].get(phase, 0.0) + seconds
+            if metrics.status is not None:
+                series["statuses"][metrics.status] = series["statuses"].get(metrics.status, 0) + 1
+            if metrics.error is not None:
+                series["errors"][metrics.error] = series["errors"].get(metrics.error, 0) + 1
+            series["bytes_sent"] += metrics.bytes_sent
+            series["bytes_received"] += metrics.bytes_received
+            series["retries"] += metrics.retries
+        for hook in self._hooks:
+            hook(metrics)
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def to_dict(self) -> dict:
+        """
+        :return: Aggregates keyed by 'METHOD endpoint'.
+        """
+        with self._lock:
+            result = {}
+            for (method, endpoint), series in self._series.items():
+                latency = series["latency"]
+                result[f"{method} {endpoint}"] = {
+                    "count": latency.count,
+                    "latency_sum": latency.sum,
+                    "latency_buckets": dict(zip(self.buckets, latency.cumulative())),
+                    "phases": dict(series["phases"]),
+                    "statuses": dict(series["statuses"]),
+                    "errors": dict(series["errors"]),
+                    "bytes_sent": series["bytes_sent"],
+                    "bytes_received": series["bytes_received"],
+                    "retries": series["retries"],
+                }
+            return result
+
+    def to_prometheus(self, prefix: str = "nextcloud_apps_api") -> str:
+        """
+        :param prefix: Prefix of the metric names.
+        :return: Aggregates in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Time from starting a request to having its decoded result.",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        snapshot = self.to_dict()
+        for key, series in snapshot.items():
+            method, endpoint = key.split(" ", 1)
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            for bound, count in series["latency_buckets"].items():
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {series["latency_sum"]}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {series["count"]}')
+        counters = [
+            ("request_phase_seconds_total", "Time spent per phase of a request.", "phases", "phase"),
+            ("responses_total", "Responses per status code.", "statuses", "status"),
+            ("request_errors_total", "Requests that failed without a response.", "errors", "error"),
+        ]
+        for name, help_text, field, label in counters:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for key, series in snapshot.items():
+                method, endpoint = key.split(" ", 1)
+                for value, total in series[field].items():
+                    lines.append(f'{prefix}_{name}{{method="{method}",endpoint="{endpoint}",{label}="{value}"}} {total}')
+        for name, help_text, field in [("request_bytes_total", "Request body bytes sent.", "bytes_sent"),
+                                       ("response_bytes_total", "Response body bytes received.", "bytes_received"),
+                                       ("retries_total", "Requests repeated after a failure.", "retries")]:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for key, series in snapshot.items():
+                method, endpoint = key.split(" ", 1)
+                lines.append(f'{prefix}_{name}{{method="{method}",endpoint="{endpoint}"}} {series[field]}')
+        return "\n".join(lines) + "\n"
+
+    def trace_config(self):
+        """
+        :return: aiohttp.TraceConfig filling in the phases of the RequestMetrics passed as trace_request_ctx.
+        """
+        import aiohttp
+        trace_config = aiohttp.TraceConfig()
+
+        def starter(name):
+            async def start(session, context, params):
+                setattr(context, name, time.perf_counter())
+            return start
+
+        def ender(name, phase):
+            async def end(session, context, params):
+                metrics = context.trace_request_ctx
+                if metrics is not None and hasattr(context, name):
+                    metrics.mark(phase, time.perf_counter() - getattr(context, name))
+            return end
+
+        async def connection_created(session, context, params):
+            metrics = context.trace_request_ctx
+            if metrics is not None and hasattr(context, "connect"):
+                # Creating a connection includes resolving the host, which is reported separately.
+                metrics.mark("connect", time.perf_counter() - context.connect - metrics.phases.get("dns", 0.0))
+
+        async def chunk_sent(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.bytes_sent += len(params.chunk)
+
+        async def chunk_received(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.bytes_received += len(params.chunk)
+
+        async def request_end(session, context, params):
+            metrics = context.trace_request_ctx
+            if metrics is not None:
+                metrics.status = params.response.status
+                if hasattr(context, "sent"):
+                    metrics.mark("server", time.perf_counter() - context.sent)
+
+        trace_config.on_connection_queued_start.append(starter("queue"))
+        trace_config.on_connection_queued_end.append(ender("queue", "queue"))
+        trace_config.on_dns_resolvehost_start.append(starter("dns"))
+        trace_config.on_dns_resolvehost_end.append(ender("dns", "dns"))
+        trace_config.on_connection_create_start.append(starter("connect"))
+        trace_config.on_connection_create_end.append(connection_created)
+        trace_config.on_request_headers_sent.append(starter("sent"))
+        trace_config.on_request_chunk_sent.append(chunk_sent)
+        trace_config.on_response_chunk_received.append(chunk_received)
+        trace_config.on_request_end.append(request_end)
+        return trace_config
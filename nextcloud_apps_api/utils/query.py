@@ -0,0 +1,51 @@
+from urllib.parse import quote_plus
+
+__all__ = ["notes_query", "bookmarks_query", "bookmarks_form"]
+
+
+def _encode(value) -> str:
+    return quote_plus(str(value))
+
+
+def _is_scalar(value) -> bool:
+    return isinstance(value, (str, int, float))
+
+
+def notes_query(params: dict) -> str:
+    """
+    Builds the query string for the notes api. Lists are comma joined, e.g. ?exclude=content,favorite
+    :param params: Query parameters.
+    :return: Percent-encoded query string including the leading '?', or "" if there are no parameters.
+    """
+    parts = []
+    for key, value in params.items():
+        if _is_scalar(value):
+            parts.append(f"{key}={_encode(value)}")
+        else:
+            parts.append(f"{key}={','.join([_encode(v) for v in value])}")
+    return "?" + "&".join(parts) if parts else ""
+
+
+def bookmarks_query(params: dict) -> str:
+    """
+    Builds the query string for the bookmarks api. Lists repeat the key, e.g. ?tags[]=a&tags[]=b
+    :param params: Query parameters.
+    :return: Percent-encoded query string including the leading '?', or "" if there are no parameters.
+    """
+    parts = []
+    for key, value in params.items():
+        if _is_scalar(value):
+            parts.append(f"{key}={_encode(value)}")
+        else:
+            parts.extend([f"{key}[]={_encode(v)}" for v in value])
+    return "?" + "&".join(parts) if parts else ""
+
+
+def bookmarks_form(body: dict) -> dict:
+    """
+    Names the list fields of a bookmarks request body the way PHP reads arrays, e.g. {'tags[]': ['a', 'b']}, which
+    is sent as tags[]=a&tags[]=b. PHP keeps only the last of repeated plain keys.
+    :param body: Form fields.
+    :return: Form fields ready to send.
+    """
+    return {key if _is_scalar(value) else f"{key}[]": value for key, value in body.items()}
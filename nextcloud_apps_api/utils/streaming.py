@@ -0,0 +1,226 @@
+import codecs
+import json
+import re
+from html.parser import HTMLParser
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+# Characters outside strings that open or close an element.
+_STRUCTURAL = re.compile(r'["{}\[\],]')
+
+
+class JsonArrayStream:
+    """
+    Incremental decoder for a top level JSON array of objects, e.g. the notes list.
+    Bytes are fed as they arrive and every complete element is returned as soon as it is decoded, so only the
+    element currently being received is buffered. An element that spans chunks is scanned once as its bytes arrive,
+    tracking strings and nesting, and decoded once its closing bracket has arrived.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        # Text received so far of the element being received.
+        self._parts = []
+        self._in_element = False
+        self._depth = 0
+        self._in_string = False
+        # The last chunk ended with a backslash inside a string.
+        self._escaped = False
+        self._started = False
+        self._finished = False
+
+    def feed(self, data: bytes) -> list:
+        """
+        :param data: Next bytes of the response body.
+        :return: List of elements completed by this data.
+        """
+        return self._scan(self._text.decode(data))
+
+    def close(self):
+        """
+        Checks that the whole array has been received.
+        """
+        self._scan(self._text.decode(b"", final=True))
+        if not self._finished:
+            raise ValueError("Response ended before the end of the JSON array")
+
+    def _scan(self, text: str) -> list:
+        items = []
+        pos = 0
+        end = len(text)
+        start = 0
+        while pos < end and not self._finished:
+            if not self._in_element:
+                while pos < end and text[pos] in _WHITESPACE:
+                    pos += 1
+                if pos == end:
+                    break
+                char = text[pos]
+                if not self._started:
+                    if char != "[":
+                        raise ValueError(f"Expected a JSON array, got {text[pos:pos + 20]!r}")
+                    self._started = True
+                    pos += 1
+                elif char == "]":
+                    self._finished = True
+                    pos += 1
+                elif char == ",":
+                    pos += 1
+                else:
+                    # Most elements fit in the chunk they start in; decode those directly.
+                    try:
+                        item, stop = self._decoder.raw_decode(text, pos)
+                    except json.JSONDecodeError:
+                        stop = None
+                    # A number may go on in the next chunk; it is only whole once a delimiter follows it.
+                    if stop is not None and (char in '{["' or stop < end and text[stop] in _DELIMITERS):
+                        items.append(item)
+                        pos = stop
+                    else:
+                        self._in_element = True
+                        start = pos
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    pos += 1
+                    continue
+                quote = text.find('"', pos)
+                stop = end if quote == -1 else quote
+                # An odd run of backslashes escapes the quote, or the first character of the next chunk.
+                run = stop
+                while run > pos and text[run - 1] == "\\":
+                    run -= 1
+                escaped = (stop - run) % 2 == 1
+                if quote == -1:
+                    self._escaped = escaped
+                    pos = end
+                    continue
+                pos = quote + 1
+                if escaped:
+                    continue
+                self._in_string = False
+                if self._depth == 0:
+                    items.append(self._complete(text, start, pos))
+                continue
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = end
+                continue
+            char = match.group()
+            pos = match.start()
+            if char == '"':
+                self._in_string = True
+                pos += 1
+            elif char in "{[":
+                self._depth += 1
+                pos += 1
+            elif self._depth == 0:
+                # A ',' or ']' ends a number or literal; the array loop consumes it.
+                items.append(self._complete(text, start, pos))
+            elif char == ",":
+                pos += 1
+            else:
+                self._depth -= 1
+                pos += 1
+                if self._depth == 0:
+                    items.append(self._complete(text, start, pos))
+        if self._in_element:
+            self._parts.append(text[start:])
+        return items
+
+    def _complete(self, text: str, start: int, stop: int):
+        self._parts.append(text[start:stop])
+        element = "".join(self._parts)
+        self._parts = []
+        self._in_element = False
+        return self._decoder.decode(element)
+
+
+class NetscapeBookmarkStream(HTMLParser):
+    """
+    Incremental parser for the Netscape bookmark file format produced by the bookmarks export.
+    Bytes are fed as they arrive and every bookmark is returned as a dict once its entry is complete.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        # One entry per open <DL>: the folder name, or None for the root list.
+        self._folders = []
+        self._folder_name = None
+        self._capture = None
+        self._current = None
+        self._done = []
+
+    def feed(self, data: bytes) -> list:
+        """
+        :param data: Next bytes of the export.
+        :return: List of bookmarks completed by this data.
+        """
+        super().feed(self._text.decode(data))
+        done, self._done = self._done, []
+        return done
+
+    def close(self) -> list:
+        """
+        :return: List of bookmarks still pending at the end of the export.
+        """
+        super().feed(self._text.decode(b"", final=True))
+        super().close()
+        self._flush()
+        done, self._done = self._done, []
+        return done
+
+    def handle_starttag(self, tag, attrs):
+        self._capture = None
+        if tag == "a":
+            self._flush()
+            attrs = dict(attrs)
+            tags = attrs.get("tags") or ""
+            self._current = {
+                "url": attrs.get("href", ""),
+                "title": "",
+                "description": "",
+                "tags": [t for t in tags.split(",") if t],
+                "added": int(attrs["add_date"]) if attrs.get("add_date", "").isdigit() else None,
+                "lastmodified": int(attrs["last_modified"]) if attrs.get("last_modified", "").isdigit() else None,
+                "folder": "/" + "/".join(name for name in self._folders if name is not None),
+            }
+            self._capture = "title"
+        elif tag == "dd" and self._current is not None:
+            self._capture = "description"
+        elif tag == "h3":
+            self._flush()
+            self._folder_name = ""
+            self._capture = "folder"
+        elif tag == "dl":
+            self._flush()
+            self._folders.append(self._folder_name.strip() if self._folder_name is not None else None)
+            self._folder_name = None
+        elif tag == "dt":
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in ("a", "h3"):
+            self._capture = None
+        elif tag == "dl":
+            self._flush()
+            if self._folders:
+                self._folders.pop()
+
+    def handle_data(self, data):
+        if self._capture == "title":
+            self._current["title"] += data
+        elif self._capture == "description":
+            self._current["description"] += data
+        elif self._capture == "folder":
+            self._folder_name += data
+
+    def _flush(self):
+        if self._current is not None:
+            self._current["title"] = self._current["title"].strip()
+            self._current["description"] = self._current["description"].strip()
+            self._done.append(self._current)
+            self._current = None
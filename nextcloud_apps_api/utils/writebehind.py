@@ -0,0 +1,282 @@
+import threading
+import time
+
+# ETags remembered per id to rebase updates made on a version that a save has replaced since.
+_KEPT_ETAGS = 16
+
+
+class _Pending:
+
+    __slots__ = ('id', 'etag', 'fields', 'futures', 'first', 'due', 'timer')
+
+    def __init__(self, id_, etag: str):
+        self.id = id_
+        self.etag = etag
+        self.fields = {}
+        self.futures = []
+        self.first = time.monotonic()
+        self.due = None
+        self.timer = None
+
+
+def _rebase(etags: dict, id_, etag: str) -> str:
+    """
+    :return: ETag to send for an update based on etag, after saves of the same id replaced it.
+    """
+    return etags.get(id_, {}).get(etag, etag)
+
+
+def _saved(etags: dict, id_, sent: str, result):
+    """
+    Records that a save based on the ETag sent produced the ETag in result.
+    """
+    if sent is None or not isinstance(result, dict) or result.get('etag') is None:
+        return
+    known = etags.setdefault(id_, {})
+    for old in known:
+        known[old] = result['etag']
+    known[sent] = result['etag']
+    while len(known) > _KEPT_ETAGS:
+        del known[next(iter(known))]
+
+
+class WriteBehind:
+    """
+    Buffers updates per id and saves the merged fields of each id with a single PUT.
+    An id is saved once no update for it came in for delay seconds, and at the latest max_delay seconds after its
+    first buffered update. Updates of an id are never sent concurrently: changes made while one is being saved wait
+    for the next PUT. Updates based on an ETag that an earlier save replaced are sent with the ETag it returned.
+    Saves run on threads of the queue's own, so threads of a client's map() can wait for them.
+    """
+
+    def __init__(self, send, delay: float = 1.0, max_delay: float = 10.0, workers: int = 4):
+        """
+        :param send: Callable (id_, etag, fields) saving an update, returning (status, result).
+        :param delay: Seconds without updates after which an id is saved.
+        :param max_delay: Seconds after its first update by which an id is saved anyway.
+        :param workers: Number of saves made at the same time.
+        """
+        self.send = send
+        self.delay = delay
+        self.max_delay = max_delay
+        self.workers = workers
+        self._executor = None
+        self._pending = {}
+        self._sending = set()
+        self._etags = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def update(self, id_, etag: str = None, fields: dict = None):
+        """
+        :param id_: ID of the item.
+        :param etag: (optional) ETag the item is expected to have. The first one buffered for a save is used.
+        :param fields: Fields to change. Later values of a field replace earlier ones.
+        :return: concurrent.futures.Future of (status, result) of the PUT that saved the change.
+        """
+        from concurrent.futures import Future
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            etag = _rebase(self._etags, id_, etag)
+            pending = self._pending.get(id_)
+            if pending is None:
+                pending = self._pending[id_] = _Pending(id_, etag)
+            elif pending.etag is None:
+                pending.etag = etag
+            pending.fields.update(fields or {})
+            pending.futures.append(future)
+            pending.due = min(time.monotonic() + self.delay, pending.first + self.max_delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def discard(self, id_):
+        """
+        Drops the buffered updates of an id, e.g. because it was deleted. Their futures are cancelled.
+        """
+        with self._cond:
+            pending = self._pending.pop(id_, None)
+            self._etags.pop(id_, None)
+        if pending is not None:
+            for future in pending.futures:
+                future.cancel()
+
+    def flush(self):
+        """
+        Saves every buffered update now and waits until all of them are saved.
+        """
+        with self._cond:
+            for pending in self._pending.values():
+                pending.due = 0.0
+            self._cond.notify_all()
+            while self._pending or self._sending:
+                self._cond.wait()
+
+    def close(self):
+        """
+        Flushes and stops accepting updates.
+        """
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _run(self):
+        with self._cond:
+            while not (self._closed and not self._pending):
+                now = time.monotonic()
+                timeout = None
+                for pending in list(self._pending.values()):
+                    if pending.id in self._sending:
+                        continue
+                    if pending.due <= now:
+                        del self._pending[pending.id]
+                        self._sending.add(pending.id)
+                        if self._executor is None:
+                            from concurrent.futures import ThreadPoolExecutor
+                            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                                thread_name_prefix="write-behind")
+                        self._executor.submit(self._save, pending)
+                    elif timeout is None or pending.due - now < timeout:
+                        timeout = pending.due - now
+                self._cond.wait(timeout)
+
+    def _save(self, pending: _Pending):
+        try:
+            status, result = self.send(pending.id, pending.etag, pending.fields)
+        except BaseException as e:
+            result = None
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_result((status, result))
+        finally:
+            with self._cond:
+                self._sending.discard(pending.id)
+                _saved(self._etags, pending.id, pending.etag, result)
+                following = self._pending.get(pending.id)
+                if following is not None:
+                    following.etag = _rebase(self._etags, pending.id, following.etag)
+                self._cond.notify_all()
+
+
+class AsyncWriteBehind:
+    """
+    WriteBehind for the async clients. Saves run as tasks on the event loop that buffered them.
+    """
+
+    def __init__(self, send, delay: float = 1.0, max_delay: float = 10.0):
+        """
+        :param send: Coroutine function (id_, etag, fields) saving an update, returning (status, result).
+        :param delay: Seconds without updates after which an id is saved.
+        :param max_delay: Seconds after its first update by which an id is saved anyway.
+        """
+        self.send = send
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._sending = {}
+        self._etags = {}
+        self._closed = False
+
+    def update(self, id_, etag: str = None, fields: dict = None):
+        """
+        :param id_: ID of the item.
+        :param etag: (optional) ETag the item is expected to have. The first one buffered for a save is used.
+        :param fields: Fields to change. Later values of a field replace earlier ones.
+        :return: asyncio.Future of (status, result) of the PUT that saved the change.
+        """
+        import asyncio
+        if self._closed:
+            raise RuntimeError("Write-behind queue is closed")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        etag = _rebase(self._etags, id_, etag)
+        pending = self._pending.get(id_)
+        if pending is None:
+            pending = self._pending[id_] = _Pending(id_, etag)
+        elif pending.etag is None:
+            pending.etag = etag
+        pending.fields.update(fields or {})
+        pending.futures.append(future)
+        pending.due = min(time.monotonic() + self.delay, pending.first + self.max_delay)
+        if pending.timer is not None:
+            pending.timer.cancel()
+        pending.timer = loop.call_later(max(0.0, pending.due - time.monotonic()), self._start, id_)
+        return future
+
+    def discard(self, id_):
+        """
+        Drops the buffered updates of an id, e.g. because it was deleted. Their futures are cancelled.
+        """
+        pending = self._pending.pop(id_, None)
+        self._etags.pop(id_, None)
+        if pending is not None:
+            pending.timer.cancel()
+            for future in pending.futures:
+                future.cancel()
+
+    async def flush(self):
+        """
+        Saves every buffered update now and waits until all of them are saved.
+        """
+        import asyncio
+        while self._pending or self._sending:
+            for id_ in list(self._pending):
+                self._start(id_)
+            if self._sending:
+                await asyncio.wait(list(self._sending.values()))
+
+    async def close(self):
+        """
+        Flushes and stops accepting updates.
+        """
+        self._closed = True
+        await self.flush()
+
+    def _start(self, id_):
+        import asyncio
+        # A save of the same id still running starts this one when it is done.
+        if id_ in self._sending or id_ not in self._pending:
+            return
+        pending = self._pending.pop(id_)
+        pending.timer.cancel()
+        self._sending[id_] = asyncio.ensure_future(self._save(pending))
+
+    async def _save(self, pending: _Pending):
+        import asyncio
+        result = None
+        try:
+            status, result = await self.send(pending.id, pending.etag, pending.fields)
+        except asyncio.CancelledError:
+            for future in pending.futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_result((status, result))
+        finally:
+            del self._sending[pending.id]
+            _saved(self._etags, pending.id, pending.etag, result)
+            following = self._pending.get(pending.id)
+            if following is not None:
+                following.etag = _rebase(self._etags, pending.id, following.etag)
+                if following.due <= time.monotonic():
+                    self._start(pending.id)
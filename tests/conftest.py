@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import pytest
+from benchmarks.fake_server import FakeNextcloud
+
+
+def within(timeout: float, fn):
+    """
+    :return: Result of fn, failing instead of hanging if it takes longer than timeout seconds.
+    """
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "deadlocked"
+    return outcome["result"]
+
+
+@pytest.fixture
+def nextcloud():
+    """
+    Runs the stand-in notes and bookmarks server on its own thread, so sync and async clients can both reach it.
+    nextcloud(**options) starts a FakeNextcloud with the given options, recording its requests, and returns it.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    servers = []
+
+    def start(**options) -> FakeNextcloud:
+        server = asyncio.run_coroutine_threadsafe(FakeNextcloud(record=True, **options).start(), loop).result()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
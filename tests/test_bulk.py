@@ -0,0 +1,102 @@
+import asyncio
+from nextcloud_apps_api import NotesAsyncClient, BookmarkClient, BookmarkAsyncClient, AsyncFlowControl
+
+
+def bulk_server(nextcloud):
+    """
+    :return: Server holding notes 1 to 100, answering after a random delay of up to 10 milliseconds.
+    """
+    return nextcloud(notes=100, jitter=0.01)
+
+
+def test_results_keep_the_order_of_items(nextcloud):
+    server = bulk_server(nextcloud)
+    notes = [{"title": f"Bulk {i}", "content": ""} for i in range(40)]
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            return await nc.post_notes(notes, concurrency=8)
+
+    results = asyncio.run(main())
+    assert [result.item for result in results] == notes
+    assert [result.result["title"] for result in results] == [note["title"] for note in notes]
+    assert all(result.status == 200 and result.error is None for result in results)
+
+
+def test_failures_are_returned_per_item(nextcloud):
+    server = bulk_server(nextcloud)
+    ids = [1, 101, 2, 102]
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            updated = await nc.put_notes([{"id": id_, "title": "New"} for id_ in ids])
+            deleted = await nc.delete_notes(ids)
+            return updated, deleted
+
+    updated, deleted = asyncio.run(main())
+    for results in (updated, deleted):
+        assert [result.status for result in results] == [200, 404, 200, 404]
+        assert [result.error is None for result in results] == [True, False, True, False]
+        assert all(result.result is None for result in results if result.error)
+    item, status, result, error = updated[0]
+    assert (item, status, result["id"], result["title"], error) == ({"id": 1, "title": "New"}, 200, 1, "New", None)
+    assert deleted[1].item == 101 and deleted[1].error.status == 404
+
+
+def test_progress_is_reported_after_every_item(nextcloud):
+    server = bulk_server(nextcloud)
+    reports = []
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            await nc.delete_notes(list(range(95, 105)), concurrency=3, progress=lambda *report: reports.append(report))
+
+    asyncio.run(main())
+    assert reports == [(done, 10) for done in range(1, 11)]
+
+
+def test_concurrency_caps_requests_in_flight(nextcloud):
+    server = bulk_server(nextcloud)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            await nc.delete_notes(list(range(50)), concurrency=3)
+
+    asyncio.run(main())
+    assert server.peak == 3
+
+
+def test_default_cap_is_the_flow_control_max_limit(nextcloud):
+    server = bulk_server(nextcloud)
+    flow = AsyncFlowControl(initial_limit=100, max_limit=4)
+
+    async def main():
+        async with NotesAsyncClient(server.host, flow_control=flow) as nc:
+            await nc.delete_notes(list(range(50)))
+
+    asyncio.run(main())
+    assert server.peak == 4
+
+
+def test_empty_bulk_call(nextcloud):
+    server = bulk_server(nextcloud)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            return await nc.post_notes([])
+
+    assert asyncio.run(main()) == []
+
+
+def test_tags_are_sent_as_an_array(nextcloud):
+    server = nextcloud(bookmarks=3)
+
+    async def main():
+        async with BookmarkAsyncClient(server.host) as bc:
+            return await bc.put_bookmarks([{"id": 1, "tags": ["a", "b"]}, {"id": 2, "tags": ["c"], "title": "T"}])
+
+    results = asyncio.run(main())
+    assert [result.result["tags"] for result in results] == [["a", "b"], ["c"]]
+    with BookmarkClient(server.host) as bc:
+        assert bc.put_bookmark(3, tags=["d", "e"])[1]["tags"] == ["d", "e"]
+    assert [bookmark["tags"] for bookmark in server.bookmarks.values()] == [["a", "b"], ["c"], ["d", "e"]]
@@ -0,0 +1,94 @@
+import asyncio
+import gc
+import threading
+import time
+from nextcloud_apps_api import NotesClient, NotesAsyncClient, AsyncClientPool
+
+
+def test_async_get_after_write_does_not_join_older_request(nextcloud):
+    # A GET answers the state the note had when the request came in, latency seconds later.
+    server = nextcloud(notes=1, latency=0.3)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            stale = asyncio.ensure_future(nc.get_notes(1))
+            await asyncio.sleep(0.05)
+            await nc.put_note(1, title="NEW")
+            status, note = await nc.get_notes(1)
+            assert note["title"] == "NEW"
+            assert (await stale)[1]["title"] == "Note 1"
+
+    asyncio.run(main())
+
+
+def test_async_concurrent_gets_still_coalesce(nextcloud):
+    server = nextcloud(notes=1, latency=0.1)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            results = await asyncio.gather(*(nc.get_notes(1) for _ in range(5)))
+            assert all(result[1] is results[0][1] for result in results)
+
+    asyncio.run(main())
+    assert len(server.log) == 1
+
+
+def test_sync_get_after_write_does_not_join_older_request(nextcloud):
+    server = nextcloud(notes=1, latency=0.3)
+    with NotesClient(server.host) as nc:
+        stale = {}
+        thread = threading.Thread(target=lambda: stale.update(note=nc.get_notes(1)[1]))
+        thread.start()
+        time.sleep(0.05)
+        nc.put_note(1, title="NEW")
+        status, note = nc.get_notes(1)
+        thread.join()
+        assert note["title"] == "NEW"
+        assert stale["note"]["title"] == "Note 1"
+
+
+def test_async_request_runs_until_its_last_caller_gives_up(nextcloud):
+    server = nextcloud(notes=1, latency=0.2)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            first = asyncio.ensure_future(nc.get_notes(1))
+            second = asyncio.ensure_future(nc.get_notes(1))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            assert (await second)[1]["title"] == "Note 1"
+            third = asyncio.ensure_future(nc.get_notes(1))
+            await asyncio.sleep(0.05)
+            third.cancel()
+            await asyncio.gather(first, third, return_exceptions=True)
+            await asyncio.sleep(0)
+            assert nc._flights == {} and nc._waiters == {}
+            # The request of third is cancelled instead of left running.
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(main())
+
+
+def test_async_abandoned_requests_end_with_the_pool(nextcloud):
+    """
+    Pages requested ahead and dropped once a merged iteration stops are cancelled, instead of failing unhandled once
+    the pool closes its connections.
+    """
+    hosts = [nextcloud(bookmarks=50, latency=0.05).host for _ in range(2)]
+    reported = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: reported.append(context))
+        async with AsyncClientPool() as pool:
+            for host in hosts:
+                pool.add_account(host, "alice")
+            bookmarks = pool.iter_bookmarks(limit=2)
+            for _ in range(3):
+                await bookmarks.__anext__()
+            await bookmarks.aclose()
+        await asyncio.sleep(0.2)
+        gc.collect()
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(main())
+    assert reported == []
@@ -0,0 +1,132 @@
+import asyncio
+import importlib.util
+import json
+import sys
+import pytest
+from benchmarks.fake_server import NOTES_ROOT
+from nextcloud_apps_api import NotesClient, NotesAsyncClient, BookmarkClient, BookmarkAsyncClient
+from nextcloud_apps_api.utils.codec import make_decoder, accept_encoding
+
+INSTALLED = [name for name in ("orjson", "msgspec") if importlib.util.find_spec(name) is not None]
+BROTLI = any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi"))
+
+
+def block(monkeypatch, *names):
+    """
+    Makes importing the named packages fail, as if they were not installed.
+    """
+    for name in names:
+        monkeypatch.setitem(sys.modules, name, None)
+        if name == "msgspec":
+            monkeypatch.setitem(sys.modules, "msgspec.json", None)
+
+
+def decoder_of(name: str):
+    if name == "orjson":
+        import orjson
+        return orjson.loads
+    if name == "msgspec":
+        import msgspec.json
+        return msgspec.json.decode
+    return json.loads
+
+
+def test_default_is_the_first_installed_decoder(monkeypatch):
+    assert make_decoder() is decoder_of((INSTALLED + ["json"])[0])
+    block(monkeypatch, "orjson")
+    assert make_decoder() is decoder_of(([name for name in INSTALLED if name != "orjson"] + ["json"])[0])
+    block(monkeypatch, "msgspec")
+    assert make_decoder() is json.loads
+
+
+@pytest.mark.parametrize("name", INSTALLED + ["json"])
+def test_named_decoder_is_used(name):
+    decode = make_decoder(name)
+    assert decode is decoder_of(name)
+    assert decode(b'[{"id": 1, "title": "Gr\\u00fc\\u00dfe"}]') == [{"id": 1, "title": "Grüße"}]
+
+
+def test_callable_is_used_as_is():
+    decode = lambda body: body
+    assert make_decoder(decode) is decode
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError, match="simplejson"):
+        make_decoder("simplejson")
+
+
+@pytest.mark.parametrize("name", ["orjson", "msgspec"])
+def test_requested_decoder_that_is_not_installed(name, monkeypatch):
+    block(monkeypatch, name)
+    with pytest.raises(ImportError):
+        make_decoder(name)
+    with pytest.raises(ImportError):
+        NotesClient("http://127.0.0.1", json_decoder=name)
+
+
+def test_accept_encoding_offers_brotli_only_if_installed():
+    assert accept_encoding() == ("br, gzip" if BROTLI else "gzip")
+
+
+@pytest.mark.parametrize("name", INSTALLED + ["json"])
+def test_empty_bodies_decode_to_none(name, nextcloud):
+    server = nextcloud()
+    server.answer(NOTES_ROOT + "/settings", 200, times=2)
+    with NotesClient(server.host, json_decoder=name) as nc:
+        assert nc.get_settings() == (200, None)
+
+    async def main():
+        async with NotesAsyncClient(server.host, json_decoder=name) as nc:
+            return await nc.get_settings()
+
+    assert asyncio.run(main()) == (200, None)
+
+
+def compressing_server(nextcloud):
+    """
+    :return: Compressing server holding 30 notes of prose and 250 bookmarks, and the list of content codings it
+    chose.
+    """
+    server = nextcloud(notes=30, bookmarks=250, content_size=5000, prose=True, compress=True)
+    codings = []
+    choose = server.coding
+    server.coding = lambda request: codings.append(choose(request)) or codings[-1]
+    return server, codings
+
+
+@pytest.mark.parametrize("name", INSTALLED + ["json"])
+def test_sync_client_reads_compressed_responses(name, nextcloud, tmp_path):
+    server, codings = compressing_server(nextcloud)
+    notes = list(server.notes.values())
+    export = b"".join(server.export_chunks())
+    with NotesClient(server.host, json_decoder=name) as nc, BookmarkClient(server.host, json_decoder=name) as bc:
+        assert nc.get_notes() == (200, notes)
+        assert list(nc.stream_notes(read_size=1000)) == notes
+        assert nc.get_notes(7)[1] == server.notes[7]
+        assert bc.get_bookmarks(page=0, limit=250)[1] == list(server.bookmarks.values())
+        assert len(list(bc.iter_exported_bookmarks(read_size=1000))) == 250
+        assert bc.export_bookmarks(str(tmp_path / "export.html")) == (200, len(export))
+    assert (tmp_path / "export.html").read_bytes() == export
+    assert codings == ["br" if BROTLI else "gzip"] * 6
+
+
+@pytest.mark.parametrize("name", INSTALLED + ["json"])
+def test_async_client_reads_compressed_responses(name, nextcloud, tmp_path):
+    server, codings = compressing_server(nextcloud)
+    notes = list(server.notes.values())
+    export = b"".join(server.export_chunks())
+
+    async def main():
+        async with NotesAsyncClient(server.host, json_decoder=name) as nc, \
+                BookmarkAsyncClient(server.host, json_decoder=name) as bc:
+            assert await nc.get_notes() == (200, notes)
+            assert [note async for note in nc.stream_notes(read_size=1000)] == notes
+            assert (await nc.get_notes(7))[1] == server.notes[7]
+            assert (await bc.get_bookmarks(page=0, limit=250))[1] == list(server.bookmarks.values())
+            assert len([bookmark async for bookmark in bc.iter_exported_bookmarks(read_size=1000)]) == 250
+            assert await bc.export_bookmarks(str(tmp_path / "export.html")) == (200, len(export))
+
+    asyncio.run(main())
+    assert (tmp_path / "export.html").read_bytes() == export
+    assert codings == ["br" if BROTLI else "gzip"] * 6
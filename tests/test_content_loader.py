@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import warnings
+import pytest
+from benchmarks.fake_server import NOTES_ROOT
+from nextcloud_apps_api import NotesClient, NotesAsyncClient
+
+def slow_server(nextcloud, latency: float = 0.05):
+    """
+    :return: Server holding 30 notes whose content names them.
+    """
+    server = nextcloud(notes=30, latency=latency)
+    for id_, note in server.notes.items():
+        note["content"] = f"Content {id_}"
+    return server
+
+
+def fetched(server) -> list:
+    """
+    :return: Path of every note fetched on its own.
+    """
+    return [path_qs for method, path_qs, status in server.log if path_qs.startswith(NOTES_ROOT + "/notes/")]
+
+
+def load_concurrently(notes: list) -> float:
+    barrier = threading.Barrier(len(notes))
+    contents = {}
+
+    def load(note):
+        barrier.wait()
+        contents[note.id] = note.content
+
+    threads = [threading.Thread(target=load, args=(note,)) for note in notes]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert contents == {note.id: f"Content {note.id}" for note in notes}
+    return time.perf_counter() - start
+
+
+def test_small_batch_is_fetched_concurrently(nextcloud):
+    server = slow_server(nextcloud)
+    with NotesClient(server.host, pool_maxsize=20, flow_control=False) as nc:
+        status, notes = nc.get_notes(exclude=["content"], model=True)
+        elapsed = load_concurrently(notes[:15])
+    assert len(fetched(server)) == 15
+    # One after another, 15 requests would take 0.75 seconds.
+    assert elapsed < 0.4
+
+
+def test_large_batch_fetches_only_the_requested_notes(nextcloud):
+    server = slow_server(nextcloud)
+    with NotesClient(server.host, pool_maxsize=20, flow_control=False) as nc:
+        status, notes = nc.get_notes(exclude=["content"], model=True)
+        load_concurrently(notes[:25])
+    assert sorted(fetched(server)) == sorted(f"{NOTES_ROOT}/notes/{i}" for i in range(1, 26))
+    assert server.peak == 10
+
+
+def test_async_loads_fetch_only_the_requested_notes(nextcloud):
+    server = slow_server(nextcloud)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            status, notes = await nc.get_notes(exclude=["content"], model=True)
+            contents = await asyncio.gather(*(note.load_content() for note in notes[:25]))
+            assert contents == [f"Content {i}" for i in range(1, 26)]
+            # Loaded content is kept.
+            assert await notes[0].load_content() == "Content 1"
+            # Unloaded content is an error that hasattr and getattr do not hide.
+            with pytest.raises(RuntimeError, match="load_content"):
+                getattr(notes[25], "content", None)
+            with pytest.raises(RuntimeError):
+                hasattr(notes[25], "content")
+
+    asyncio.run(main())
+    assert sorted(fetched(server)) == sorted(f"{NOTES_ROOT}/notes/{i}" for i in range(1, 26))
+    assert server.peak == 10
+
+
+def test_loads_neither_warn_nor_touch_warning_filters(nextcloud):
+    host = slow_server(nextcloud, latency=0.01).host
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        filters = list(warnings.filters)
+        with NotesClient(host, flow_control=False) as nc:
+            status, notes = nc.get_notes(exclude=["content"], model=True)
+            load_concurrently(notes[:5])
+            load_concurrently(notes[5:30])
+
+        async def main():
+            async with NotesAsyncClient(host) as nc:
+                status, notes = await nc.get_notes(exclude=["content"], model=True)
+                first = asyncio.gather(*(note.load_content() for note in notes[:5]))
+                await asyncio.sleep(0.005)
+                await asyncio.gather(first, *(note.load_content() for note in notes[5:30]))
+
+        asyncio.run(main())
+        assert warnings.filters == filters
+    assert [str(warning.message) for warning in caught if "content" in str(warning.message)] == []
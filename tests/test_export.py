@@ -0,0 +1,50 @@
+import asyncio
+import os
+import pytest
+from benchmarks.fake_server import BOOKMARKS_ROOT
+from nextcloud_apps_api import BookmarkClient, BookmarkAsyncClient
+from nextcloud_apps_api.utils.custom_exceptions import RequestError
+
+
+def test_sync_failed_export_keeps_previous_backup(nextcloud, tmp_path):
+    server = nextcloud(bookmarks=3)
+    export = b"".join(server.export_chunks())
+    backup = tmp_path / "backup.html"
+    with BookmarkClient(server.host, flow_control=False) as bc:
+        assert bc.export_bookmarks(str(backup)) == (200, len(export))
+        server.answer(BOOKMARKS_ROOT + "/export", 503)
+        with pytest.raises(RequestError):
+            bc.export_bookmarks(str(backup))
+    assert backup.read_bytes() == export
+    assert os.listdir(tmp_path) == ["backup.html"]
+
+
+def test_async_failed_export_keeps_previous_backup(nextcloud, tmp_path):
+    server = nextcloud(bookmarks=3)
+    export = b"".join(server.export_chunks())
+    backup = tmp_path / "backup.html"
+
+    async def main():
+        async with BookmarkAsyncClient(server.host, flow_control=False) as bc:
+            assert await bc.export_bookmarks(str(backup)) == (200, len(export))
+            server.answer(BOOKMARKS_ROOT + "/export", 503)
+            with pytest.raises(RequestError):
+                await bc.export_bookmarks(str(backup))
+
+    asyncio.run(main())
+    assert backup.read_bytes() == export
+    assert os.listdir(tmp_path) == ["backup.html"]
+
+
+def test_empty_export_reports_its_status(nextcloud, tmp_path):
+    server = nextcloud()
+    server.answer(BOOKMARKS_ROOT + "/export", 200, times=2)
+    with BookmarkClient(server.host) as bc:
+        assert bc.export_bookmarks(str(tmp_path / "sync.html")) == (200, 0)
+
+    async def main():
+        async with BookmarkAsyncClient(server.host) as bc:
+            return await bc.export_bookmarks(str(tmp_path / "async.html"))
+
+    assert asyncio.run(main()) == (200, 0)
+    assert (tmp_path / "sync.html").read_bytes() == (tmp_path / "async.html").read_bytes() == b""
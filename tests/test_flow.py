@@ -0,0 +1,179 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+import pytest
+from nextcloud_apps_api import FlowControl, AsyncFlowControl
+from nextcloud_apps_api.utils.flow import retry_after
+
+
+@pytest.fixture
+def full_jitter(monkeypatch):
+    """
+    Makes the jittered backoff always wait its upper bound.
+    """
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+
+
+def test_successes_raise_the_limit_up_to_max_limit():
+    flow = FlowControl(initial_limit=2, max_limit=3)
+    flow.finish(flow.acquire(), "GET", 200)
+    assert flow.limit == 2.5
+    for _ in range(10):
+        flow.finish(flow.acquire(), "GET", 200)
+    assert flow.limit == 3
+    assert flow.in_flight == 0
+
+
+def test_overload_halves_the_limit_down_to_min_limit():
+    flow = FlowControl(initial_limit=8, min_limit=3)
+    flow.finish(flow.acquire(), "POST", 503)
+    assert flow.limit == 4
+    flow.finish(flow.acquire(), "POST", 429)
+    assert flow.limit == 3
+
+
+def test_requests_sent_before_a_decrease_do_not_decrease_again():
+    flow = FlowControl(initial_limit=8)
+    tickets = [flow.acquire() for _ in range(4)]
+    for ticket in tickets:
+        flow.finish(ticket, "POST", 503)
+    assert flow.limit == 4
+    flow.finish(flow.acquire(), "POST", 503)
+    assert flow.limit == 2
+
+
+def test_errors_and_failed_requests_leave_the_limit():
+    flow = FlowControl(initial_limit=4)
+    assert flow.finish(flow.acquire(), "GET", 500) is None
+    assert flow.finish(flow.acquire()) is None
+    assert flow.limit == 4 and flow.in_flight == 0
+
+
+def test_only_idempotent_methods_are_retried(full_jitter):
+    flow = FlowControl(base_delay=0.1)
+    for method in ("GET", "PUT", "DELETE"):
+        assert flow.finish(flow.acquire(), method, 503) == 0.1
+    assert flow.finish(flow.acquire(), "POST", 503) is None
+
+
+def test_backoff_doubles_up_to_max_delay(full_jitter):
+    flow = FlowControl(base_delay=0.1, max_delay=0.5, max_retries=5)
+    delays = [flow.finish(flow.acquire(), "GET", 503, attempt=attempt) for attempt in range(5)]
+    assert delays == [0.1, 0.2, 0.4, 0.5, 0.5]
+    assert flow.finish(flow.acquire(), "GET", 503, attempt=5) is None
+
+
+def test_backoff_is_jittered():
+    flow = FlowControl(base_delay=1.0, min_retries=100)
+    delays = {flow.finish(flow.acquire(), "GET", 503, attempt=1) for _ in range(20)}
+    assert len(delays) > 1 and all(0 <= delay <= 2.0 for delay in delays)
+
+
+def test_retry_budget_limits_retries():
+    flow = FlowControl(min_retries=2, retry_budget=0.5, base_delay=0)
+    # Retries of the same request do not earn any budget.
+    retries = [flow.finish(flow.acquire(), "GET", 503, attempt=1) for _ in range(3)]
+    assert [delay is not None for delay in retries] == [True, True, False]
+    flow.finish(flow.acquire(), "GET", 200)
+    assert flow.finish(flow.acquire(), "GET", 503, attempt=1) is None
+    flow.finish(flow.acquire(), "GET", 200)
+    assert flow.finish(flow.acquire(), "GET", 503, attempt=1) is not None
+
+
+def test_retry_budget_saves_up_to_min_retries():
+    flow = FlowControl(min_retries=2, retry_budget=1, base_delay=0)
+    for _ in range(10):
+        flow.finish(flow.acquire(), "GET", 200)
+    retries = [flow.finish(flow.acquire(), "GET", 503, attempt=1) for _ in range(3)]
+    assert [delay is not None for delay in retries] == [True, True, False]
+
+
+def test_retry_after_holds_back_every_request(full_jitter):
+    flow = FlowControl(base_delay=0.01)
+    assert flow.finish(flow.acquire(), "GET", 503, "0.2") == 0.2
+    start = time.monotonic()
+    flow.finish(flow.acquire(), "POST", 200)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_retry_after_is_capped_at_max_delay():
+    flow = FlowControl(max_delay=0.1)
+    assert flow.finish(flow.acquire(), "GET", 503, "86400") == 0.1
+    assert flow._resume_at - time.monotonic() <= 0.1
+    # Not retried, but still holding back the others.
+    flow.finish(flow.acquire(), "POST", 429, "86400")
+    assert flow._resume_at - time.monotonic() <= 0.1
+
+
+def test_retry_after_header_formats():
+    assert retry_after("3") == 3.0
+    assert retry_after("-3") == 0.0
+    assert retry_after(None) is None
+    assert retry_after("soon") is None
+    assert 58 < retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+
+
+def test_acquire_waits_for_a_free_slot():
+    flow = FlowControl(initial_limit=1)
+    ticket = flow.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (flow.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    flow.finish(ticket, "GET", 200)
+    assert acquired.wait(1)
+    thread.join()
+    assert flow.in_flight == 1
+
+
+def test_async_acquire_waits_for_a_free_slot():
+    flow = AsyncFlowControl(initial_limit=2, max_limit=2)
+
+    async def main():
+        tickets = [await flow.acquire(), await flow.acquire()]
+        waiting = asyncio.ensure_future(flow.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        flow.finish(tickets[0], "GET", 200)
+        flow.finish(await asyncio.wait_for(waiting, 1), "GET", 200)
+        flow.finish(tickets[1], "GET", 200)
+
+    asyncio.run(main())
+    assert flow.in_flight == 0
+
+
+def test_async_slot_is_handed_on_when_woken_waiter_is_cancelled():
+    flow = AsyncFlowControl(initial_limit=1, max_limit=1)
+
+    async def main():
+        ticket = await flow.acquire()
+        b = asyncio.ensure_future(flow.acquire())
+        c = asyncio.ensure_future(flow.acquire())
+        await asyncio.sleep(0)
+        # B is woken, then cancelled before it gets to run.
+        flow.finish(ticket)
+        b.cancel()
+        flow.finish(await asyncio.wait_for(c, 1))
+        assert b.cancelled()
+
+    asyncio.run(main())
+    assert flow.in_flight == 0
+
+
+def test_async_cancelled_waiter_leaves_the_queue():
+    flow = AsyncFlowControl(initial_limit=1, max_limit=1)
+
+    async def main():
+        ticket = await flow.acquire()
+        b = asyncio.ensure_future(flow.acquire())
+        await asyncio.sleep(0)
+        b.cancel()
+        await asyncio.sleep(0)
+        assert len(flow._waiters) == 0
+        flow.finish(ticket)
+        flow.finish(await asyncio.wait_for(flow.acquire(), 1))
+
+    asyncio.run(main())
+    assert flow.in_flight == 0
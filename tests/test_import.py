@@ -0,0 +1,22 @@
+import os
+import pytest
+from benchmarks.bench_import import SCENARIOS, measure_once
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def startup_modules():
+    """
+    Modules a bare interpreter imports on its own.
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(ROOT)
+        return measure_once("pass")[1]
+
+
+@pytest.mark.parametrize("statement, forbidden", SCENARIOS)
+def test_statement_does_not_import_unneeded_modules(statement, forbidden, startup_modules, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    total, modules = measure_once(statement)
+    assert set(forbidden) & (modules - startup_modules) == set()
@@ -0,0 +1,131 @@
+import asyncio
+from nextcloud_apps_api import (SearchIndex, Note, Bookmark, NotesClient, NotesAsyncClient, BookmarkClient,
+                                BookmarkAsyncClient)
+
+NOTES = [
+    {"id": 1, "title": "Python release", "content": "Notes on the asyncio changes", "category": "Work"},
+    {"id": 2, "title": "Shopping list", "content": "milk, eggs and bread", "category": ""},
+    {"id": 3, "title": "Trip", "content": "flight and hotel for the python conference", "category": "Travel"},
+]
+BOOKMARKS = [
+    {"id": 1, "url": "https://docs.python.org/asyncio", "title": "asyncio", "description": "Reference",
+     "tags": ["python", "reference"]},
+    {"id": 2, "url": "https://example.com/bread", "title": "Bread recipe", "description": "", "tags": ["cooking"]},
+    {"id": 3, "url": "https://example.com/c++", "title": "C++ tips", "description": "Python bindings",
+     "tags": ["reference"]},
+]
+
+
+def filled() -> SearchIndex:
+    index = SearchIndex()
+    index.add_notes(NOTES)
+    index.add_bookmarks(BOOKMARKS)
+    return index
+
+
+def ids(hits) -> set:
+    return {(("bookmark" if "url" in hit else "note"), hit["id"]) for hit in hits}
+
+
+def test_and_of_words_and_tags():
+    index = filled()
+    assert ids(index.search("python")) == {("note", 1), ("note", 3), ("bookmark", 1), ("bookmark", 3)}
+    assert ids(index.search(["python", "conference"])) == {("note", 3)}
+    assert ids(index.search("python", tags="reference")) == {("bookmark", 1), ("bookmark", 3)}
+    assert ids(index.search(["asyncio", "python"], tags=["python", "reference"])) == {("bookmark", 1)}
+    assert index.search(["python", "milk"]) == []
+    assert index.search("nowhere") == []
+
+
+def test_or_of_words_and_tags():
+    index = filled()
+    assert ids(index.search(["milk", "hotel"], conjunction="or")) == {("note", 2), ("note", 3)}
+    assert ids(index.search("milk", tags="cooking", conjunction="or")) == {("note", 2), ("bookmark", 2)}
+    assert ids(index.search(["nowhere", "bread"], conjunction="or")) == {("note", 2), ("bookmark", 2)}
+
+
+def test_search_words_are_split_like_indexed_text():
+    index = filled()
+    # 'c++' is indexed as 'c'; 'Shopping list' has to match both words.
+    assert ids(index.search("C++")) == {("bookmark", 3)}
+    assert ids(index.search("shopping list")) == {("note", 2)}
+    assert ids(index.search("PYTHON", kind="note")) == {("note", 1), ("note", 3)}
+
+
+def test_category_and_kind_filters():
+    index = filled()
+    assert ids(index.search(category="Work")) == {("note", 1)}
+    assert ids(index.search("python", category="Travel")) == {("note", 3)}
+    assert ids(index.search(category="")) == {("note", 2)}
+    assert index.search("python", category="Cooking") == []
+    assert ids(index.search(kind="bookmark")) == {("bookmark", 1), ("bookmark", 2), ("bookmark", 3)}
+    assert len(index.search()) == len(index) == 6
+
+
+def test_adding_an_item_again_replaces_it():
+    index = filled()
+    index.add_note({"id": 1, "title": "Groceries", "content": "", "category": "Home"})
+    index.add_bookmark({"id": 1, "url": "https://example.com", "title": "Moved", "tags": ["misc"]})
+    assert len(index) == 6
+    assert index.search("release") == [] and index.search(category="Work") == []
+    assert ids(index.search(tags="python")) == set()
+    assert ids(index.search(category="Home")) == {("note", 1)}
+    assert ids(index.search(tags="misc")) == {("bookmark", 1)}
+    index.remove_note(1)
+    index.remove_bookmark(2)
+    index.remove_bookmark(99)
+    assert len(index) == 4 and index.search("groceries") == [] and index.search(tags="cooking") == []
+    # Emptied index entries are dropped.
+    assert "groceries" not in index._postings and "cooking" not in index._tags
+
+
+def test_records_are_indexed_and_returned():
+    index = SearchIndex()
+    note = Note.from_dict(NOTES[0])
+    bookmark = Bookmark.from_dict(BOOKMARKS[1])
+    # Content that was never loaded is left out.
+    index.add_notes([note, Note(4, title="Python draft", category="Work")])
+    index.add_bookmarks([bookmark])
+    assert index.search("asyncio") == [note]
+    assert index.search("bread") == [bookmark]
+    assert len(index.search("python", category="Work")) == 2
+
+
+def test_watch_follows_post_put_and_delete(nextcloud):
+    server = nextcloud(notes=0, bookmarks=0)
+    index = SearchIndex()
+    with NotesClient(server.host) as nc, BookmarkClient(server.host) as bc:
+        index.watch(nc)
+        index.watch(bc)
+        status, note = nc.post_note("Draft", "first words", "Work")
+        status, bookmark = bc.post_bookmark("https://example.com/a", "Example", tags=["misc"])
+        assert index.search("words") == [note] and index.search(tags="misc") == [bookmark]
+        nc.put_note(note["id"], content="second try")
+        bc.put_bookmark(bookmark["id"], tags=["other"])
+        assert index.search("words") == [] and index.search("second")[0]["id"] == note["id"]
+        assert index.search(tags="misc") == [] and index.search(tags="other")[0]["id"] == bookmark["id"]
+        nc.delete_note(note["id"])
+        assert index.search(category="Work") == [] and len(index) == 1
+        index.unwatch(bc)
+        bc.delete_bookmark(bookmark["id"])
+        assert len(index) == 1
+
+
+def test_watch_async_clients(nextcloud):
+    server = nextcloud(notes=0, bookmarks=0)
+    index = SearchIndex()
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc, BookmarkAsyncClient(server.host) as bc:
+            index.watch(nc)
+            index.watch(bc)
+            status, note = await nc.post_note("Draft", "first words")
+            status, bookmark = await bc.post_bookmark("https://example.com/a", "Example")
+            await nc.put_note(note["id"], title="Final")
+            assert ids(index.search(["final", "example"], conjunction="or")) == {("note", note["id"]),
+                                                                                ("bookmark", bookmark["id"])}
+            await bc.delete_bookmark(bookmark["id"])
+            await nc.delete_note(note["id"])
+            assert len(index) == 0
+
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+import json
+from benchmarks.fake_server import NOTES_ROOT, BOOKMARKS_ROOT
+from nextcloud_apps_api import NotesClient, NotesAsyncClient, BookmarkClient, BookmarkAsyncClient, Instrumentation
+
+
+def check(metrics: Instrumentation, server):
+    series = metrics.to_dict()
+    notes = series["GET " + NOTES_ROOT + "/notes"]
+    export = series["GET " + BOOKMARKS_ROOT + "/export"]
+    # Read in full once, then abandoned after the first note, which is not an error.
+    assert notes["count"] == 2 and notes["statuses"] == {200: 2} and notes["errors"] == {}
+    assert notes["bytes_received"] >= len(json.dumps(list(server.notes.values())))
+    assert export["count"] == 1 and export["statuses"] == {200: 1}
+    assert export["bytes_received"] == len(b"".join(server.export_chunks()))
+    assert "download" in export["phases"]
+
+
+def test_sync_streams_are_measured(nextcloud):
+    server = nextcloud(notes=50, content_size=1000)
+    metrics = Instrumentation()
+    with NotesClient(server.host, instrumentation=metrics) as nc, \
+            BookmarkClient(server.host, instrumentation=metrics) as bc:
+        assert len(list(nc.stream_notes(read_size=1024))) == 50
+        stream = nc.stream_notes(read_size=1024)
+        next(stream)
+        stream.close()
+        assert len(list(bc.iter_exported_bookmarks(read_size=512))) == 100
+    check(metrics, server)
+
+
+def test_async_streams_are_measured(nextcloud):
+    server = nextcloud(notes=50, content_size=1000)
+    metrics = Instrumentation()
+
+    async def main():
+        async with NotesAsyncClient(server.host, instrumentation=metrics) as nc, \
+                BookmarkAsyncClient(server.host, instrumentation=metrics) as bc:
+            assert len([note async for note in nc.stream_notes(read_size=1024)]) == 50
+            stream = nc.stream_notes(read_size=1024)
+            await stream.__anext__()
+            await stream.aclose()
+            assert len([bookmark async for bookmark in bc.iter_exported_bookmarks(read_size=512)]) == 100
+
+    asyncio.run(main())
+    check(metrics, server)
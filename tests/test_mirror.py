@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+from benchmarks.fake_server import NOTES_ROOT
+from nextcloud_apps_api import NotesClient, NotesAsyncClient, NotesMirror, NotesAsyncMirror
+
+
+def seeded_server(nextcloud):
+    """
+    :return: Server holding notes 1 and 2, modified at 100 and 101 on a clock advancing by one with every save.
+    """
+    server = nextcloud(notes=0, bookmarks=0, clock=itertools.count(100).__next__)
+    server.save_note(1, title="One", content="First")
+    server.save_note(2, title="Two", content="Second", category="Work")
+    return server
+
+
+def listings(server) -> list:
+    """
+    :return: (query, status) of every listing of the notes.
+    """
+    return [(path_qs[len(NOTES_ROOT + "/notes"):], status) for method, path_qs, status in server.log
+            if method == "GET" and path_qs.split("?")[0] == NOTES_ROOT + "/notes"]
+
+
+def test_clean_sync_and_unchanged_list(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        assert mirror.sync() == 2
+        assert mirror.list_notes() == [server.notes[1], server.notes[2]]
+        assert mirror.list_notes(category="Work") == [server.notes[2]]
+        assert mirror.sync() == 0
+    assert listings(server) == [("", 200), ("?pruneBefore=101", 304)]
+
+
+def test_changed_note_is_pulled_and_pruned_note_kept(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        server.save_note(1, content="Changed")
+        assert mirror.sync() == 1
+        server.save_note(1, content="Changed again")
+        assert mirror.sync() == 1
+        assert mirror.get_note(1)["content"] == "Changed again"
+        # Note 2 only came back as a stub and keeps its content.
+        assert mirror.get_note(2) == server.notes[2]
+    # Notes modified at the newest time seen are sent in full once more, older ones as stubs.
+    assert listings(server) == [("", 200), ("?pruneBefore=101", 200), ("?pruneBefore=102", 200)]
+
+
+def test_added_note_older_than_the_last_sync_is_pulled(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        # Comes back as a stub, having been modified before the newest note the mirror saw.
+        server.save_note(3, title="Moved in", content="Old")["modified"] = 50
+        assert mirror.sync() == 1
+        assert mirror.get_note(3) == server.notes[3]
+        assert mirror.sync() == 0
+    assert listings(server)[1] == ("?pruneBefore=101", 200)
+
+
+def test_remote_delete_is_removed_locally(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        del server.notes[2]
+        assert mirror.sync() == 1
+        assert mirror.get_note(2) is None
+        assert [note["id"] for note in mirror.list_notes()] == [1]
+
+
+def test_remote_delete_of_modified_note_is_a_conflict(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        mirror.update_note(2, content="Local")
+        del server.notes[2]
+        assert mirror.sync() == 1
+        local, remote = mirror.conflicts()[0]
+        assert local["content"] == "Local" and remote is None
+        mirror.resolve(2, keep="local")
+        assert mirror.push() == []
+    assert [note["content"] for note in server.notes.values()] == ["First", "Local"]
+
+
+def test_local_changes_are_pushed(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        created = mirror.create_note("Three", "Third")
+        assert created["id"] < 0
+        mirror.update_note(1, title="Uno")
+        mirror.remove_note(2)
+        assert mirror.push() == []
+        assert [note["title"] for note in mirror.list_notes()] == ["Uno", "Three"]
+        assert mirror.sync() == 0
+    assert [note["title"] for note in server.notes.values()] == ["Uno", "Three"]
+
+
+def test_conflicting_push_is_recorded_and_resolved(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        mirror.update_note(1, content="Local")
+        mirror.update_note(2, content="Local")
+        server.save_note(1, content="Remote")
+        assert mirror.push() == [1]
+        assert server.notes[2]["content"] == "Local"
+        local, remote = mirror.conflicts()[0]
+        assert local["content"] == "Local" and remote == server.notes[1]
+        mirror.resolve(1, keep="remote")
+        assert mirror.conflicts() == [] and mirror.get_note(1)["content"] == "Remote"
+        # Keeping the local version sends it with the ETag of the server version.
+        mirror.update_note(1, content="Local again")
+        server.save_note(1, content="Remote again")
+        assert mirror.push() == [1]
+        mirror.resolve(1, keep="local")
+        assert mirror.push() == []
+    assert server.notes[1]["content"] == "Local again"
+
+
+def test_delete_of_note_gone_on_server(nextcloud):
+    server = seeded_server(nextcloud)
+    with NotesClient(server.host) as nc, NotesMirror(nc) as mirror:
+        mirror.sync()
+        mirror.remove_note(2)
+        del server.notes[2]
+        assert mirror.push() == []
+        assert mirror.get_note(2) is None and mirror.conflicts() == []
+
+
+def test_async_mirror(nextcloud):
+    server = seeded_server(nextcloud)
+
+    async def main():
+        async with NotesAsyncClient(server.host) as nc:
+            mirror = NotesAsyncMirror(nc)
+            assert await mirror.sync() == 2
+            server.save_note(3, title="Moved in")["modified"] = 50
+            assert await mirror.sync() == 1 and mirror.get_note(3) == server.notes[3]
+            server.save_note(2, title="Changed")
+            mirror.update_note(2, content="Local")
+            assert await mirror.sync() == 1
+            assert mirror.conflicts()[0][1] == server.notes[2]
+            mirror.resolve(2, keep="local")
+            assert await mirror.push() == []
+            # The pushed note was stored as the server returned it.
+            assert await mirror.sync() == 0
+            mirror.close()
+
+    asyncio.run(main())
+    # Keeping the local version overwrites every field.
+    assert server.notes[2]["title"] == "Two" and server.notes[2]["content"] == "Local"
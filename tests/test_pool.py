@@ -0,0 +1,193 @@
+import asyncio
+import pytest
+from benchmarks.fake_server import NOTES_ROOT, free_port
+from nextcloud_apps_api import AsyncClientPool, ResponseCache
+from nextcloud_apps_api.utils.custom_exceptions import RequestError
+
+
+def unreachable() -> str:
+    """
+    :return: Address nothing listens on.
+    """
+    return f"http://127.0.0.1:{free_port()}"
+
+
+def run(main):
+    """
+    Runs main(), then checks that it left no task running behind.
+    """
+    async def checked():
+        result = await main()
+        await asyncio.sleep(0)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        return result
+
+    return asyncio.run(checked())
+
+
+def test_notes_and_bookmarks_of_all_accounts_are_merged(nextcloud):
+    first, second = nextcloud(notes=5, bookmarks=5, jitter=0.01), nextcloud(notes=3, bookmarks=7, jitter=0.01)
+
+    async def main():
+        async with AsyncClientPool() as pool:
+            names = [pool.add_account(first.host, "alice"), pool.add_account(first.host, "bob"),
+                     pool.add_account(second.host, "carol")]
+            notes = [item async for item in pool.iter_notes()]
+            bookmarks = [item async for item in pool.iter_bookmarks(limit=2)]
+            return names, notes, bookmarks
+
+    names, notes, bookmarks = run(main)
+    for merged, items in ((notes, "notes"), (bookmarks, "bookmarks")):
+        assert len(merged) == 2 * len(getattr(first, items)) + len(getattr(second, items))
+        for name, server in zip(names, (first, first, second)):
+            assert [item for account, item in merged if account == name] == list(getattr(server, items).values())
+
+
+def test_unreachable_account(nextcloud):
+    server = nextcloud(notes=3)
+
+    async def main():
+        async with AsyncClientPool(flow_control=False) as pool:
+            alive = pool.add_account(server.host, "alice")
+            dead = pool.add_account(unreachable(), "bob")
+            merged = [item async for item in pool.iter_notes(return_exceptions=True)]
+            errors = [(name, item) for name, item in merged if isinstance(item, Exception)]
+            assert [name for name, item in errors] == [dead]
+            assert [item for name, item in merged if name == alive] == list(server.notes.values())
+            with pytest.raises(Exception) as raised:
+                [item async for item in pool.iter_notes()]
+            assert type(raised.value) is type(errors[0][1])
+
+    run(main)
+
+
+def test_stopping_early_cancels_every_reader(nextcloud):
+    servers = [nextcloud(notes=200, bookmarks=200, latency=0.02) for _ in range(3)]
+
+    async def main():
+        async with AsyncClientPool() as pool:
+            for server in servers:
+                pool.add_account(server.host, "alice")
+            for merged in (pool.iter_notes(), pool.iter_bookmarks(limit=5)):
+                await merged.__anext__()
+                await merged.aclose()
+                assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    run(main)
+
+
+def test_merge_holds_back_readers_of_a_slow_consumer():
+    produced = []
+
+    async def produce(name):
+        for i in range(5000):
+            produced.append(i)
+            yield i
+
+    async def main():
+        async with AsyncClientPool() as pool:
+            merged = pool._merge(["a"], produce, None, False)
+            assert await merged.__anext__() == ("a", 0)
+            await asyncio.sleep(0.05)
+            # The queue holds 1000 items, one more waits to be put in.
+            assert len(produced) <= 1002
+            await merged.aclose()
+
+    run(main)
+    assert len(produced) < 5000
+
+
+def test_accounts_of_a_server_share_its_limit(nextcloud):
+    busy, other = nextcloud(notes=40, latency=0.02), nextcloud(notes=40, latency=0.02)
+
+    async def main():
+        async with AsyncClientPool(limit_per_host=3) as pool:
+            names = [pool.add_account(busy.host, "alice"), pool.add_account(busy.host, "bob"),
+                     pool.add_account(other.host, "carol")]
+            clients = [await pool.notes(name) for name in names] + [await pool.bookmarks(names[0])]
+            flows = [client.flow_control for client in clients]
+            assert flows[0] is flows[1] is flows[3] and flows[2] is not flows[0]
+            assert flows[0].max_limit == 3
+            # Each asks for more requests in flight than its server allows.
+            await asyncio.gather(clients[0].delete_notes(list(range(1, 21)), concurrency=5),
+                                 clients[1].delete_notes(list(range(21, 41)), concurrency=5),
+                                 clients[2].delete_notes(list(range(1, 41)), concurrency=5))
+
+    run(main)
+    assert busy.notes == other.notes == {}
+    assert busy.peak == other.peak == 3
+
+
+def test_fan_out_reports_every_account(nextcloud):
+    server = nextcloud()
+    dead = unreachable()
+
+    async def main():
+        async with AsyncClientPool(flow_control=False) as pool:
+            names = [pool.add_account(server.host, "alice"), pool.add_account(server.host, "bob"),
+                     pool.add_account(dead, "carol")]
+            results = {result.item: result async for result in pool.fan_out("notes", "get_settings", concurrency=2)}
+            assert set(results) == set(names)
+            for name in names[:2]:
+                assert results[name].status == 200 and results[name].result == server.settings
+                assert results[name].error is None
+            assert results[names[2]].result is None and results[names[2]].error is not None
+            only = [result.item async for result in pool.fan_out("notes", "get_notes", 1, accounts=names[:1])]
+            assert only == names[:1]
+            with pytest.raises(KeyError):
+                await pool.fan_out("notes", "get_settings", accounts=["nobody"]).__anext__()
+
+    run(main)
+
+
+def test_every_account_gets_its_own_cache(nextcloud):
+    server = nextcloud()
+    cache = ResponseCache(maxsize=7, ttl=60)
+
+    async def main():
+        async with AsyncClientPool(cache=cache) as pool:
+            names = [pool.add_account(server.host, "alice"), pool.add_account(server.host, "bob")]
+            clients = [await pool.notes(name) for name in names]
+            assert len({id(cache)} | {id(client.cache) for client in clients}) == 3
+            assert all((client.cache.maxsize, client.cache.ttl) == (7, 60) for client in clients)
+            for _ in range(2):
+                for client in clients:
+                    await client.get_settings()
+
+    run(main)
+    # Once per account, never answered from the cache of the other one.
+    assert [path for method, path, status in server.log] == [NOTES_ROOT + "/settings"] * 2
+
+
+def test_accounts_do_not_share_cookies(nextcloud):
+    server = nextcloud()
+    server.answer(NOTES_ROOT + "/settings", 200, headers={"Set-Cookie": "nc_session=alice; Path=/"})
+
+    async def main():
+        async with AsyncClientPool() as pool:
+            alice = pool.add_account(server.host, "alice")
+            await (await pool.notes(alice)).get_settings()
+            assert len(pool._session.cookie_jar) == 0
+
+    run(main)
+
+
+def test_remove_account_saves_its_buffered_updates(nextcloud):
+    server = nextcloud(notes=2)
+
+    async def main():
+        async with AsyncClientPool(write_delay=60) as pool:
+            alice, bob = pool.add_account(server.host, "alice"), pool.add_account(server.host, "bob")
+            with pytest.raises(ValueError):
+                pool.add_account(server.host, "alice")
+            await (await pool.notes(alice)).put_note(1, title="From alice")
+            await (await pool.notes(bob)).put_note(2, title="From bob")
+            await pool.remove_account(alice)
+            assert server.notes[1]["title"] == "From alice" and server.notes[2]["title"] == "Note 2"
+            assert pool.accounts == [bob]
+            with pytest.raises(KeyError):
+                await pool.notes(alice)
+
+    run(main)
+    # Closing the pool saved the rest.
+    assert server.notes[2]["title"] == "From bob"
@@ -0,0 +1,50 @@
+from conftest import within
+from nextcloud_apps_api import NotesClient, BookmarkClient
+
+
+def tagged_server(nextcloud):
+    """
+    :return: Server holding 11 bookmarks, those with an odd id tagged "a", the others "b".
+    """
+    server = nextcloud(bookmarks=11)
+    for id_, bookmark in server.bookmarks.items():
+        bookmark["tags"] = ["a" if id_ % 2 else "b"]
+    return server
+
+
+def test_iter_notes_follows_the_cursor(nextcloud):
+    server = nextcloud(notes=7)
+    with NotesClient(server.host) as nc:
+        assert list(nc.iter_notes(chunk_size=2)) == list(server.notes.values())
+
+
+def test_iter_notes_inside_map(nextcloud):
+    # Notes with an odd id are in the category "Journal".
+    server = nextcloud(notes=7)
+    with NotesClient(server.host, max_workers=2) as nc:
+        counts = within(5, lambda: nc.map(lambda c: sum(1 for _ in nc.iter_notes(chunk_size=2, category=c)),
+                                          ["Journal", ""]))
+    assert counts == [4, 3]
+
+
+def test_iter_notes_stopped_early(nextcloud):
+    server = nextcloud(notes=7)
+    with NotesClient(server.host) as nc:
+        notes = nc.iter_notes(chunk_size=2)
+        assert next(notes) == server.notes[1]
+        notes.close()
+        assert nc.map(lambda c: len(list(nc.iter_notes(category=c))), ["Journal"]) == [4]
+
+
+def test_iter_bookmarks_reads_every_page(nextcloud):
+    server = tagged_server(nextcloud)
+    with BookmarkClient(server.host) as bc:
+        assert list(bc.iter_bookmarks(limit=3, concurrency=2)) == list(server.bookmarks.values())
+
+
+def test_iter_bookmarks_inside_map(nextcloud):
+    server = tagged_server(nextcloud)
+    with BookmarkClient(server.host, max_workers=2) as bc:
+        counts = within(5, lambda: bc.map(lambda tag: len(bc.scan_bookmarks(limit=2, concurrency=3, tags=[tag])),
+                                          ["a", "b"]))
+    assert counts == [6, 5]
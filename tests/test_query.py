@@ -0,0 +1,47 @@
+from urllib.parse import parse_qsl, unquote_plus
+import pytest
+from nextcloud_apps_api.utils.query import notes_query, bookmarks_query
+
+AWKWARD = ["a&b=c", "#hash", "1+1", "two words", "grüße 日本", "x,y", "100%", "?q"]
+
+
+def decoded(query: str) -> list:
+    assert query.startswith("?")
+    return parse_qsl(query[1:], keep_blank_values=True)
+
+
+def test_no_parameters():
+    assert notes_query({}) == bookmarks_query({}) == ""
+
+
+@pytest.mark.parametrize("value", AWKWARD)
+def test_scalars_survive_a_round_trip(value):
+    for build in (notes_query, bookmarks_query):
+        query = build({"search": value, "page": 2})
+        assert decoded(query) == [("search", value), ("page", "2")]
+        # Nothing in the value can end the parameter or the query early.
+        assert not set("&# ,") & set(query.split("=", 1)[1].split("&")[0])
+
+
+def test_notes_lists_are_comma_joined():
+    assert notes_query({"exclude": ["content", "favorite"]}) == "?exclude=content,favorite"
+    assert notes_query({"category": "Work", "exclude": ("content",)}) == "?category=Work&exclude=content"
+
+
+def test_commas_inside_notes_list_values_are_encoded():
+    query = notes_query({"exclude": ["x,y", "z w", "1+1"]})
+    assert query == "?exclude=x%2Cy,z+w,1%2B1"
+    # Only the commas joining the list are left unencoded.
+    assert [unquote_plus(value) for value in query[len("?exclude="):].split(",")] == ["x,y", "z w", "1+1"]
+
+
+def test_bookmarks_lists_repeat_the_key():
+    query = bookmarks_query({"tags": ["a", "b c", "x,y", "ä&ö"], "conjunction": "and"})
+    assert query == "?tags[]=a&tags[]=b+c&tags[]=x%2Cy&tags[]=%C3%A4%26%C3%B6&conjunction=and"
+    assert decoded(query) == [("tags[]", "a"), ("tags[]", "b c"), ("tags[]", "x,y"), ("tags[]", "ä&ö"),
+                              ("conjunction", "and")]
+
+
+def test_empty_lists():
+    assert notes_query({"exclude": []}) == "?exclude="
+    assert bookmarks_query({"tags": []}) == ""
@@ -0,0 +1,17 @@
+import gc
+import threading
+from nextcloud_apps_api import NotesClient
+
+
+def test_sessions_of_finished_threads_are_released(nextcloud):
+    server = nextcloud()
+    with NotesClient(server.host, coalesce=False) as nc:
+        for _ in range(20):
+            thread = threading.Thread(target=nc.get_settings)
+            thread.start()
+            thread.join()
+        gc.collect()
+        assert len(nc._sessions) == 0
+        # Releasing them leaves the shared connection pool open.
+        assert nc.get_settings() == (200, server.settings)
+        assert len(nc._sessions) == 1
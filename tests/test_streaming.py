@@ -0,0 +1,149 @@
+import json
+import pytest
+from nextcloud_apps_api.utils.streaming import JsonArrayStream, NetscapeBookmarkStream
+
+NOTES = [
+    {"id": 1, "title": "Grüße", "content": "naïve café 日本語 🎉"},
+    {"id": 2, "title": "Braces } and ] inside", "content": "{[}]] \"quoted }\" \\ back\\slash"},
+    {"id": 3, "title": "", "content": "", "nested": {"list": [1, {"a": "}"}], "empty": {}}},
+]
+NOTES_BODY = json.dumps(NOTES, ensure_ascii=False, indent=1).encode("utf-8")
+
+EXPORT = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+<DT><A HREF="https://example.com/?a=1&amp;b=2" TAGS="python,web" ADD_DATE="100">Example &amp; Co</A>
+<DD>First line of a description
+that spans two lines – with ünïcode
+<DT><H3>Work</H3>
+<DL><p>
+<DT><A HREF="https://work.example.com" ADD_DATE="200" LAST_MODIFIED="300">Wörk</A>
+<DT><H3>Projects</H3>
+<DL><p>
+<DT><A HREF="https://project.example.com">Project 🎉</A>
+<DD>Deep
+</DL><p>
+<DT><A HREF="https://after.example.com">After projects</A>
+</DL><p>
+<DT><A HREF="https://root.example.com">Back at the root</A>
+</DL><p>
+""".encode("utf-8")
+
+BOOKMARKS = [
+    {"url": "https://example.com/?a=1&b=2", "title": "Example & Co",
+     "description": "First line of a description\nthat spans two lines – with ünïcode", "tags": ["python", "web"],
+     "added": 100, "lastmodified": None, "folder": "/"},
+    {"url": "https://work.example.com", "title": "Wörk", "description": "", "tags": [], "added": 200,
+     "lastmodified": 300, "folder": "/Work"},
+    {"url": "https://project.example.com", "title": "Project 🎉", "description": "Deep", "tags": [], "added": None,
+     "lastmodified": None, "folder": "/Work/Projects"},
+    {"url": "https://after.example.com", "title": "After projects", "description": "", "tags": [], "added": None,
+     "lastmodified": None, "folder": "/Work"},
+    {"url": "https://root.example.com", "title": "Back at the root", "description": "", "tags": [], "added": None,
+     "lastmodified": None, "folder": "/"},
+]
+
+
+def parse_json(chunks) -> list:
+    stream = JsonArrayStream()
+    items = []
+    for chunk in chunks:
+        items += stream.feed(chunk)
+    stream.close()
+    return items
+
+
+def parse_export(chunks) -> list:
+    stream = NetscapeBookmarkStream()
+    bookmarks = []
+    for chunk in chunks:
+        bookmarks += stream.feed(chunk)
+    return bookmarks + stream.close()
+
+
+@pytest.mark.parametrize("split", range(len(NOTES_BODY) + 1))
+def test_json_split_at_every_byte(split):
+    assert parse_json([NOTES_BODY[:split], NOTES_BODY[split:]]) == NOTES
+
+
+def test_json_one_byte_at_a_time():
+    assert parse_json(NOTES_BODY[i:i + 1] for i in range(len(NOTES_BODY))) == NOTES
+
+
+def test_json_elements_are_returned_as_soon_as_they_complete():
+    stream = JsonArrayStream()
+    assert stream.feed(b'[{"a": "x}') == []
+    assert stream.feed(b'] still in the string') == []
+    assert stream.feed(b'"}, {"b"') == [{"a": "x}] still in the string"}]
+    assert stream.feed(b': 1}]') == [{"b": 1}]
+    stream.close()
+
+
+ESCAPES_BODY = json.dumps([{"a": "\\"}, {"b": "\\\\\"}"}, {"c": "\\\"\\"}, "\\", 12345, -1.5e3, True, None,
+                           [[1, "]"], {}]]).encode("utf-8")
+
+
+@pytest.mark.parametrize("split", range(len(ESCAPES_BODY) + 1))
+def test_json_escapes_and_scalars_split_at_every_byte(split):
+    assert parse_json([ESCAPES_BODY[:split], ESCAPES_BODY[split:]]) == json.loads(ESCAPES_BODY)
+
+
+def test_json_escapes_and_scalars_one_byte_at_a_time():
+    assert parse_json(ESCAPES_BODY[i:i + 1] for i in range(len(ESCAPES_BODY))) == json.loads(ESCAPES_BODY)
+
+
+def test_json_large_element_is_decoded_once():
+    note = {"id": 1, "content": "- [x] [link](url) ] } \"quoted\" \\\n" * 20000}
+    body = json.dumps([note, {"id": 2}]).encode("utf-8")
+    stream = JsonArrayStream()
+    decoded = []
+    decode = stream._decoder.decode
+    stream._decoder.decode = lambda text: decoded.append(len(text)) or decode(text)
+    items = []
+    for i in range(0, len(body), 4096):
+        items += stream.feed(body[i:i + 4096])
+    stream.close()
+    assert items == [note, {"id": 2}]
+    assert len(decoded) == 1
+
+
+def test_json_empty_array():
+    assert parse_json([b" [ ", b"] "]) == []
+
+
+@pytest.mark.parametrize("body", [b"", b"[", b'[{"id": 1}', b'[{"id": 1}, {"id":', b'[{"id": "\xc3'])
+def test_json_truncated_input_raises_on_close(body):
+    stream = JsonArrayStream()
+    stream.feed(body)
+    with pytest.raises(ValueError):
+        stream.close()
+
+
+def test_json_rejects_other_documents():
+    with pytest.raises(ValueError):
+        JsonArrayStream().feed(b'{"status": "error"}')
+
+
+def test_export_in_one_chunk():
+    assert parse_export([EXPORT]) == BOOKMARKS
+
+
+@pytest.mark.parametrize("split", range(len(EXPORT) + 1))
+def test_export_split_at_every_byte(split):
+    assert parse_export([EXPORT[:split], EXPORT[split:]]) == BOOKMARKS
+
+
+def test_export_one_byte_at_a_time():
+    assert parse_export(EXPORT[i:i + 1] for i in range(len(EXPORT))) == BOOKMARKS
+
+
+def test_export_bookmarks_are_returned_once_complete():
+    stream = NetscapeBookmarkStream()
+    head, tail = EXPORT.split(b"<DT><H3>Work")
+    # The description of the first bookmark may continue until the next tag.
+    assert stream.feed(head) == []
+    assert [bookmark["url"] for bookmark in stream.feed(b"<DT><H3>Work" + tail)] == \
+        [bookmark["url"] for bookmark in BOOKMARKS]
+    assert stream.close() == []
@@ -0,0 +1,47 @@
+import asyncio
+from benchmarks.fake_server import NOTES_ROOT, BOOKMARKS_ROOT
+from nextcloud_apps_api import (NotesClient, NotesAsyncClient, BookmarkClient, BookmarkAsyncClient, FlowControl,
+                                AsyncFlowControl)
+
+
+def flaky_server(nextcloud, failures: int = 2):
+    """
+    :return: Server answering 503 with Retry-After 0 the first failures times the notes or the export are requested.
+    """
+    server = nextcloud(notes=3, bookmarks=1)
+    for path in (NOTES_ROOT + "/notes", BOOKMARKS_ROOT + "/export"):
+        server.answer(path, 503, times=failures, headers={"Retry-After": "0"})
+    return server
+
+
+def requests_of(server) -> dict:
+    return {path: sum(1 for method, path_qs, status in server.log if path_qs == path)
+            for path in (NOTES_ROOT + "/notes", BOOKMARKS_ROOT + "/export")}
+
+
+def test_sync_streams_are_retried_through_flow_control(nextcloud):
+    server = flaky_server(nextcloud)
+    notes_flow, bookmarks_flow = FlowControl(base_delay=0.01), FlowControl(base_delay=0.01)
+    with NotesClient(server.host, flow_control=notes_flow) as nc, \
+            BookmarkClient(server.host, flow_control=bookmarks_flow) as bc:
+        assert list(nc.stream_notes()) == list(server.notes.values())
+        assert [bookmark["url"] for bookmark in bc.iter_exported_bookmarks()] == ["https://example.com/1"]
+    assert requests_of(server) == {NOTES_ROOT + "/notes": 3, BOOKMARKS_ROOT + "/export": 3}
+    assert notes_flow.in_flight == 0 and bookmarks_flow.in_flight == 0
+    assert notes_flow.limit < 10
+
+
+def test_async_streams_are_retried_through_flow_control(nextcloud):
+    server = flaky_server(nextcloud)
+    notes_flow, bookmarks_flow = AsyncFlowControl(base_delay=0.01), AsyncFlowControl(base_delay=0.01)
+
+    async def main():
+        async with NotesAsyncClient(server.host, flow_control=notes_flow) as nc, \
+                BookmarkAsyncClient(server.host, flow_control=bookmarks_flow) as bc:
+            assert [note async for note in nc.stream_notes()] == list(server.notes.values())
+            assert [bookmark["url"] async for bookmark in bc.iter_exported_bookmarks()] == ["https://example.com/1"]
+
+    asyncio.run(main())
+    assert requests_of(server) == {NOTES_ROOT + "/notes": 3, BOOKMARKS_ROOT + "/export": 3}
+    assert notes_flow.in_flight == 0 and bookmarks_flow.in_flight == 0
+    assert notes_flow.limit < 10
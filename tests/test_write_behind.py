@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import pytest
+from benchmarks.fake_server import NOTES_ROOT
+from conftest import within
+from nextcloud_apps_api import NotesClient, NotesAsyncClient
+from nextcloud_apps_api.utils.writebehind import WriteBehind, AsyncWriteBehind
+
+
+class Recorder:
+    """
+    Stands in for a client's save: records (id, etag, fields, time) and returns the next ETag of the id.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.versions = {}
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, id_, etag, fields):
+        self.gate.wait()
+        self.sent.append((id_, etag, dict(fields), time.monotonic()))
+        self.versions[id_] = self.versions.get(id_, 0) + 1
+        return 200, {"id": id_, "etag": f"v{self.versions[id_]}", **fields}
+
+    async def send(self, id_, etag, fields):
+        return self(id_, etag, fields)
+
+    def calls(self):
+        return [(id_, etag, fields) for id_, etag, fields, sent_at in self.sent]
+
+
+def test_updates_of_an_id_are_merged_into_one_save():
+    send = Recorder()
+    queue = WriteBehind(send, delay=0.05)
+    first = queue.update(1, "v0", {"title": "A", "content": "x"})
+    second = queue.update(1, None, {"title": "B"})
+    other = queue.update(2, None, {"title": "C"})
+    assert first.result(1) == second.result(1) == (200, {"id": 1, "etag": "v1", "title": "B", "content": "x"})
+    assert other.result(1)[1]["title"] == "C"
+    queue.close()
+    assert sorted(send.calls()) == [(1, "v0", {"title": "B", "content": "x"}), (2, None, {"title": "C"})]
+
+
+def test_save_waits_for_updates_to_pause():
+    send = Recorder()
+    queue = WriteBehind(send, delay=0.1, max_delay=10)
+    start = time.monotonic()
+    for i in range(5):
+        queue.update(1, None, {"title": str(i)})
+        time.sleep(0.03)
+    last = time.monotonic()
+    queue.update(1, None, {"content": "end"}).result(1)
+    queue.close()
+    assert send.calls() == [(1, None, {"title": "4", "content": "end"})]
+    assert send.sent[0][3] - last >= 0.1 and send.sent[0][3] - start >= 0.2
+
+
+def test_max_delay_saves_while_updates_keep_coming():
+    send = Recorder()
+    queue = WriteBehind(send, delay=0.05, max_delay=0.1)
+    start = time.monotonic()
+    while time.monotonic() - start < 0.35:
+        queue.update(1, None, {"title": "t"})
+        time.sleep(0.01)
+    queue.close()
+    assert len(send.sent) >= 3
+    assert send.sent[0][3] - start < 0.2
+
+
+def test_updates_on_a_replaced_etag_are_rebased():
+    send = Recorder()
+    queue = WriteBehind(send, delay=0.01)
+    assert queue.update(1, "v0", {"title": "A"}).result(1)[1]["etag"] == "v1"
+    # Made on the version the first save replaced.
+    queue.update(1, "v0", {"title": "B"}).result(1)
+    queue.close()
+    assert send.calls() == [(1, "v0", {"title": "A"}), (1, "v1", {"title": "B"})]
+
+
+def test_updates_made_during_a_save_wait_for_it():
+    send = Recorder()
+    send.gate.clear()
+    queue = WriteBehind(send, delay=0.01)
+    first = queue.update(1, "v0", {"title": "A"})
+    time.sleep(0.05)
+    second = queue.update(1, "v0", {"title": "B"})
+    time.sleep(0.05)
+    send.gate.set()
+    assert second.result(1)[1]["etag"] == "v2"
+    assert first.result(1)[1]["title"] == "A"
+    queue.close()
+    assert send.calls() == [(1, "v0", {"title": "A"}), (1, "v1", {"title": "B"})]
+
+
+def test_discard_drops_buffered_updates():
+    send = Recorder()
+    queue = WriteBehind(send, delay=0.05)
+    future = queue.update(1, None, {"title": "A"})
+    queue.discard(1)
+    queue.close()
+    assert future.cancelled() and send.sent == []
+
+
+def test_flush_and_close_save_everything():
+    send = Recorder()
+    queue = WriteBehind(send, delay=60)
+    queue.update(1, None, {"title": "A"})
+    queue.flush()
+    assert send.calls() == [(1, None, {"title": "A"})]
+    queue.update(2, None, {"title": "B"})
+    queue.close()
+    assert len(send.sent) == 2
+    with pytest.raises(RuntimeError):
+        queue.update(3, None, {"title": "C"})
+
+
+def test_failed_save_fails_its_futures():
+    def send(id_, etag, fields):
+        raise ValueError("refused")
+
+    queue = WriteBehind(send, delay=0.01)
+    future = queue.update(1, None, {"title": "A"})
+    with pytest.raises(ValueError):
+        future.result(1)
+    queue.close()
+
+
+def test_async_queue_merges_rebases_and_discards():
+    send = Recorder()
+
+    async def main():
+        queue = AsyncWriteBehind(send.send, delay=0.02)
+        first = queue.update(1, "v0", {"title": "A"})
+        second = queue.update(1, None, {"content": "x"})
+        assert (await first) == (await second) == (200, {"id": 1, "etag": "v1", "title": "A", "content": "x"})
+        await queue.update(1, "v0", {"title": "B"})
+        dropped = queue.update(2, None, {"title": "C"})
+        queue.discard(2)
+        assert dropped.cancelled()
+        queue.update(3, None, {"title": "D"})
+        await queue.close()
+        with pytest.raises(RuntimeError):
+            queue.update(4, None, {})
+
+    asyncio.run(main())
+    assert send.calls() == [(1, "v0", {"title": "A", "content": "x"}), (1, "v1", {"title": "B"}),
+                            (3, None, {"title": "D"})]
+
+
+def test_async_max_delay_saves_while_updates_keep_coming():
+    send = Recorder()
+
+    async def main():
+        queue = AsyncWriteBehind(send.send, delay=0.05, max_delay=0.1)
+        start = time.monotonic()
+        while time.monotonic() - start < 0.35:
+            queue.update(1, None, {"title": "t"})
+            await asyncio.sleep(0.01)
+        await queue.flush()
+        return start
+
+    start = asyncio.run(main())
+    assert len(send.sent) >= 3
+    assert send.sent[0][3] - start < 0.2
+
+
+def saves(server) -> list:
+    """
+    :return: Path of every PUT the server answered.
+    """
+    return [path_qs for method, path_qs, status in server.log if method == "PUT"]
+
+
+def test_saves_do_not_wait_for_map_workers(nextcloud):
+    server = nextcloud()
+    with NotesClient(server.host, max_workers=2, write_delay=0.05) as nc:
+        results = within(5, lambda: nc.map(lambda i: nc.put_note(i, title="x").result(), [1, 2]))
+        assert [note["id"] for status, note in results] == [1, 2]
+
+        def update_and_flush(i):
+            future = nc.put_note(i, title="y")
+            nc.flush()
+            return future.done()
+
+        assert within(5, lambda: nc.map(update_and_flush, [3, 4])) == [True, True]
+
+
+def test_client_merges_discards_and_flushes_on_close(nextcloud):
+    server = nextcloud()
+    with NotesClient(server.host, write_delay=60) as nc:
+        nc.put_note(1, title="A")
+        nc.put_note(1, content="x")
+        nc.put_note(2, title="B")
+        nc.delete_note(2)
+    assert saves(server) == [NOTES_ROOT + "/notes/1"]
+    assert (server.notes[1]["title"], server.notes[1]["content"]) == ("A", "x")
+
+
+def test_async_client_flushes_on_close(nextcloud):
+    server = nextcloud()
+
+    async def main():
+        async with NotesAsyncClient(server.host, write_delay=60) as nc:
+            first = await nc.put_note(1, title="A")
+            await nc.put_note(1, content="x")
+            await nc.put_note(2, title="B")
+            await nc.delete_note(2)
+        assert (await first)[1]["content"] == "x"
+
+    asyncio.run(main())
+    assert saves(server) == [NOTES_ROOT + "/notes/1"]
+    assert (server.notes[1]["title"], server.notes[1]["content"]) == ("A", "x")